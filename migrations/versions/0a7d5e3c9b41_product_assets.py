@@ -0,0 +1,44 @@
+"""product assets
+
+Revision ID: 0a7d5e3c9b41
+Revises: f3c8a1d5b720
+Create Date: 2026-10-18 16:48:31.904215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a7d5e3c9b41'
+down_revision = 'f3c8a1d5b720'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_assets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=True),
+    sa.Column('mimetype', sa.String(length=100), nullable=False),
+    sa.Column('content_sha256', sa.String(length=64), nullable=False),
+    sa.Column('content_size', sa.BigInteger(), nullable=False),
+    sa.Column('url', sa.String(length=500), nullable=True),
+    sa.Column('thumbnail_sha256', sa.String(length=64), nullable=True),
+    sa.Column('thumbnail_url', sa.String(length=500), nullable=True),
+    sa.Column('preflight_passed', sa.Boolean(), nullable=False),
+    sa.Column('preflight', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_product_assets_product_id_kind_id', 'product_assets',
+                    ['product_id', 'kind', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_product_assets_product_id_kind_id', table_name='product_assets')
+    op.drop_table('product_assets')
@@ -0,0 +1,28 @@
+"""keyset pagination indexes
+
+Revision ID: 7c1f4a9e2b10
+Revises: 52b8e36de97f
+Create Date: 2026-10-18 09:12:04.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1f4a9e2b10'
+down_revision = '52b8e36de97f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_updated_at_id', 'users', ['updated_at', 'id'], unique=False)
+    op.create_index('ix_products_updated_at_id', 'products', ['updated_at', 'id'], unique=False)
+    op.create_index('ix_pricing_updated_at_id', 'pricing', ['updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_pricing_updated_at_id', table_name='pricing')
+    op.drop_index('ix_products_updated_at_id', table_name='products')
+    op.drop_index('ix_users_updated_at_id', table_name='users')
@@ -0,0 +1,32 @@
+"""unique pricing.product_id
+
+Revision ID: a3d95b7e61c4
+Revises: 7c1f4a9e2b10
+Create Date: 2026-10-18 10:41:37.502913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d95b7e61c4'
+down_revision = '7c1f4a9e2b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Bulk repricing upserts ON CONFLICT (product_id), which needs this constraint.
+    # Keep only the newest pricing row per product before adding it.
+    op.execute(
+        "DELETE FROM pricing WHERE id NOT IN "
+        "(SELECT MAX(id) FROM pricing GROUP BY product_id)"
+    )
+    with op.batch_alter_table('pricing', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_pricing_product_id', ['product_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('pricing', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_pricing_product_id', type_='unique')
@@ -0,0 +1,30 @@
+"""hot query indexes
+
+Revision ID: c41d7a2e8f05
+Revises: b8e2f0c4d913
+Create Date: 2026-10-18 12:37:51.208417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7a2e8f05'
+down_revision = 'b8e2f0c4d913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pricing.product_id is already covered by uq_pricing_product_id
+    op.create_index('ix_products_product_type_id', 'products', ['product_type', 'id'], unique=False)
+    op.create_index('ix_products_product_type_updated_at_id', 'products',
+                    ['product_type', 'updated_at', 'id'], unique=False)
+    op.create_index('ix_orders_customer_id', 'orders', ['customer_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_orders_customer_id', table_name='orders')
+    op.drop_index('ix_products_product_type_updated_at_id', table_name='products')
+    op.drop_index('ix_products_product_type_id', table_name='products')
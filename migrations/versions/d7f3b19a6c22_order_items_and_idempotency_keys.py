@@ -0,0 +1,47 @@
+"""order items and idempotency keys
+
+Revision ID: d7f3b19a6c22
+Revises: c41d7a2e8f05
+Create Date: 2026-10-18 13:24:09.917350
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7f3b19a6c22'
+down_revision = 'c41d7a2e8f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_items',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('unit_price', sa.DECIMAL(precision=10, scale=2), nullable=False),
+    sa.Column('line_total', sa.DECIMAL(precision=10, scale=2), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_order_items_order_id', 'order_items', ['order_id'], unique=False)
+    op.create_index('ix_order_items_product_id', 'order_items', ['product_id'], unique=False)
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('idempotency_key', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('request_hash', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_orders_customer_id_idempotency_key', ['customer_id', 'idempotency_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_orders_customer_id_idempotency_key', type_='unique')
+        batch_op.drop_column('request_hash')
+        batch_op.drop_column('idempotency_key')
+    op.drop_index('ix_order_items_product_id', table_name='order_items')
+    op.drop_index('ix_order_items_order_id', table_name='order_items')
+    op.drop_table('order_items')
@@ -0,0 +1,28 @@
+"""ebook content store
+
+Revision ID: f3c8a1d5b720
+Revises: e9a4c6d2f187
+Create Date: 2026-10-18 15:24:09.617342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a1d5b720'
+down_revision = 'e9a4c6d2f187'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ebooks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_sha256', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('content_size', sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('ebooks', schema=None) as batch_op:
+        batch_op.drop_column('content_size')
+        batch_op.drop_column('content_sha256')
@@ -4,6 +4,8 @@ set -o errexit
 
 npm install
 npm run build
+# Precompressed copies of the bundle are served to clients that accept gzip
+find public -type f \( -name '*.js' -o -name '*.css' -o -name '*.svg' \) -exec gzip -k -9 -f {} \;
 
 pipenv install
 
@@ -1,17 +1,284 @@
-  
 import os
-from flask_admin import Admin
-from .models import db, User
+from flask import g, redirect, request, url_for
+from flask_admin import Admin, expose
 from flask_admin.contrib.sqla import ModelView
+from flask_admin.contrib.sqla.ajax import QueryAjaxModelLoader
+from flask_admin.contrib.sqla.filters import FilterEqual, IntEqualFilter
+from flask_admin.model.ajax import DEFAULT_PAGE_SIZE
+from sqlalchemy import or_, tuple_
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import joinedload
+from .models import db, User, Product, Book, ComicBook, ChildrenBook, TShirt, EBook, Pricing, Order
+from .pagination import encode_cursor, decode_cursor, _bind_value
+from .utils import APIException
+
+
+def estimated_count(query, model, filtered):
+    """
+    Row count of query as the planner estimates it, without running it:
+    Postgres plans the query, SQLite reads the table's ANALYZE statistics
+    (unfiltered lists only). None when there is no estimate, and the list
+    shows only previous/next links.
+    """
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    try:
+        if dialect == "postgresql":
+            compiled = query.statement.compile(dialect=connection.dialect)
+            plan = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).scalar()
+            return int(plan[0]["Plan"]["Plan Rows"])
+        if dialect == "sqlite" and not filtered:
+            # No sqlite_stat1 before the first ANALYZE
+            analyzed = connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'").scalar()
+            if not analyzed:
+                return None
+            stat = connection.exec_driver_sql(
+                "SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (model.__table__.name,)
+            ).scalar()
+            return int(stat.split()[0]) if stat else None
+    except DBAPIError:
+        return None
+    return None
+
+
+class ExactMatchLoader(QueryAjaxModelLoader):
+    """Looks related rows up by id or an exact match on unique, indexed fields, never with LIKE."""
+
+    def get_list(self, term, offset=0, limit=DEFAULT_PAGE_SIZE):
+        term = term.strip()
+        if term.isdigit():
+            query = self.get_query().filter(getattr(self.model, self.pk) == int(term))
+        else:
+            query = self.get_query().filter(or_(*[field == term for field in self._cached_fields]))
+        return query.offset(offset).limit(limit).all()
+
+
+class KeysetModelView(ModelView):
+    """
+    List views that stay fast on multi-million-row tables:
+
+    - pages are keyset ranges: the previous/next links carry a cursor of the
+      first/last row shown, so no page is read with OFFSET;
+    - the row count is the planner's estimate instead of COUNT(*);
+    - lists sort only by keyset_orderings, each backed by an index;
+    - filters are exact matches on indexed columns, and there is no LIKE search;
+    - relationships shown in list columns are joined eagerly.
+    """
+
+    page_size = 50
+    can_view_details = True
+    simple_list_pager = True
+    column_display_pk = True
+    column_default_sort = ("id", True)
+    # {sort column: keyset columns}; each must be backed by an index and end
+    # in a unique column so the order is total
+    keyset_orderings = {"id": ("id",)}
+
+    def __init__(self, model, session, **kwargs):
+        self.column_sortable_list = tuple(self.keyset_orderings)
+        super().__init__(model, session, **kwargs)
+
+    def scaffold_auto_joins(self):
+        # Scalar relationships shown in list columns, directly or as
+        # "relation.field", in either direction (Product.pricing is one-to-one)
+        joined = {}
+        for name in self.column_list or ():
+            relation = getattr(self.model, name.split(".")[0], None)
+            prop = getattr(relation, "property", None)
+            if hasattr(prop, "direction") and not prop.uselist:
+                joined.setdefault(prop.key, relation)
+        return list(joined.values())
+
+    @expose("/")
+    def index_view(self):
+        # A page number without a cursor (a bookmarked URL) could only be
+        # read with OFFSET: start the same listing over at its first page
+        if request.args.get("page", 0, type=int) and not {"after", "before"} & request.args.keys():
+            args = request.args.to_dict(flat=False)
+            del args["page"]
+            return redirect(url_for(".index_view", **args))
+        return super().index_view()
+
+    def _get_list_extra_args(self):
+        view_args = super()._get_list_extra_args()
+        cursor = {key: view_args.extra_args.pop(key) for key in ("after", "before") if key in view_args.extra_args}
+        g.keyset_list = {"view": self, "args": view_args, "cursor": cursor, "next": None, "prev": None}
+        return view_args
+
+    def _get_list_url(self, view_args):
+        state = g.get("keyset_list")
+        if state is not None and state["view"] is self:
+            current = state["args"]
+            listing = (view_args.sort, view_args.sort_desc, view_args.search, view_args.filters or None,
+                       view_args.page_size)
+            same_listing = listing == (current.sort, current.sort_desc, current.search, current.filters or None,
+                                       current.page_size)
+            extra_args = dict(view_args.extra_args)
+            if not same_listing:
+                # A different sort, filter or page size starts again at the first page
+                view_args = view_args.clone(page=0)
+            elif view_args.page == current.page + 1 and state["next"]:
+                extra_args["after"] = state["next"]
+            elif view_args.page == current.page - 1 and view_args.page > 0 and state["prev"]:
+                extra_args["before"] = state["prev"]
+            elif view_args.page == current.page:
+                extra_args.update(state["cursor"])
+            view_args = view_args.clone(extra_args=extra_args)
+        return super()._get_list_url(view_args)
+
+    def get_list(self, page, sort_column, sort_desc, search, filters, execute=True, page_size=None):
+        state = g.get("keyset_list")
+        cursor = state["cursor"] if state is not None and state["view"] is self else {}
+        if sort_column not in self.keyset_orderings:
+            sort_column, sort_desc = self.column_default_sort
+        names = self.keyset_orderings[sort_column]
+        # Inherited columns come from the base table (products.id, not books.id)
+        # so the base table's indexes serve the order
+        base = self.model.__mapper__.base_mapper.class_
+        columns = [getattr(base if hasattr(base, name) else self.model, name) for name in names]
+        page_size = self.page_size if page_size is None else page_size
+
+        query = self.get_query()
+        joins, count_joins = {}, {}
+        if self._search_supported and search:
+            query, _, joins, count_joins = self._apply_search(query, None, joins, count_joins, search)
+        if filters and self._filters:
+            query, _, joins, count_joins = self._apply_filters(query, None, joins, count_joins, filters)
+        count = estimated_count(query, self.model, filtered=bool(search or filters))
+
+        for relation in self._auto_joins:
+            query = query.options(joinedload(relation))
+
+        backwards = "before" in cursor
+        values = None
+        if cursor:
+            try:
+                order, values = decode_cursor(cursor.get("before") or cursor["after"], self.keyset_orderings)
+            except APIException:
+                values = None
+            if values is not None and order != sort_column:
+                values = None
+        # Previous pages are read in the opposite direction and flipped back
+        descending = bool(sort_desc) != backwards
+        if values is not None:
+            key = columns[0] if len(columns) == 1 else tuple_(*columns)
+            bound = _bind_value(values[0]) if len(columns) == 1 else tuple_(*map(_bind_value, values))
+            query = query.filter(key < bound if descending else key > bound)
+        else:
+            # No usable cursor: the first page (index_view redirects page numbers)
+            backwards = False
+            descending = bool(sort_desc)
+        query = query.order_by(*[column.desc() if descending else column for column in columns])
+        if page_size:
+            query = query.limit(page_size)
+        if not execute:
+            return count, query
+
+        rows = query.all()
+        if backwards:
+            rows.reverse()
+        if rows and state is not None and state["view"] is self:
+            state["prev"] = encode_cursor(sort_column, [getattr(rows[0], name) for name in names])
+            state["next"] = encode_cursor(sort_column, [getattr(rows[-1], name) for name in names])
+        return count, rows
+
+    def render(self, template, **kwargs):
+        if template == self.list_template:
+            # Keyset pages cannot jump to page N: always the previous/next pager
+            kwargs["num_pages"] = None
+            if kwargs.get("count") is not None:
+                kwargs["count"] = f"~{kwargs['count']:,}"
+        return super().render(template, **kwargs)
+
+
+class UserView(KeysetModelView):
+    keyset_orderings = {"id": ("id",), "updated_at": ("updated_at", "id"), "email": ("email",), "username": ("username",)}
+    column_list = ("id", "username", "email", "first_name", "last_name", "updated_at")
+    column_filters = (IntEqualFilter(User.id, "ID"), FilterEqual(User.email, "Email"), FilterEqual(User.username, "Username"))
+    form_excluded_columns = ("orders", "password_hash", "created_at", "updated_at")
+
+
+class ProductView(KeysetModelView):
+    keyset_orderings = {"id": ("id",), "updated_at": ("updated_at", "id"), "sku": ("sku",),
+                        "product_type": ("product_type", "id")}
+    column_list = ("id", "product_type", "sku", "name", "price", "pricing.final_price", "updated_at")
+    column_labels = {"pricing.final_price": "Final price"}
+    column_filters = (IntEqualFilter(Product.id, "ID"), FilterEqual(Product.sku, "SKU"),
+                      FilterEqual(Product.product_type, "Type"))
+    form_excluded_columns = ("pricing", "product_type", "created_at", "updated_at")
+
+
+class ProductTypeView(ProductView):
+    """One product type, read through the (product_type, ...) indexes."""
+
+    keyset_orderings = {"id": ("id",), "updated_at": ("updated_at", "id")}
+    column_filters = (IntEqualFilter(Product.id, "ID"), FilterEqual(Product.sku, "SKU"))
+    type_columns = ()
+
+    def __init__(self, model, session, **kwargs):
+        self.column_list = ("id", "sku", "name", "price", "pricing.final_price") + self.type_columns + ("updated_at",)
+        super().__init__(model, session, **kwargs)
+
+    def get_query(self):
+        # Subclass views list their own type only (Book excludes ChildrenBook)
+        return self.session.query(self.model).filter(
+            Product.product_type == self.model.__mapper__.polymorphic_identity)
+
+
+class BookView(ProductTypeView):
+    type_columns = ("author", "page_count", "trim_size", "cover_type")
+
+
+class ComicBookView(ProductTypeView):
+    type_columns = ("series_title", "issue_number", "page_count", "trim_size")
+
+
+class ChildrenBookView(ProductTypeView):
+    type_columns = ("author", "age_group", "page_count", "trim_size")
+
+
+class TShirtView(ProductTypeView):
+    type_columns = ()
+
+
+class EBookView(ProductTypeView):
+    type_columns = ("file_format", "file_size")
+
+
+class PricingView(KeysetModelView):
+    keyset_orderings = {"id": ("id",), "updated_at": ("updated_at", "id"), "product_id": ("product_id",)}
+    column_list = ("id", "product.sku", "product.name", "base_price", "discount", "tax_rate", "final_price", "updated_at")
+    column_labels = {"product.sku": "SKU", "product.name": "Product"}
+    column_filters = (IntEqualFilter(Pricing.product_id, "Product ID"),)
+    form_excluded_columns = ("created_at", "updated_at")
+    form_ajax_refs = {"product": ExactMatchLoader("product", db.session, Product, fields=("sku",))}
+
+
+class OrderView(KeysetModelView):
+    keyset_orderings = {"id": ("id",), "customer_id": ("customer_id", "id")}
+    column_list = ("id", "customer.email", "status", "total_price", "created_at")
+    column_labels = {"customer.email": "Customer"}
+    column_filters = (IntEqualFilter(Order.id, "ID"), IntEqualFilter(Order.customer_id, "Customer ID"))
+    form_excluded_columns = ("items", "idempotency_key", "request_hash", "created_at", "updated_at")
+    form_ajax_refs = {"customer": ExactMatchLoader("customer", db.session, User, fields=("email", "username"))}
+
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     admin = Admin(app, name='4Geeks Admin', template_mode='bootstrap3')
 
-    
-    # Add your models here, for example this is how we add a the User model to the admin
-    admin.add_view(ModelView(User, db.session))
+    # Every view pages by keyset and shows estimated counts, see KeysetModelView
+    admin.add_view(UserView(User, db.session))
+    admin.add_view(ProductView(Product, db.session, category="Products"))
+    admin.add_view(BookView(Book, db.session, category="Products"))
+    admin.add_view(ChildrenBookView(ChildrenBook, db.session, category="Products"))
+    admin.add_view(ComicBookView(ComicBook, db.session, category="Products"))
+    admin.add_view(TShirtView(TShirt, db.session, category="Products"))
+    admin.add_view(EBookView(EBook, db.session, category="Products"))
+    admin.add_view(PricingView(Pricing, db.session))
+    admin.add_view(OrderView(Order, db.session))
 
-    # You can duplicate that line to add mew models
-    # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
+    # Add new models with a KeysetModelView subclass whose keyset_orderings
+    # and column_filters only use indexed columns
@@ -0,0 +1,153 @@
+import re
+from urllib.parse import parse_qsl
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from .db_profiles import PROFILES, _apply_sqlite_pragmas, database_uri, select_profile
+from .models import Product, Pricing, polymorphic_product
+from .pagination import keyset_window, page_response, split_page
+from .serializers import dumps, serialize
+from .utils import APIException
+
+# Async drivers for the sync URLs the Flask app uses
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_database_uri(uri):
+    scheme, rest = uri.split("://", 1)
+    driver = ASYNC_DRIVERS.get(scheme.split("+")[0])
+    if driver is None:
+        raise ValueError(f"No async driver configured for {scheme}")
+    return f"{driver}://{rest}"
+
+
+def create_catalog_engine(uri):
+    profile = select_profile(uri)
+    options = PROFILES[profile]()
+    if profile == "sqlite":
+        options["poolclass"] = AsyncAdaptedQueuePool
+        options["connect_args"] = {"timeout": options["connect_args"]["timeout"]}
+    engine = create_async_engine(async_database_uri(uri), **options)
+    if profile == "sqlite":
+        event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+class Request:
+    def __init__(self, scope, params):
+        self.path = scope["path"]
+        self.method = scope["method"]
+        self.args = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        self.params = params
+
+
+class CatalogApp:
+    """
+    Read-only ASGI app for the catalog endpoints, serving the same JSON as
+    the Flask routes from an async engine (aiosqlite locally, asyncpg on
+    Postgres). An in-flight request only holds a coroutine while it waits on
+    the database, so one process can keep thousands of slow clients open.
+    Run it next to the Flask app, e.g.:
+
+        $ uvicorn asgi:application --app-dir src --port 3002
+    """
+
+    def __init__(self, uri=None):
+        self.engine = create_catalog_engine(uri or database_uri())
+        self.session_factory = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.routes = [
+            (re.compile(r"^/api/products/?$"), self.get_products),
+            (re.compile(r"^/api/products/(?P<product_id>\d+)/?$"), self.get_product),
+            (re.compile(r"^/api/standard_specifications/(?P<product_type>[^/]+)/?$"),
+             self.get_standard_specifications),
+            (re.compile(r"^/pricing/pricing/?$"), self.get_pricing),
+            (re.compile(r"^/pricing/pricing/(?P<product_id>\d+)/?$"), self.get_product_pricing),
+        ]
+
+    # -------------------- Handlers --------------------
+
+    async def _page(self, session, stmt, model, args):
+        window, order, limit = keyset_window(stmt, model, args)
+        rows = (await session.execute(window)).scalars().all()
+        rows, next_cursor = split_page(rows, order, limit)
+        return 200, page_response([serialize(row) for row in rows], next_cursor)
+
+    # Every column a row serializes must come with the row: a lazy load of
+    # an inherited table (books.* of a children_book) cannot await and
+    # raises MissingGreenlet. See polymorphic_product.
+
+    def _products_of_type(self, product_type):
+        return select(polymorphic_product(product_type)).filter(Product.product_type == product_type)
+
+    async def get_products(self, session, request):
+        if request.args.get("type"):
+            stmt = self._products_of_type(request.args["type"])
+        else:
+            stmt = select(polymorphic_product())
+        return await self._page(session, stmt, Product, request.args)
+
+    async def get_product(self, session, request):
+        stmt = select(polymorphic_product()).filter(Product.id == int(request.params["product_id"]))
+        product = (await session.execute(stmt)).scalars().first()
+        if product is None:
+            return 404, {"message": "Product not found"}
+        return 200, serialize(product)
+
+    async def get_standard_specifications(self, session, request):
+        stmt = self._products_of_type(request.params["product_type"])
+        return await self._page(session, stmt, Product, request.args)
+
+    async def get_pricing(self, session, request):
+        return await self._page(session, select(Pricing), Pricing, request.args)
+
+    async def get_product_pricing(self, session, request):
+        stmt = select(Pricing).filter(Pricing.product_id == int(request.params["product_id"]))
+        pricing = (await session.execute(stmt)).scalars().first()
+        if pricing is None:
+            return 404, {"message": "Pricing not found"}
+        return 200, serialize(pricing)
+
+    # -------------------- ASGI --------------------
+
+    async def dispatch(self, scope):
+        if scope["method"] not in ("GET", "HEAD"):
+            return 405, {"message": "This endpoint is read-only"}
+        for pattern, handler in self.routes:
+            match = pattern.match(scope["path"])
+            if match:
+                request = Request(scope, match.groupdict())
+                try:
+                    async with self.session_factory() as session:
+                        return await handler(session, request)
+                except APIException as error:
+                    return error.status_code, error.to_dict()
+        return 404, {"message": "Not found"}
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        status, payload = await self.dispatch(scope)
+        body = dumps(payload)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
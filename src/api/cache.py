@@ -0,0 +1,228 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL = 300  # seconds
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def to_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class MemoryBackend:
+    """Per-process LRU: an OrderedDict kept in recency order, with a TTL per entry."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def size(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """
+    LRU + TTL store in a local SQLite file, so every gunicorn worker on the
+    host shares one cache and an invalidation in one worker is seen by all.
+    Hit/miss/eviction counters are kept per process.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed_at ON cache_entries (accessed_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND expires_at >= ?", (key, now)
+        ).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return None
+        conn.execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (now, key))
+        self.stats.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, "
+            "expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+            (key, json.dumps(value), now + self.ttl, now),
+        )
+        overflow = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            cursor = conn.execute(
+                "DELETE FROM cache_entries WHERE key IN "
+                "(SELECT key FROM cache_entries ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            self.stats.evictions += cursor.rowcount
+
+    def delete(self, *keys):
+        self._connect().executemany("DELETE FROM cache_entries WHERE key = ?", [(k,) for k in keys])
+
+    def delete_prefix(self, prefix):
+        # Keys are plain "<kind>:<id>" strings, so a range scan on the primary key works
+        self._connect().execute(
+            "DELETE FROM cache_entries WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff")
+        )
+
+    def size(self):
+        return self._connect().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+
+class NullBackend:
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key):
+        self.stats.misses += 1
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def delete_prefix(self, prefix):
+        pass
+
+    def size(self):
+        return 0
+
+
+def create_backend(url, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+    """
+    memory              -> per-process LRU (default)
+    sqlite:///path.db   -> LRU shared by all workers through a local file
+    none                -> caching disabled
+    """
+    if url in (None, "", "memory"):
+        return MemoryBackend(max_entries, ttl)
+    if url == "none":
+        return NullBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):], max_entries, ttl)
+    raise ValueError(f"Unknown catalog cache backend: {url}")
+
+
+class CatalogCache:
+    """Read-through cache for product and pricing dicts, keyed "<kind>:<id>"."""
+
+    def __init__(self, app=None):
+        self.backend = MemoryBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("CATALOG_CACHE_BACKEND", os.getenv("CATALOG_CACHE_BACKEND", "memory"))
+        app.config.setdefault("CATALOG_CACHE_MAX_ENTRIES", int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)))
+        app.config.setdefault("CATALOG_CACHE_TTL", int(os.getenv("CATALOG_CACHE_TTL", DEFAULT_TTL)))
+        self.backend = create_backend(
+            app.config["CATALOG_CACHE_BACKEND"],
+            max_entries=app.config["CATALOG_CACHE_MAX_ENTRIES"],
+            ttl=app.config["CATALOG_CACHE_TTL"],
+        )
+
+    def get(self, kind, id):
+        return self.backend.get(f"{kind}:{id}")
+
+    def set(self, kind, id, value):
+        self.backend.set(f"{kind}:{id}", value)
+
+    def get_or_load(self, kind, id, loader):
+        """Returns the cached dict for kind:id, or calls loader() and caches its result."""
+        value = self.get(kind, id)
+        if value is None:
+            value = loader()
+            self.set(kind, id, value)
+        return value
+
+    def invalidate(self, kind, *ids):
+        self.backend.delete(*[f"{kind}:{id}" for id in ids])
+
+    def invalidate_all(self, kind):
+        self.backend.delete_prefix(f"{kind}:")
+
+    def stats(self):
+        return dict(self.backend.stats.to_dict(), size=self.backend.size(),
+                    backend=type(self.backend).__name__)
+
+
+catalog_cache = CatalogCache()
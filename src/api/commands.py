@@ -1,6 +1,12 @@
 
 import click
-from api.models import db, User
+from api.seed import generate, DEFAULT_BATCH_SIZE
+from api.importer import import_products, iter_csv, iter_ndjson, DEFAULT_CHUNK_SIZE
+from api.search import rebuild_search_index
+from api.query_plans import check_query_plans
+from api.jobs import Worker, DEFAULT_CONCURRENCY, DEFAULT_POLL_INTERVAL
+from api.sitemap import product_sitemap
+from api.utils import APIException
 
 """
 In this file, you can add as many commands as you want using the @app.cli.command decorator
@@ -18,17 +24,111 @@ def setup_commands(app):
     @click.argument("count") # argument of out command
     def insert_test_users(count):
         print("Creating test users")
-        for x in range(1, int(count) + 1):
-            user = User()
-            user.email = "test_user" + str(x) + "@test.com"
-            user.password = "123456"
-            user.is_active = True
-            db.session.add(user)
-            db.session.commit()
-            print("User: ", user.email, " created.")
-
+        report = generate(users=int(count))
+        for line in report.lines():
+            print(line)
         print("All test users created")
 
+    """
+    Fills every table with deterministic synthetic data for load testing, for example:
+    $ flask insert-test-data --users 100000 --products 1000000 --orders 500000 --seed 7
+    """
     @app.cli.command("insert-test-data")
-    def insert_test_data():
-        pass
\ No newline at end of file
+    @click.option("--users", default=100, show_default=True)
+    @click.option("--products", default=1000, show_default=True)
+    @click.option("--orders", default=500, show_default=True)
+    @click.option("--seed", default=42, show_default=True)
+    @click.option("--batch-size", default=DEFAULT_BATCH_SIZE, show_default=True)
+    def insert_test_data(users, products, orders, seed, batch_size):
+        print(f"Generating {users} users, {products} products and {orders} orders (seed {seed})")
+        report = generate(users=users, products=products, orders=orders, seed=seed, batch_size=batch_size)
+        for line in report.lines():
+            print(line)
+
+    """
+    Bulk imports products from an NDJSON or CSV file, for example:
+    $ flask import-products backlist.csv --chunk-size 5000
+    """
+    @app.cli.command("import-products")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "file_format", type=click.Choice(["ndjson", "csv"]), default=None,
+                  help="Defaults to the file extension.")
+    @click.option("--chunk-size", default=DEFAULT_CHUNK_SIZE, show_default=True)
+    def import_products_command(path, file_format, chunk_size):
+        if file_format is None:
+            file_format = "csv" if path.lower().endswith(".csv") else "ndjson"
+        # Like the HTTP import: invalid UTF-8 is reported on its own row
+        with open(path, encoding="utf-8", errors="surrogateescape", newline="") as f:
+            rows = iter_csv(f) if file_format == "csv" else iter_ndjson(f)
+            report = import_products(rows, chunk_size=chunk_size)
+
+        for error in report.errors:
+            print(f"Line {error['line']} ({error['sku']}): {error['error']}")
+        print(f"Imported {report.inserted} products, {len(report.errors)} rows failed")
+
+    """
+    Creates the product search index if it is missing and reindexes every product.
+    Migrations set it up too; run this after `db.create_all()` or to repair drift:
+    $ flask rebuild-search-index
+    """
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index_command():
+        print(f"Indexed {rebuild_search_index()} products")
+
+    """
+    Captures the SQL behind the main read routes, EXPLAINs every statement and
+    fails when one of them falls back to a full table scan. Run it against a
+    populated database, e.g. after insert-test-data, to catch missing indexes:
+    $ flask check-query-plans --verbose
+    """
+    @app.cli.command("check-query-plans")
+    @click.option("--verbose", is_flag=True, help="Print every plan, not only the failures.")
+    def check_query_plans_command(verbose):
+        failed = 0
+        for check in check_query_plans(app):
+            failures = check.failures
+            failed += bool(failures)
+            print(f"{'FAIL' if failures else 'ok  '} {check.name} ({len(check.statements)} queries)")
+            for sql, lines, scans in check.statements:
+                if verbose or any(table not in check.allowed_scans for table in scans):
+                    print("       " + " ".join(sql.split()))
+                    for line in lines:
+                        print("         " + line)
+            for sql, table in failures:
+                print(f"       full scan of {table}")
+        if failed:
+            raise click.ClickException(f"{failed} route(s) scan a whole table")
+
+    """
+    Runs queued background jobs (see api/jobs.py), for example:
+    $ flask worker --concurrency 8
+    $ flask worker --processes --burst   # CPU-bound jobs, exit once the queue is empty
+    """
+    @app.cli.command("worker")
+    @click.option("--concurrency", default=DEFAULT_CONCURRENCY, show_default=True, help="Jobs run at once.")
+    @click.option("--processes", is_flag=True, help="Run jobs on a process pool instead of threads.")
+    @click.option("--poll-interval", default=DEFAULT_POLL_INTERVAL, show_default=True, help="Seconds between polls.")
+    @click.option("--burst", is_flag=True, help="Exit when the queue is empty.")
+    def worker_command(concurrency, processes, poll_interval, burst):
+        worker = Worker(app, concurrency=concurrency, processes=processes, poll_interval=poll_interval)
+        print(f"Worker {worker.worker_id} running {concurrency} {'processes' if processes else 'threads'}")
+        processed, failed = worker.run(burst=burst)
+        print(f"Processed {processed} jobs, {failed} failed")
+
+    """
+    Rebuilds the sitemap shards of products changed since the last run, so
+    crawlers never wait on a stale shard. Run it after a deploy or on a schedule:
+    $ flask build-sitemap
+    $ flask build-sitemap --full --base-url https://shop.example.com
+    """
+    @app.cli.command("build-sitemap")
+    @click.option("--full", is_flag=True, help="Rebuild every shard, not only the stale ones.")
+    @click.option("--base-url", default=None, help="Site root for the URLs (default SITEMAP_BASE_URL).")
+    def build_sitemap_command(full, base_url):
+        if base_url:
+            product_sitemap.base_url = base_url
+        try:
+            built, urls = product_sitemap.build(full=full)
+        except APIException as error:
+            raise click.ClickException(error.message)
+        print(f"Built {built} sitemap shards, {urls} URLs")
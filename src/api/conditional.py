@@ -0,0 +1,112 @@
+import hashlib
+from datetime import datetime, timezone
+from flask import abort, jsonify, make_response, request
+from sqlalchemy import func
+from .models import db
+from .pagination import keyset_window
+
+# Validators are derived from updated_at, which SQLite stores to the second:
+# two writes to one row within the same second share an ETag there. The
+# ETags are therefore weak, promising an equivalent representation rather
+# than a byte-identical one.
+
+
+def _as_http_date(updated_at):
+    if updated_at is None:
+        return None
+    if isinstance(updated_at, str):
+        updated_at = datetime.fromisoformat(updated_at)
+    # Timestamps are stored naive in UTC
+    return updated_at.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def _etag(*parts):
+    return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def _isoformat(updated_at):
+    return updated_at.isoformat() if isinstance(updated_at, datetime) else updated_at
+
+
+def is_conditional():
+    return bool(request.if_none_match) or request.if_modified_since is not None
+
+
+def is_fresh(etag, last_modified):
+    # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since is not None and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def _with_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def _not_modified(etag, last_modified):
+    return _with_validators(make_response("", 304), etag, last_modified)
+
+
+def resource_response(kind, id, probe, load, cache=None, fields=None):
+    """
+    Conditional GET for one resource. probe() returns the row's updated_at
+    (one indexed column, no hydration) or None when the row does not exist;
+    load() returns the full dict. A client holding a current copy gets a 304
+    without the row ever being hydrated or serialized. With fields, load()
+    returns those plus updated_at and only fields are sent.
+    """
+    # Each field selection is its own representation
+    tag = kind if fields is None else f"{kind}[{','.join(fields)}]"
+    data = cache.get(kind, id) if cache is not None else None
+    if data is None and is_conditional():
+        updated_at = probe()
+        if updated_at is None:
+            abort(404)
+        etag, last_modified = _etag(tag, id, _isoformat(updated_at)), _as_http_date(updated_at)
+        if is_fresh(etag, last_modified):
+            return _not_modified(etag, last_modified)
+
+    if data is None:
+        data = load()
+        if cache is not None:
+            cache.set(kind, id, data)
+
+    etag, last_modified = _etag(tag, id, data["updated_at"]), _as_http_date(data["updated_at"])
+    if is_fresh(etag, last_modified):
+        return _not_modified(etag, last_modified)
+    if fields is not None:
+        data = {key: data[key] for key in fields}
+    return _with_validators(jsonify(data), etag, last_modified)
+
+
+def probe_page(query, model):
+    """
+    max(updated_at), count(*) and a digest of the ids over the requested
+    page window, including its look-ahead row, so the cost stays O(page)
+    like the page itself. The ids catch deletes: the look-ahead row moving
+    into the page changes neither the count nor max(updated_at).
+    """
+    window, _, _ = keyset_window(query, model)
+    rows = window.with_entities(model.id.label("id"), model.updated_at.label("updated_at")).subquery()
+    return db.session.query(
+        func.max(rows.c.updated_at), func.count(),
+        func.min(rows.c.id), func.max(rows.c.id), func.sum(rows.c.id),
+    ).select_from(rows).one()
+
+
+def list_response(kind, query, model, build):
+    """
+    Conditional GET for a paginated list. The page is only loaded, by
+    build(query, model) -> Response, when the client's copy is stale.
+    """
+    max_updated_at, *membership = probe_page(query, model)
+    etag = _etag(kind, request.query_string.decode("utf-8"), _isoformat(max_updated_at), *membership)
+    last_modified = _as_http_date(max_updated_at)
+    if is_fresh(etag, last_modified):
+        return _not_modified(etag, last_modified)
+    return _with_validators(build(query, model), etag, last_modified)
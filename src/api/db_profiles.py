@@ -0,0 +1,127 @@
+import os
+from flask import jsonify
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from .models import db
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# single writer, and busy_timeout makes writers wait for the lock instead of
+# failing straight away with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "busy_timeout": 5000,
+    "cache_size": -64000,  # KiB
+}
+
+
+def database_uri():
+    """DATABASE_URL fixed up for SQLAlchemy, or the local SQLite fallback."""
+    db_url = os.getenv("DATABASE_URL")
+    if db_url:
+        return db_url.replace("postgres://", "postgresql://")  # Fix for psycopg2
+    return "sqlite:////tmp/test.db"
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _concurrency():
+    """(worker processes, threads per worker) gunicorn is started with."""
+    # Pooled connections are opened lazily, so over-estimating threads when
+    # GUNICORN_THREADS is unset (flask run, threaded) only costs idle slots.
+    return _env_int("WEB_CONCURRENCY", 1), _env_int("GUNICORN_THREADS", 5)
+
+
+def _pool_options(default_max_connections):
+    workers, threads = _concurrency()
+    # Each request thread holds at most one connection, so the pool only needs
+    # one per thread; overflow is whatever the server can spare per worker.
+    budget = _env_int("DB_MAX_CONNECTIONS", default_max_connections) // max(workers, 1)
+    pool_size = _env_int("DB_POOL_SIZE", threads)
+    return {
+        "pool_size": pool_size,
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", max(0, min(pool_size, budget - pool_size))),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 10),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+    }
+
+
+def sqlite_profile():
+    options = _pool_options(default_max_connections=64)
+    options.update({
+        "poolclass": QueuePool,
+        "pool_recycle": -1,
+        "connect_args": {"check_same_thread": False, "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000},
+    })
+    return options
+
+
+def postgres_profile():
+    options = _pool_options(default_max_connections=100)
+    options["pool_pre_ping"] = True
+    return options
+
+
+PROFILES = {
+    "sqlite": sqlite_profile,
+    "postgres": postgres_profile,
+    "default": dict,
+}
+
+
+def select_profile(database_uri):
+    profile = os.getenv("DB_PROFILE")
+    if profile:
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown DB_PROFILE {profile!r}, expected one of: {', '.join(PROFILES)}")
+        return profile
+    if database_uri.startswith("sqlite:"):
+        # In-memory databases live in one connection; leave their pooling alone
+        return "default" if ":memory:" in database_uri or database_uri == "sqlite://" else "sqlite"
+    if database_uri.startswith("postgresql"):
+        return "postgres"
+    return "default"
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def configure_engine(app):
+    """Sets SQLALCHEMY_ENGINE_OPTIONS from the selected profile. Call before db.init_app."""
+    profile = select_profile(app.config["SQLALCHEMY_DATABASE_URI"])
+    app.config["DB_PROFILE"] = profile
+    options = PROFILES[profile]()
+    options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+
+def setup_engine(app):
+    """Engine hooks and the pool health endpoint. Call after db.init_app."""
+    if app.config.get("DB_PROFILE") == "sqlite":
+        with app.app_context():
+            event.listen(db.engine, "connect", _apply_sqlite_pragmas)
+
+    @app.route("/health/db", methods=["GET"])
+    def db_pool_health():
+        pool = db.engine.pool
+        stats = {"profile": app.config.get("DB_PROFILE"), "pool": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            stats.update({
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "saturation": round(pool.checkedout() / capacity, 3) if capacity else None,
+            })
+        status = 503 if stats.get("saturation") is not None and stats["saturation"] >= 1 else 200
+        return jsonify(stats), status
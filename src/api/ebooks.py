@@ -0,0 +1,86 @@
+import re
+from flask import abort, url_for
+from sqlalchemy import select
+from .cache import catalog_cache
+from .file_store import ContentStore
+from .models import db, EBook
+from .serializers import serialize
+from .utils import APIException
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+MIMETYPES = {
+    "epub": "application/epub+zip",
+    "pdf": "application/pdf",
+    "mobi": "application/x-mobipocket-ebook",
+    "azw3": "application/vnd.amazon.ebook",
+}
+FORMATS = {mimetype: file_format for file_format, mimetype in MIMETYPES.items()}
+
+# EBOOK_STORE_DIR, EBOOK_STORE_SEND_MODE, EBOOK_STORE_ACCEL_PREFIX, EBOOK_STORE_MAX_BYTES
+ebook_store = ContentStore(max_size=DEFAULT_MAX_BYTES)
+
+
+def human_size(size):
+    if size < 1024:
+        return f"{size} B"
+    for unit in ("KB", "MB", "GB", "TB"):
+        size /= 1024
+        if size < 1024 or unit == "TB":
+            return f"{size:.1f} {unit}"
+
+
+def _download_name(name, file_format):
+    stem = re.sub(r"[^A-Za-z0-9]+", "-", name or "").strip("-").lower() or "ebook"
+    return f"{stem}.{file_format}" if file_format else stem
+
+
+def upload_ebook_file(ebook_id, stream, mimetype=None, content_length=None):
+    """
+    Streams an uploaded file into the content store and points the ebook at
+    it: content_sha256 and content_size are computed while the body is
+    written, file_size and download_url are refreshed from them. An ebook
+    content type sets file_format; application/octet-stream keeps it.
+    """
+    if mimetype in (None, "", "application/octet-stream"):
+        file_format = None
+    elif mimetype in FORMATS:
+        file_format = FORMATS[mimetype]
+    else:
+        raise APIException(f"EBook uploads must be one of: {', '.join(sorted(FORMATS))}", status_code=415)
+    if db.session.get(EBook, ebook_id) is None:
+        abort(404)
+    if content_length is not None and ebook_store.max_size is not None and content_length > ebook_store.max_size:
+        raise APIException(f"File is larger than {ebook_store.max_size} bytes", status_code=413)
+    # Give the connection back to the pool while the body uploads
+    db.session.commit()
+
+    digest, size = ebook_store.put(stream)
+    ebook = db.session.get(EBook, ebook_id)
+    if ebook is None:
+        abort(404)
+    if file_format is not None:
+        ebook.file_format = file_format
+    ebook.content_sha256 = digest
+    ebook.content_size = size
+    ebook.file_size = human_size(size)
+    ebook.download_url = url_for("api.download_ebook", ebook_id=ebook_id)
+    db.session.commit()
+    catalog_cache.invalidate("product", ebook_id)
+    return serialize(ebook)
+
+
+def ebook_download(ebook_id):
+    """The stored file of an ebook, from its precomputed digest; no hashing or reading here."""
+    row = db.session.execute(
+        select(EBook.name, EBook.file_format, EBook.content_sha256).where(EBook.id == ebook_id)
+    ).first()
+    if row is None:
+        abort(404)
+    if row.content_sha256 is None or not ebook_store.exists(row.content_sha256):
+        raise APIException("No file has been uploaded for this ebook", status_code=404)
+    file_format = (row.file_format or "").lower()
+    return ebook_store.send(
+        row.content_sha256, MIMETYPES.get(file_format, "application/octet-stream"),
+        _download_name(row.name, file_format),
+    )
@@ -0,0 +1,114 @@
+from flask import abort, request
+from sqlalchemy import func
+from .serializers import HIDDEN_FIELDS, converter_for, serialize, stream_page
+from .utils import APIException
+
+# Always selected: the keyset cursor and the conditional GET validators need them
+REQUIRED_COLUMNS = ("id", "updated_at")
+
+_field_columns = {}
+
+
+def field_columns(model):
+    """
+    {field: (SQL expression, tables it reads)} for model and every subclass
+    mapped under it, in to_dict() order. Fields declared by several subclass
+    tables (cover_type on books and comic_books) coalesce across them.
+    """
+    columns = _field_columns.get(model)
+    if columns is not None:
+        return columns
+    found = {}
+    for mapper in model.__mapper__.self_and_descendants:
+        for column in mapper.local_table.columns:
+            if column.key in HIDDEN_FIELDS or (mapper.inherits is not None and column.key == "id"):
+                continue
+            tables = found.setdefault(column.key, [])
+            if column not in tables:
+                tables.append(column)
+    columns = _field_columns[model] = {
+        key: (cols[0] if len(cols) == 1 else func.coalesce(*cols), [col.table for col in cols])
+        for key, cols in found.items()
+    }
+    return columns
+
+
+def requested_fields(model, args=None):
+    """
+    The ?fields= list, validated against model and always starting with id,
+    or None when the client wants every field.
+    """
+    args = request.args if args is None else args
+    raw = args.get("fields")
+    if raw is None:
+        return None
+    fields = [field.strip() for field in raw.split(",") if field.strip()]
+    allowed = field_columns(model)
+    unknown = [field for field in fields if field not in allowed]
+    if unknown or not fields:
+        raise APIException(
+            f"Unknown field(s): {', '.join(unknown) or '(none given)'}. "
+            f"Available fields: {', '.join(allowed)}",
+            status_code=400,
+        )
+    return tuple(dict.fromkeys(["id"] + fields))
+
+
+def sparse_query(query, model, fields):
+    """
+    query (a Query over model) narrowed to the columns behind fields. Only
+    the subclass tables those columns live in are outer joined, so a listing
+    of names and prices reads the products table alone.
+    """
+    columns = field_columns(model)
+    wanted = set(fields) | set(REQUIRED_COLUMNS)
+    base = model.__mapper__.local_table
+    entities, joins = [], []
+    for key, (expression, tables) in columns.items():
+        if key not in wanted:
+            continue
+        entities.append(expression.label(key))
+        joins += [table for table in tables if table is not base and table not in joins]
+    for table in joins:
+        query = query.outerjoin(table, table.c.id == base.c.id)
+    return query.with_entities(*entities)
+
+
+class RowEncoder:
+    """Builds the sparse dict for one row of a sparse_query(), converting like serialize()."""
+
+    def __init__(self, model, fields):
+        columns = field_columns(model)
+        self.fields = [(key, converter_for(columns[key][0].type)) for key in fields]
+
+    def __call__(self, row):
+        mapping = row._mapping
+        item = {}
+        for key, convert in self.fields:
+            value = mapping[key]
+            item[key] = convert(value) if convert is not None and value is not None else value
+        return item
+
+
+def page_builder(fields):
+    """The build function list_response() needs for fields (None: every field)."""
+    if fields is None:
+        return stream_page
+    return lambda query, model: stream_page(sparse_query(query, model, fields), model, RowEncoder(model, fields))
+
+
+def load_one(query, model, fields):
+    """
+    The single row of query as a dict: every field through serialize(), or
+    the sparse fields plus updated_at for the response validators. 404s when
+    there is no row.
+    """
+    if fields is None:
+        row = query.first()
+        if row is None:
+            abort(404)
+        return serialize(row)
+    row = sparse_query(query, model, fields).first()
+    if row is None:
+        abort(404)
+    return RowEncoder(model, tuple(dict.fromkeys(fields + ("updated_at",))))(row)
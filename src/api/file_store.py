@@ -0,0 +1,122 @@
+import base64
+import hashlib
+import os
+import re
+import tempfile
+from flask import current_app, request
+from werkzeug.utils import send_file
+from .utils import APIException
+
+CHUNK_SIZE = 1024 * 1024
+DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+# How a stored file reaches the client:
+#   sendfile   - the WSGI server streams it, with sendfile(2) when it can (gunicorn does)
+#   x-sendfile - Apache/lighttpd read it from disk after an X-Sendfile header
+#   x-accel    - nginx serves it from an internal location after an X-Accel-Redirect header
+SEND_MODES = ("sendfile", "x-sendfile", "x-accel")
+
+
+class ContentStore:
+    """
+    Files on local disk named by the SHA-256 of their content
+    (<root>/ab/cd/abcd...), so identical uploads are stored once and a
+    stored file never changes. Writes hash the stream while copying it to
+    a temporary file, then rename it into place.
+    """
+
+    def __init__(self, root=None, send_mode="sendfile", accel_prefix="/protected/", max_size=None):
+        self.root = root
+        self.send_mode = send_mode
+        self.accel_prefix = accel_prefix
+        self.max_size = max_size
+
+    def init_app(self, app, prefix, default_dir):
+        app.config.setdefault(f"{prefix}_DIR", os.getenv(f"{prefix}_DIR", os.path.join(app.instance_path, default_dir)))
+        app.config.setdefault(f"{prefix}_SEND_MODE", os.getenv(f"{prefix}_SEND_MODE", "sendfile"))
+        app.config.setdefault(f"{prefix}_ACCEL_PREFIX", os.getenv(f"{prefix}_ACCEL_PREFIX", f"/protected/{default_dir}/"))
+        app.config.setdefault(f"{prefix}_MAX_BYTES", int(os.getenv(f"{prefix}_MAX_BYTES", self.max_size or 0)) or None)
+        if app.config[f"{prefix}_SEND_MODE"] not in SEND_MODES:
+            raise ValueError(f"{prefix}_SEND_MODE must be one of {', '.join(SEND_MODES)}")
+        self.root = app.config[f"{prefix}_DIR"]
+        self.send_mode = app.config[f"{prefix}_SEND_MODE"]
+        self.accel_prefix = app.config[f"{prefix}_ACCEL_PREFIX"]
+        self.max_size = app.config[f"{prefix}_MAX_BYTES"]
+
+    def relpath(self, digest):
+        if not DIGEST.match(digest or ""):
+            raise ValueError(f"Not a SHA-256 digest: {digest!r}")
+        return f"{digest[:2]}/{digest[2:4]}/{digest}"
+
+    def path(self, digest):
+        return os.path.join(self.root, *self.relpath(digest).split("/"))
+
+    def exists(self, digest):
+        return os.path.isfile(self.path(digest))
+
+    def delete(self, digest):
+        try:
+            os.unlink(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+    def put(self, stream, chunk_size=CHUNK_SIZE):
+        """
+        Copies stream into the store chunk by chunk and returns (digest, size).
+        Never holds more than one chunk in memory. Raises a 413 APIException
+        once the stream passes max_size bytes.
+        """
+        max_size = self.max_size
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            sha256, size = hashlib.sha256(), 0
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise APIException(f"File is larger than {max_size} bytes", status_code=413)
+                    sha256.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            digest = sha256.hexdigest()
+            path = self.path(digest)
+            if os.path.isfile(path):
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, path)
+            return digest, size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def send(self, digest, mimetype, download_name, as_attachment=True):
+        """
+        Download response for a stored file, with the digest as a strong ETag
+        and a Repr-Digest header. In sendfile mode werkzeug answers Range and
+        If-Range requests; with a front server hand-off the front server
+        does. Either way the file content never passes through Python.
+        """
+        if self.send_mode == "x-accel":
+            response = current_app.response_class(mimetype=mimetype)
+            response.headers["X-Accel-Redirect"] = self.accel_prefix + self.relpath(digest)
+            response.headers["Content-Disposition"] = f'{"attachment" if as_attachment else "inline"}; filename="{download_name}"'
+            response.set_etag(digest)
+            response = response.make_conditional(request)
+        else:
+            response = send_file(
+                self.path(digest), request.environ, mimetype=mimetype, as_attachment=as_attachment,
+                download_name=download_name, conditional=True, etag=digest,
+                use_x_sendfile=self.send_mode == "x-sendfile", response_class=current_app.response_class,
+            )
+        response.headers["Repr-Digest"] = f"sha-256=:{base64.b64encode(bytes.fromhex(digest)).decode('ascii')}:"
+        response.cache_control.private = True
+        return response
@@ -0,0 +1,248 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import Integer, Numeric, String, select
+from sqlalchemy.exc import DBAPIError
+from .models import db, Product, PRODUCT_MODELS
+
+DEFAULT_CHUNK_SIZE = 1000
+# Each chunk is held in memory until it is written, so clients cannot ask for more
+MAX_CHUNK_SIZE = 10 * DEFAULT_CHUNK_SIZE
+
+# Columns filled in by the database or by the importer itself
+_MANAGED_COLUMNS = {"id", "product_type", "created_at", "updated_at"}
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.errors = []
+
+    def fail(self, line, row, message):
+        sku = row.get("sku") if isinstance(row, dict) else None
+        self.errors.append({"line": line, "sku": sku, "error": str(message)})
+
+    def to_dict(self):
+        return {
+            "inserted": self.inserted,
+            "failed": len(self.errors),
+            "errors": self.errors,
+        }
+
+
+# -------------------- Parsing --------------------
+
+def _is_utf8(text):
+    """False for text decoded with errors="surrogateescape" from invalid UTF-8."""
+    try:
+        text.encode("utf-8")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def iter_ndjson(lines):
+    for line_no, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="surrogateescape")
+        line = line.strip()
+        if not line:
+            continue
+        if not _is_utf8(line):
+            yield line_no, RowError("Invalid UTF-8")
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, RowError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(row, dict):
+            yield line_no, RowError("Each line must be a JSON object")
+            continue
+        yield line_no, row
+
+
+def iter_csv(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        # Empty CSV cells mean "not given", not the empty string
+        row = {k: v for k, v in row.items() if k and v not in ("", None)}
+        if not all(_is_utf8(k) and _is_utf8(v) for k, v in row.items()):
+            yield reader.line_num, RowError("Invalid UTF-8")
+            continue
+        yield reader.line_num, row
+
+
+# -------------------- Validation --------------------
+
+def _model_tables(model):
+    """Tables written for a model, base table first (products, books, ...)."""
+    return [m.local_table for m in reversed(list(model.__mapper__.iterate_to_root()))]
+
+
+def _coerce(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, Integer):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise RowError(f"{column.name} must be an integer")
+    if isinstance(column.type, Numeric):
+        try:
+            return Decimal(str(value))
+        except InvalidOperation:
+            raise RowError(f"{column.name} must be a number")
+    if isinstance(column.type, String):
+        value = str(value)
+        if column.type.length and len(value) > column.type.length:
+            raise RowError(f"{column.name} is longer than {column.type.length} characters")
+    return value
+
+
+def validate_row(row):
+    """
+    Checks a raw row against the columns of its product_type and returns
+    (model, {table: values}) ready to be inserted. Raises RowError otherwise.
+    """
+    if isinstance(row, Exception):
+        raise row
+    row = dict(row)
+    product_type = row.pop("product_type", "product")
+    model = PRODUCT_MODELS.get(product_type)
+    if model is None:
+        raise RowError("Invalid product type")
+
+    values = {}
+    for table in _model_tables(model):
+        table_values = {}
+        for column in table.columns:
+            if column.name in _MANAGED_COLUMNS:
+                continue
+            value = _coerce(column, row.pop(column.name, None))
+            if value is None:
+                if not column.nullable and column.default is None and column.server_default is None:
+                    raise RowError(f"{column.name} is required")
+                continue
+            table_values[column.name] = value
+        values[table] = table_values
+    values[Product.__table__]["product_type"] = model.__mapper__.polymorphic_identity
+
+    if row:
+        raise RowError(f"Unknown fields for {product_type}: {', '.join(sorted(row))}")
+    return model, values
+
+
+# -------------------- Inserting --------------------
+
+def _drop_conflicts(chunk, report):
+    """Removes rows whose unique values are already taken, in the database or
+    earlier in the same chunk, so one duplicate cannot fail a whole batch."""
+    taken = {}
+    for _, _, values in chunk:
+        for table, table_values in values.items():
+            for column in table.columns:
+                if column.unique and column.name in table_values:
+                    taken.setdefault(column, set()).add(table_values[column.name])
+    for column, candidates in taken.items():
+        existing = db.session.execute(
+            select(column).where(column.in_(candidates))
+        ).scalars()
+        taken[column] = set(existing)
+
+    kept = []
+    for line, model, values in chunk:
+        conflict = None
+        for table, table_values in values.items():
+            for column in table.columns:
+                if column in taken and column.name in table_values:
+                    if table_values[column.name] in taken[column]:
+                        conflict = f"{column.name} {table_values[column.name]!r} already exists"
+                    else:
+                        taken[column].add(table_values[column.name])
+        if conflict:
+            report.fail(line, values[Product.__table__], conflict)
+        else:
+            kept.append((line, model, values))
+    return kept
+
+
+def _insert_rows(table, rows):
+    # An executemany takes its columns from the first row, so rows setting
+    # different optional columns go out as separate batches; padding them
+    # with NULLs would override the column defaults
+    batches = {}
+    for row in rows:
+        batches.setdefault(frozenset(row), []).append(row)
+    for batch in batches.values():
+        db.session.execute(table.insert(), batch)
+
+
+def _insert_chunk(chunk):
+    products = Product.__table__
+    _insert_rows(products, [values[products] for _, _, values in chunk])
+
+    # Parent ids come back through the unique sku, which works the same on
+    # every backend and keeps the whole chunk to a handful of statements.
+    skus = [values[products]["sku"] for _, _, values in chunk]
+    ids = dict(db.session.execute(
+        select(products.c.sku, products.c.id).where(products.c.sku.in_(skus))
+    ).all())
+
+    subclass_rows = {}
+    for _, _, values in chunk:
+        product_id = ids[values[products]["sku"]]
+        for table, table_values in values.items():
+            if table is not products:
+                subclass_rows.setdefault(table, []).append(dict(table_values, id=product_id))
+    # Insertion order already puts parent tables first (books before children_books)
+    for table, table_rows in subclass_rows.items():
+        _insert_rows(table, table_rows)
+
+
+def _flush(chunk, report):
+    chunk = _drop_conflicts(chunk, report)
+    if not chunk:
+        return
+    try:
+        _insert_chunk(chunk)
+        db.session.commit()
+        report.inserted += len(chunk)
+    except DBAPIError:
+        db.session.rollback()
+        # Replay the chunk row by row to pin the failure on the offending rows
+        for row in chunk:
+            try:
+                _insert_chunk([row])
+                db.session.commit()
+                report.inserted += 1
+            except DBAPIError as e:
+                db.session.rollback()
+                report.fail(row[0], row[2][Product.__table__], e.orig)
+
+
+def import_products(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Imports (line, row) pairs from iter_ndjson / iter_csv. Rows are validated
+    as they stream in and written chunk_size at a time, one commit per chunk;
+    invalid rows are reported and skipped instead of aborting the import.
+    """
+    report = ImportReport()
+    chunk = []
+    for line, row in rows:
+        try:
+            model, values = validate_row(row)
+        except RowError as e:
+            report.fail(line, row, e)
+            continue
+        chunk.append((line, model, values))
+        if len(chunk) >= chunk_size:
+            _flush(chunk, report)
+            chunk = []
+    if chunk:
+        _flush(chunk, report)
+    return report
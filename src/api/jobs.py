@@ -0,0 +1,277 @@
+import logging
+import os
+import signal
+import socket
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, update
+from .models import db, Job
+from .utils import APIException
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 300
+# A running job whose worker has not finished it after this long is assumed
+# lost with its worker and goes back on the queue
+LEASE_SECONDS = 600
+STATS_WINDOW_SECONDS = 60
+
+log = logging.getLogger("api.jobs")
+
+tasks = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a job whose input is invalid: it fails without being retried."""
+
+
+def task(name):
+    """Registers the decorated function as the job called name. It gets the job payload."""
+    def register(function):
+        tasks[name] = function
+        return function
+    return register
+
+
+def _now():
+    # Job timestamps are written and compared from Python in naive UTC, so
+    # SQLite's text timestamps always share one format
+    return datetime.utcnow().replace(microsecond=0)
+
+
+def enqueue(name, payload=None, priority=0, max_attempts=DEFAULT_MAX_ATTEMPTS, delay=0):
+    """
+    Queues a job for `flask worker` and returns it. Lower priority values run
+    first, like nice; jobs of equal priority run oldest first.
+    """
+    if name not in tasks:
+        raise ValueError(f"Unknown job {name!r}")
+    job = Job(name=name, payload=payload, priority=priority, max_attempts=max_attempts,
+              run_at=_now() + timedelta(seconds=delay))
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def claim(limit, worker_id):
+    """
+    Marks up to limit runnable jobs as running under a fresh claim token and
+    returns them. On Postgres the candidate rows are locked with SKIP LOCKED,
+    so concurrent workers each take different jobs without waiting on each
+    other; SQLite has one writer at a time, which makes the UPDATE atomic.
+    """
+    token = f"{worker_id}:{uuid.uuid4().hex[:12]}"
+    now = _now()
+    candidates = (
+        select(Job.id)
+        .where(Job.status == "queued", Job.run_at <= now)
+        .order_by(Job.priority, Job.run_at, Job.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    db.session.execute(
+        update(Job.__table__)
+        .where(Job.id.in_(candidates.scalar_subquery()))
+        .values(status="running", locked_by=token, locked_at=now, attempts=Job.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    jobs = db.session.execute(
+        select(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts)
+        .where(Job.status == "running", Job.locked_by == token)
+        .order_by(Job.priority, Job.run_at, Job.id)
+    ).all()
+    db.session.commit()
+    return token, jobs
+
+
+def _finish(job_id, token, **values):
+    # Guarded by the claim token: a job requeued as stale may already be
+    # running elsewhere, and its new owner decides what happens to it
+    db.session.execute(
+        update(Job.__table__)
+        .where(Job.id == job_id, Job.locked_by == token)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def complete(job, token, result):
+    _finish(job.id, token, status="done", result=result, finished_at=_now(), last_error=None)
+
+
+def fail(job, token, error, retryable=True):
+    if retryable and job.attempts < job.max_attempts:
+        backoff = min(RETRY_BASE_SECONDS * 2 ** (job.attempts - 1), RETRY_MAX_SECONDS)
+        _finish(job.id, token, status="queued", locked_by=None, locked_at=None,
+                run_at=_now() + timedelta(seconds=backoff), last_error=error)
+    else:
+        _finish(job.id, token, status="failed", finished_at=_now(), last_error=error)
+
+
+def requeue_stale(lease_seconds=LEASE_SECONDS):
+    """Puts jobs left running past their lease back on the queue. Returns how many."""
+    result = db.session.execute(
+        update(Job.__table__)
+        .where(Job.status == "running", Job.locked_at < _now() - timedelta(seconds=lease_seconds))
+        .values(status="queued", locked_by=None, locked_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def queue_stats():
+    """Jobs per status, queue depth per priority and throughput over the last minute."""
+    now = _now()
+    by_status = dict(db.session.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+    by_priority = db.session.execute(
+        select(Job.priority, func.count()).where(Job.status == "queued").group_by(Job.priority)
+        .order_by(Job.priority)
+    ).all()
+    oldest = db.session.execute(
+        select(func.min(Job.run_at)).where(Job.status == "queued", Job.run_at <= now)
+    ).scalar()
+    window = now - timedelta(seconds=STATS_WINDOW_SECONDS)
+    finished = dict(db.session.execute(
+        select(Job.status, func.count()).where(Job.finished_at >= window).group_by(Job.status)
+    ).all())
+    return {
+        "depth": by_status.get("queued", 0),
+        "running": by_status.get("running", 0),
+        "statuses": by_status,
+        "queued_by_priority": {str(priority): count for priority, count in by_priority},
+        "oldest_runnable_age_s": (now - oldest).total_seconds() if oldest else 0,
+        "throughput": {
+            "window_s": STATS_WINDOW_SECONDS,
+            "done": finished.get("done", 0),
+            "failed": finished.get("failed", 0),
+            "per_s": round(finished.get("done", 0) / STATS_WINDOW_SECONDS, 3),
+        },
+    }
+
+
+# -------------------- Worker --------------------
+
+_process_app = None
+
+
+def _init_process():
+    # Connections inherited through fork belong to the parent
+    with _process_app.app_context():
+        db.engine.dispose(close=False)
+
+
+def _run_in_process(name, payload):
+    with _process_app.app_context():
+        try:
+            return tasks[name](payload)
+        except APIException as error:
+            # APIException does not survive pickling back to the parent
+            raise PermanentJobError(error.message)
+        finally:
+            db.session.remove()
+
+
+def run_task(app, name, payload):
+    with app.app_context():
+        try:
+            return tasks[name](payload)
+        finally:
+            db.session.remove()
+
+
+class Worker:
+    """
+    Claims jobs and runs them on a thread pool, or on a process pool for
+    CPU-bound jobs. The pool is kept full: whenever a job finishes, the next
+    poll claims as many jobs as there are free slots. SIGINT/SIGTERM stop
+    claiming and let the running jobs finish.
+    """
+
+    def __init__(self, app, concurrency=DEFAULT_CONCURRENCY, processes=False,
+                 poll_interval=DEFAULT_POLL_INTERVAL):
+        self.app = app
+        self.concurrency = concurrency
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = False
+        self.processed = 0
+        self.failed = 0
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def _executor(self):
+        if not self.processes:
+            return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job")
+        global _process_app
+        _process_app = self.app
+        return ProcessPoolExecutor(max_workers=self.concurrency, initializer=_init_process)
+
+    def _submit(self, executor, job):
+        if job.name not in tasks:
+            return None
+        if self.processes:
+            return executor.submit(_run_in_process, job.name, job.payload)
+        return executor.submit(run_task, self.app, job.name, job.payload)
+
+    def _record(self, job, token, future):
+        try:
+            result = future.result()
+        except (APIException, PermanentJobError) as error:
+            # The job's input is invalid; running it again will not help
+            fail(job, token, getattr(error, "message", str(error)), retryable=False)
+        except Exception:
+            fail(job, token, traceback.format_exc(limit=5))
+        else:
+            complete(job, token, result)
+            self.processed += 1
+            return
+        self.failed += 1
+        log.warning("Job %s (%s) failed on attempt %s/%s", job.id, job.name, job.attempts, job.max_attempts)
+
+    def run(self, burst=False):
+        """Processes jobs until stopped, or with burst until the queue is empty."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        in_flight = {}
+        with self.app.app_context(), self._executor() as executor:
+            requeued = requeue_stale()
+            if requeued:
+                log.warning("Requeued %s stale jobs", requeued)
+            last_sweep = time.monotonic()
+            while not (self.stopping and not in_flight):
+                claimed = []
+                free = self.concurrency - len(in_flight)
+                if free and not self.stopping:
+                    token, claimed = claim(free, self.worker_id)
+                    for job in claimed:
+                        future = self._submit(executor, job)
+                        if future is None:
+                            fail(job, token, f"Unknown job {job.name!r}", retryable=False)
+                            self.failed += 1
+                        else:
+                            in_flight[future] = (job, token)
+                if burst and not claimed and not in_flight:
+                    break
+                if in_flight:
+                    # With the pool full only a finished job frees a slot;
+                    # otherwise poll again for newly queued jobs
+                    full = len(in_flight) >= self.concurrency or self.stopping
+                    done, _ = wait(in_flight, timeout=None if full else self.poll_interval,
+                                   return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._record(*in_flight.pop(future), future)
+                elif not claimed:
+                    time.sleep(self.poll_interval)
+                if time.monotonic() - last_sweep > LEASE_SECONDS / 2:
+                    requeue_stale()
+                    last_sweep = time.monotonic()
+        return self.processed, self.failed
@@ -0,0 +1,173 @@
+import io
+import os
+from flask import abort, url_for
+from sqlalchemy import or_
+from .file_store import ContentStore
+from .models import db, Product, ProductAsset
+from .preflight import preflight
+from .print_specs import product_print_spec
+from .process_pool import BoundedProcessPool, PoolBusy
+from .serializers import serialize
+from .utils import APIException
+
+DEFAULT_MAX_BYTES = 1024 ** 3
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 4       # files waiting per pool worker
+DEFAULT_QUEUE_TIMEOUT = 5.0  # seconds an upload waits for a free slot
+
+ASSET_MIMETYPES = {
+    "cover": {"image/jpeg", "image/png", "image/tiff", "application/pdf"},
+    "interior": {"application/pdf"},
+}
+ASSET_VARIANTS = ("file", "thumbnail")
+
+
+class MediaBusy(PoolBusy):
+    """Raised when the processing pool is saturated; callers should answer 503."""
+
+
+class LocalStorage:
+    """
+    Serves assets from the local media store through /api/assets. The default
+    backend, and the stand-in for Cloudinary in development and tests.
+    """
+
+    def publish(self, asset_id, variant, path, digest, mimetype):
+        return url_for("api.get_asset_file", asset_id=asset_id, variant=variant)
+
+
+class CloudinaryStorage:
+    """Uploads assets to Cloudinary, configured from CLOUDINARY_URL."""
+
+    def __init__(self):
+        import cloudinary.uploader
+        self.uploader = cloudinary.uploader
+
+    def publish(self, asset_id, variant, path, digest, mimetype):
+        # upload_large sends the file in chunks instead of one request body
+        result = self.uploader.upload_large(
+            path, public_id=digest, overwrite=False,
+            resource_type="image" if mimetype.startswith("image/") else "raw",
+        )
+        return result["secure_url"]
+
+
+def create_storage(name):
+    if name == "local":
+        return LocalStorage()
+    if name == "cloudinary":
+        return CloudinaryStorage()
+    raise ValueError(f"Unknown media storage: {name}")
+
+
+class MediaLibrary:
+    """
+    Product cover and interior uploads. Bodies are streamed into a local
+    content store; preflight checks and thumbnails run on a
+    BoundedProcessPool, and a saturated pool raises MediaBusy. The stored
+    files are published through the configured storage backend.
+    """
+
+    def __init__(self):
+        self.store = ContentStore(max_size=DEFAULT_MAX_BYTES)
+        self.storage = LocalStorage()
+        self.configure(DEFAULT_WORKERS, DEFAULT_QUEUE_SIZE, DEFAULT_QUEUE_TIMEOUT)
+
+    def configure(self, workers, queue_size, queue_timeout):
+        if getattr(self, "_pool", None) is not None:
+            self._pool.shutdown()
+        self._pool = BoundedProcessPool(workers, queue_size, queue_timeout, busy=MediaBusy,
+                                        busy_message="Upload processing is saturated, retry shortly")
+
+    def init_app(self, app):
+        self.store.init_app(app, "MEDIA_STORE", "media")
+        app.config.setdefault("MEDIA_STORAGE", os.getenv("MEDIA_STORAGE", "local"))
+        app.config.setdefault("MEDIA_PROCESS_WORKERS", int(os.getenv("MEDIA_PROCESS_WORKERS", DEFAULT_WORKERS)))
+        app.config.setdefault("MEDIA_PROCESS_QUEUE_SIZE", int(os.getenv("MEDIA_PROCESS_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)))
+        app.config.setdefault("MEDIA_PROCESS_QUEUE_TIMEOUT", float(os.getenv("MEDIA_PROCESS_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT)))
+        self.storage = create_storage(app.config["MEDIA_STORAGE"])
+        self.configure(
+            app.config["MEDIA_PROCESS_WORKERS"],
+            app.config["MEDIA_PROCESS_QUEUE_SIZE"],
+            app.config["MEDIA_PROCESS_QUEUE_TIMEOUT"],
+        )
+
+    def upload(self, product_id, kind, stream, mimetype, filename=None, content_length=None):
+        """
+        Stores an uploaded cover or interior of a printable product, checks
+        it against the product's print spec and records it as a
+        ProductAsset. Returns the asset dict.
+        """
+        if kind not in ASSET_MIMETYPES:
+            abort(404)
+        if mimetype not in ASSET_MIMETYPES[kind]:
+            raise APIException(f"{kind.title()} uploads must be one of: {', '.join(sorted(ASSET_MIMETYPES[kind]))}",
+                               status_code=415)
+        product = db.session.get(Product, product_id)
+        if product is None:
+            abort(404)
+        spec = product_print_spec(product)
+        max_size = self.store.max_size
+        if content_length is not None and max_size is not None and content_length > max_size:
+            raise APIException(f"File is larger than {max_size} bytes", status_code=413)
+        # Give the connection back to the pool while the body uploads and is processed
+        db.session.commit()
+
+        # The body is stored before a processing slot is taken: slow clients
+        # must not hold slots while the pool sits idle
+        digest, size = self.store.put(stream)
+        path = self.store.path(digest)
+        try:
+            result = self._pool.run(preflight, path, mimetype, kind, spec)
+        except Exception:
+            self._discard(digest)
+            raise
+        filename = os.path.basename(filename or "")[:255] or None
+        thumbnail = None
+        if result["thumbnail"] is not None:
+            thumbnail, _ = self.store.put(io.BytesIO(result["thumbnail"]))
+
+        asset = ProductAsset(
+            product_id=product_id, kind=kind, filename=filename, mimetype=mimetype,
+            content_sha256=digest, content_size=size, thumbnail_sha256=thumbnail,
+            preflight_passed=result["passed"],
+            preflight={"info": result["info"], "checks": result["checks"]},
+        )
+        try:
+            db.session.add(asset)
+            db.session.flush()
+            asset.url = self.storage.publish(asset.id, "file", path, digest, mimetype)
+            if thumbnail is not None:
+                asset.thumbnail_url = self.storage.publish(
+                    asset.id, "thumbnail", self.store.path(thumbnail), thumbnail, "image/jpeg")
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return serialize(asset)
+
+    def _discard(self, digest):
+        """Deletes a stored file that no asset points at, e.g. after MediaBusy."""
+        in_use = db.session.query(ProductAsset.id).filter(
+            or_(ProductAsset.content_sha256 == digest, ProductAsset.thumbnail_sha256 == digest)
+        ).first()
+        db.session.rollback()
+        if in_use is None:
+            self.store.delete(digest)
+
+    def send(self, asset_id, variant):
+        if variant not in ASSET_VARIANTS:
+            abort(404)
+        asset = db.session.get(ProductAsset, asset_id)
+        if asset is None:
+            abort(404)
+        if variant == "thumbnail":
+            if asset.thumbnail_sha256 is None:
+                abort(404)
+            return self.store.send(asset.thumbnail_sha256, "image/jpeg", f"{asset.kind}-{asset.id}-thumbnail.jpg",
+                                   as_attachment=False)
+        extension = os.path.splitext(asset.filename or "")[1] or ""
+        return self.store.send(asset.content_sha256, asset.mimetype, f"{asset.kind}-{asset.id}{extension}")
+
+
+media_library = MediaLibrary()
@@ -0,0 +1,196 @@
+import logging
+import os
+import threading
+import time
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .models import db
+from .serializers import FastJSONProvider
+
+DEFAULT_SLOW_QUERY_MS = 200
+# Request latency buckets in seconds, Prometheus style
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_query_log = logging.getLogger("api.slow_queries")
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestMetrics:
+    """
+    Per-request SQL and latency accounting. Query counts and times come from
+    SQLAlchemy cursor events, JSON encoding time from the app's JSON provider,
+    and whatever is left of the request (routing, ORM hydration, to_dict) is
+    reported as "app". Every response carries a Server-Timing header and
+    /metrics serves the per-process aggregates in Prometheus text format.
+
+    Streamed responses (list pages) run their page query and encode their
+    rows after the headers are sent. Their aggregates are recorded when the
+    body is finished and include that work; their Server-Timing header can
+    only cover what happened before the body started.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.latency = {}        # (blueprint, method) -> Histogram
+        self.db_seconds = {}     # blueprint -> total SQL seconds
+        self.db_queries = {}     # blueprint -> total SQL statements
+        self.slow_queries = 0
+        self.slow_query_ms = DEFAULT_SLOW_QUERY_MS
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("SLOW_QUERY_MS", float(os.getenv("SLOW_QUERY_MS", DEFAULT_SLOW_QUERY_MS)))
+        self.slow_query_ms = app.config["SLOW_QUERY_MS"]
+
+        app.json = TimedJSONProvider(app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule("/metrics", "metrics", self.metrics_view, methods=["GET"])
+
+        event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+
+    # -------------------- Hooks --------------------
+
+    def _before_request(self):
+        g.request_started = time.perf_counter()
+        g.db_queries = 0
+        g.db_seconds = 0.0
+        g.json_seconds = 0.0
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the statement's execution context rather than the pooled
+        # connection, so a statement that raises (and never reaches
+        # after_cursor_execute) leaves nothing behind for the next one.
+        # The few statements run without a context never overlap.
+        if context is not None:
+            context._query_started = time.perf_counter()
+        else:
+            conn.info["query_started"] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = context._query_started if context is not None else conn.info.pop("query_started")
+        elapsed = time.perf_counter() - started
+        if not has_request_context() or "request_started" not in g:
+            return
+        g.db_queries += 1
+        g.db_seconds += elapsed
+        if elapsed * 1000 >= self.slow_query_ms:
+            with self._lock:
+                self.slow_queries += 1
+            slow_query_log.warning(
+                "Slow query (%.1f ms) in %s: %s", elapsed * 1000, request.endpoint, statement
+            )
+
+    def _after_request(self, response):
+        if "request_started" not in g:
+            return response
+        total = time.perf_counter() - g.request_started
+        app_seconds = max(total - g.db_seconds - g.json_seconds, 0)
+        response.headers["Server-Timing"] = ", ".join([
+            f'db;dur={g.db_seconds * 1000:.2f};desc="{g.db_queries} queries"',
+            f"json;dur={g.json_seconds * 1000:.2f}",
+            f"app;dur={app_seconds * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ])
+
+        key = (request.blueprint or "app", request.method)
+        if response.is_streamed:
+            # The streamed body keeps adding to this request's g until it is closed
+            timings = g._get_current_object()
+            response.call_on_close(lambda: self._record(key, timings))
+        else:
+            self._record(key, g)
+        return response
+
+    def _record(self, key, timings):
+        total = time.perf_counter() - timings.request_started
+        blueprint = key[0]
+        with self._lock:
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.latency[key].observe(total)
+            self.db_seconds[blueprint] = self.db_seconds.get(blueprint, 0.0) + timings.db_seconds
+            self.db_queries[blueprint] = self.db_queries.get(blueprint, 0) + timings.db_queries
+
+    # -------------------- Exposition --------------------
+
+    def _pool_gauges(self):
+        pool = db.engine.pool
+        gauges = {}
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, name, None)
+            if method is not None:
+                gauges[name] = method()
+        return gauges
+
+    def render(self):
+        lines = [
+            "# HELP http_request_duration_seconds Request latency per blueprint.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (blueprint, method), histogram in sorted(self.latency.items()):
+                labels = f'blueprint="{blueprint}",method="{method}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {histogram.count}")
+
+            lines += ["# HELP db_query_seconds_total Time spent in SQL per blueprint.",
+                      "# TYPE db_query_seconds_total counter"]
+            for blueprint, seconds in sorted(self.db_seconds.items()):
+                lines.append(f'db_query_seconds_total{{blueprint="{blueprint}"}} {seconds:.6f}')
+            lines += ["# HELP db_queries_total SQL statements executed per blueprint.",
+                      "# TYPE db_queries_total counter"]
+            for blueprint, count in sorted(self.db_queries.items()):
+                lines.append(f'db_queries_total{{blueprint="{blueprint}"}} {count}')
+            lines += ["# HELP db_slow_queries_total Statements slower than SLOW_QUERY_MS.",
+                      "# TYPE db_slow_queries_total counter",
+                      f"db_slow_queries_total {self.slow_queries}"]
+
+        lines += ["# HELP db_pool_connections Connection pool state.",
+                  "# TYPE db_pool_connections gauge"]
+        for state, value in self._pool_gauges().items():
+            lines.append(f'db_pool_connections{{state="{state}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def metrics_view(self):
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+
+class TimedJSONProvider(FastJSONProvider):
+    """JSON provider that adds its encoding time to the current request."""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            if has_request_context() and "json_seconds" in g:
+                g.json_seconds += time.perf_counter() - started
+
+
+request_metrics = RequestMetrics()
@@ -1,12 +1,16 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.orm import object_session, with_polymorphic
 from sqlalchemy.sql import func
-from werkzeug.security import generate_password_hash, check_password_hash
+from .passwords import password_hasher
 
 db = SQLAlchemy()
 
 # User Model
 class User(db.Model):
     __tablename__ = "users"
+    # Supports keyset pagination ordered by (updated_at, id)
+    __table_args__ = (db.Index("ix_users_updated_at_id", "updated_at", "id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(255), unique=True, nullable=False)
@@ -19,11 +23,12 @@ class User(db.Model):
 
     orders = db.relationship("Order", back_populates="customer", cascade="all, delete")
 
+    # Hashing runs on the password_hasher process pool and may raise HasherBusy
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
 
     def to_dict(self):
         return {
@@ -40,6 +45,13 @@ class User(db.Model):
 # Base Product Model
 class Product(db.Model):
     __tablename__ = "products"
+    __table_args__ = (
+        # Supports keyset pagination ordered by (updated_at, id)
+        db.Index("ix_products_updated_at_id", "updated_at", "id"),
+        # Keyset pages filtered by ?type= and /standard_specifications/<type>
+        db.Index("ix_products_product_type_id", "product_type", "id"),
+        db.Index("ix_products_product_type_updated_at_id", "product_type", "updated_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     product_type = db.Column(db.String(50), nullable=False)
@@ -67,7 +79,18 @@ class Product(db.Model):
         }
 
 
+@event.listens_for(Product, "before_update", propagate=True)
+def _touch_product(mapper, connection, target):
+    # onupdate only fires when the products row itself is written; a change
+    # to a subclass table alone (a book's author, a comic's page_count) must
+    # still move updated_at, which the ETags and the sitemap are built from
+    if object_session(target).is_modified(target, include_collections=False):
+        target.updated_at = func.now()
+
+
 # Specialized Product Models
+# Pages of products are read through polymorphic_product(), which joins the
+# subclass tables into the page query itself.
 class Book(Product):
     __tablename__ = "books"
 
@@ -145,6 +168,9 @@ class EBook(Product):
     file_format = db.Column(db.String(20), nullable=False)
     download_url = db.Column(db.String(255), nullable=False)
     file_size = db.Column(db.String(50), nullable=True)
+    # The uploaded file in the local content store, hashed and sized on upload
+    content_sha256 = db.Column(db.String(64), nullable=True)
+    content_size = db.Column(db.BigInteger, nullable=True)
 
     __mapper_args__ = {"polymorphic_identity": "ebook"}
 
@@ -154,6 +180,8 @@ class EBook(Product):
             "file_format": self.file_format,
             "download_url": self.download_url,
             "file_size": self.file_size,
+            "content_sha256": self.content_sha256,
+            "content_size": self.content_size,
         }
         return {**base_dict, **ebook_dict}
 
@@ -161,15 +189,23 @@ class EBook(Product):
 # Order Model
 class Order(db.Model):
     __tablename__ = "orders"
+    # A retried checkout carries the same Idempotency-Key; this makes the
+    # second insert fail instead of creating a duplicate order
+    __table_args__ = (
+        db.UniqueConstraint("customer_id", "idempotency_key", name="uq_orders_customer_id_idempotency_key"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
     status = db.Column(db.String(50), nullable=False)
     total_price = db.Column(db.DECIMAL(10, 2), nullable=False)
+    idempotency_key = db.Column(db.String(255), nullable=True)
+    request_hash = db.Column(db.String(64), nullable=True)
     created_at = db.Column(db.DateTime, server_default=func.now())
     updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
 
     customer = db.relationship("User", back_populates="orders")
+    items = db.relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
     def to_dict(self):
         return {
@@ -182,9 +218,41 @@ class Order(db.Model):
         }
 
 
+# Order Item Model
+class OrderItem(db.Model):
+    __tablename__ = "order_items"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_price = db.Column(db.DECIMAL(10, 2), nullable=False)
+    line_total = db.Column(db.DECIMAL(10, 2), nullable=False)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+
+    order = db.relationship("Order", back_populates="items")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "order_id": self.order_id,
+            "product_id": self.product_id,
+            "quantity": self.quantity,
+            "unit_price": str(self.unit_price),
+            "line_total": str(self.line_total),
+            "created_at": self.created_at.isoformat(),
+        }
+
+
 # Pricing Model
 class Pricing(db.Model):
     __tablename__ = "pricing"
+    # Supports keyset pagination ordered by (updated_at, id)
+    __table_args__ = (
+        db.Index("ix_pricing_updated_at_id", "updated_at", "id"),
+        # One pricing row per product; bulk repricing upserts on this key
+        db.UniqueConstraint("product_id", name="uq_pricing_product_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
@@ -229,3 +297,109 @@ class ChildrenBook(Book):
         }
         return {**base_dict, **children_dict}
 
+
+# Background Job Model
+class Job(db.Model):
+    __tablename__ = "jobs"
+    # Workers claim the highest priority, oldest runnable job first
+    __table_args__ = (db.Index("ix_jobs_status_priority_run_at_id", "status", "priority", "run_at", "id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "payload": self.payload,
+            "status": self.status,
+            "priority": self.priority,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "run_at": self.run_at.isoformat(),
+            "locked_by": self.locked_by,
+            "locked_at": self.locked_at.isoformat() if self.locked_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "last_error": self.last_error,
+            "result": self.result,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+        }
+
+
+# Uploaded cover art and interior files of printable products
+class ProductAsset(db.Model):
+    __tablename__ = "product_assets"
+    __table_args__ = (db.Index("ix_product_assets_product_id_kind_id", "product_id", "kind", "id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    filename = db.Column(db.String(255), nullable=True)
+    mimetype = db.Column(db.String(100), nullable=False)
+    content_sha256 = db.Column(db.String(64), nullable=False)
+    content_size = db.Column(db.BigInteger, nullable=False)
+    url = db.Column(db.String(500), nullable=True)
+    thumbnail_sha256 = db.Column(db.String(64), nullable=True)
+    thumbnail_url = db.Column(db.String(500), nullable=True)
+    preflight_passed = db.Column(db.Boolean, nullable=False, default=False)
+    preflight = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "product_id": self.product_id,
+            "kind": self.kind,
+            "filename": self.filename,
+            "mimetype": self.mimetype,
+            "content_sha256": self.content_sha256,
+            "content_size": self.content_size,
+            "url": self.url,
+            "thumbnail_sha256": self.thumbnail_sha256,
+            "thumbnail_url": self.thumbnail_url,
+            "preflight_passed": self.preflight_passed,
+            "preflight": self.preflight,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+        }
+
+
+# Maps the public product_type values to their model classes
+PRODUCT_MODELS = {
+    "book": Book,
+    "comic_book": ComicBook,
+    "children_book": ChildrenBook,
+    "tshirt": TShirt,
+    "ebook": EBook,
+    "product": Product,
+}
+
+
+def polymorphic_product(product_type=None):
+    """
+    Product joined to the table of product_type and of every type it
+    inherits from (to every subclass table when product_type is None), so
+    one SELECT loads all columns. A plain Product query lazy-loads the
+    subclass tables row by row, which also fails outright under an async
+    driver.
+    """
+    if product_type is None:
+        return with_polymorphic(Product, "*")
+    model = PRODUCT_MODELS.get(product_type, Product)
+    lineage = [cls for cls in model.__mro__ if isinstance(cls, type) and issubclass(cls, Product) and cls is not Product]
+    return with_polymorphic(Product, lineage) if lineage else Product
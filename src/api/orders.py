@@ -0,0 +1,171 @@
+import hashlib
+import json
+import random
+import time
+from decimal import Decimal
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from .models import db, User, Product, Pricing, Order, OrderItem
+from .serializers import serialize
+from .utils import APIException
+
+MAX_LINE_ITEMS = 100
+MAX_QUANTITY = 1000
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+# Attempts for a checkout that lost a deadlock or lock wait to another transaction
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF_SECONDS = 0.02
+# Postgres deadlock_detected and serialization_failure
+_RETRYABLE_PGCODES = {"40P01", "40001"}
+
+
+def _positive_int(value, name, upper):
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= upper:
+        raise APIException(f"{name} must be an integer between 1 and {upper}", status_code=400)
+    return value
+
+
+def parse_checkout(data):
+    """
+    Validates {"customer_id", "items": [{"product_id", "quantity"}]} and
+    returns (customer_id, {product_id: quantity}). Lines for the same
+    product are merged.
+    """
+    if not isinstance(data, dict):
+        raise APIException("Expected a JSON object", status_code=400)
+    customer_id = _positive_int(data.get("customer_id"), "customer_id", 2 ** 31 - 1)
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        raise APIException("items must be a non-empty list", status_code=400)
+    if len(items) > MAX_LINE_ITEMS:
+        raise APIException(f"An order can have at most {MAX_LINE_ITEMS} items", status_code=400)
+
+    quantities = {}
+    for item in items:
+        if not isinstance(item, dict):
+            raise APIException("Each item must be an object", status_code=400)
+        product_id = _positive_int(item.get("product_id"), "product_id", 2 ** 31 - 1)
+        quantity = _positive_int(item.get("quantity", 1), "quantity", MAX_QUANTITY)
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+        if quantities[product_id] > MAX_QUANTITY:
+            raise APIException(f"quantity must be an integer between 1 and {MAX_QUANTITY}", status_code=400)
+    return customer_id, quantities
+
+
+def request_hash(customer_id, quantities):
+    canonical = json.dumps([customer_id, sorted(quantities.items())], separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def order_response(order):
+    items = db.session.execute(
+        select(OrderItem).filter(OrderItem.order_id == order.id).order_by(OrderItem.id)
+    ).scalars().all()
+    return dict(serialize(order), items=[serialize(item) for item in items])
+
+
+def _replay(customer_id, idempotency_key, fingerprint):
+    """The order an earlier request with this key created, or None."""
+    order = Order.query.filter_by(customer_id=customer_id, idempotency_key=idempotency_key).first()
+    if order is not None and order.request_hash != fingerprint:
+        raise APIException("Idempotency-Key was already used for a different order", status_code=422)
+    return order
+
+
+def _unit_prices(product_ids):
+    """
+    {product_id: unit price} for the products being bought. Their pricing rows
+    are share-locked until commit: checkouts never block each other, but a
+    repricing has to wait until the orders quoting the old price are in.
+    Rows are locked in product_id order so concurrent checkouts cannot deadlock.
+    """
+    pricing = db.session.execute(
+        select(Pricing.product_id, Pricing.final_price)
+        .filter(Pricing.product_id.in_(product_ids))
+        .order_by(Pricing.product_id)
+        .with_for_update(read=True)
+    ).all()
+    prices = dict(pricing)
+    missing = [product_id for product_id in product_ids if product_id not in prices]
+    if missing:
+        # Products without a pricing row sell at their list price
+        prices.update(db.session.execute(
+            select(Product.id, Product.price).filter(Product.id.in_(missing))
+        ).all())
+    unknown = sorted(set(product_ids) - set(prices))
+    if unknown:
+        raise APIException(f"Unknown product(s): {', '.join(map(str, unknown))}", status_code=400)
+    return prices
+
+
+def _create_order(customer_id, quantities, idempotency_key, fingerprint):
+    # Inserting the order first takes SQLite's write lock up front, and on
+    # every database makes a concurrent retry with the same key fail on the
+    # unique constraint instead of running a second checkout.
+    order_id = db.session.execute(
+        Order.__table__.insert().values(
+            customer_id=customer_id, status="pending", total_price=0,
+            idempotency_key=idempotency_key, request_hash=fingerprint,
+        )
+    ).inserted_primary_key[0]
+
+    prices = _unit_prices(sorted(quantities))
+    rows, total = [], Decimal("0")
+    for product_id, quantity in sorted(quantities.items()):
+        unit_price = Decimal(prices[product_id]).quantize(Decimal("0.01"))
+        line_total = unit_price * quantity
+        total += line_total
+        rows.append({
+            "order_id": order_id, "product_id": product_id, "quantity": quantity,
+            "unit_price": unit_price, "line_total": line_total,
+        })
+    # All lines go out as one executemany
+    db.session.execute(OrderItem.__table__.insert(), rows)
+    db.session.execute(update(Order.__table__).where(Order.id == order_id).values(total_price=total))
+    db.session.commit()
+    return order_id
+
+
+def _retryable(error):
+    orig = getattr(error, "orig", None)
+    return getattr(orig, "pgcode", None) in _RETRYABLE_PGCODES or "database is locked" in str(orig)
+
+
+def place_order(data, idempotency_key=None):
+    """
+    Creates an order and its line items in one transaction, pricing each line
+    from the product's pricing row (or list price) at the time of checkout.
+    Returns (order dict with items, created). created is False when the
+    Idempotency-Key matched an earlier order, which is returned unchanged.
+    """
+    customer_id, quantities = parse_checkout(data)
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise APIException(f"Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters",
+                           status_code=400)
+    fingerprint = request_hash(customer_id, quantities)
+
+    if idempotency_key is not None:
+        order = _replay(customer_id, idempotency_key, fingerprint)
+        if order is not None:
+            return order_response(order), False
+    if db.session.get(User, customer_id) is None:
+        raise APIException("Unknown customer", status_code=400)
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            order_id = _create_order(customer_id, quantities, idempotency_key, fingerprint)
+            return order_response(db.session.get(Order, order_id)), True
+        except IntegrityError:
+            db.session.rollback()
+            order = _replay(customer_id, idempotency_key, fingerprint) if idempotency_key is not None else None
+            if order is None:
+                raise
+            return order_response(order), False
+        except OperationalError as error:
+            db.session.rollback()
+            if attempt == MAX_ATTEMPTS or not _retryable(error):
+                raise
+            time.sleep(RETRY_BACKOFF_SECONDS * attempt * random.uniform(0.5, 1.5))
+        except Exception:
+            db.session.rollback()
+            raise
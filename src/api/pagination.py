@@ -0,0 +1,111 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import String, literal, tuple_
+from .utils import APIException
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+# Keyset orderings a client may ask for with ?order=. Every ordering ends in
+# the primary key so the sort is total and the cursor is unambiguous.
+ORDERINGS = {
+    "id": ("id",),
+    "updated_at": ("updated_at", "id"),
+}
+
+
+def encode_cursor(order, values):
+    payload = [order] + [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, orderings=ORDERINGS):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        order, values = payload[0], payload[1:]
+        if order not in orderings or len(values) != len(orderings[order]):
+            raise ValueError(order)
+        if order == "updated_at":
+            values[0] = datetime.fromisoformat(values[0])
+        return order, values
+    except (ValueError, TypeError, IndexError, KeyError):
+        raise APIException("Invalid cursor", status_code=400)
+
+
+def _bind_value(value):
+    # SQLite keeps server-side timestamps as "YYYY-MM-DD HH:MM:SS" text, while the
+    # DateTime type would bind "....000000" and break ties on equal seconds. Bind
+    # timestamps in the stored text form; Postgres coerces the literal itself.
+    if isinstance(value, datetime):
+        timespec = "microseconds" if value.microsecond else "seconds"
+        return literal(value.isoformat(sep=" ", timespec=timespec), String)
+    return value
+
+
+def get_page_limit(args=None):
+    args = request.args if args is None else args
+    limit = args.get("limit", DEFAULT_PAGE_LIMIT)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise APIException("limit must be an integer", status_code=400)
+    if limit < 1:
+        raise APIException("limit must be positive", status_code=400)
+    return min(limit, MAX_PAGE_LIMIT)
+
+
+def keyset_window(query, model, args=None):
+    """
+    Narrows query (a Query or a select()) to the page selected by the
+    ?limit=, ?order= and ?cursor= arguments, plus one look-ahead row that
+    tells whether another page exists. args defaults to the current request's
+    query string. Returns (window_query, order, limit).
+    """
+    args = request.args if args is None else args
+    cursor = args.get("cursor")
+    if cursor:
+        order, last_values = decode_cursor(cursor)
+    else:
+        order, last_values = args.get("order", "id"), None
+        if order not in ORDERINGS:
+            raise APIException(f"order must be one of: {', '.join(ORDERINGS)}", status_code=400)
+
+    limit = get_page_limit(args)
+    columns = [getattr(model, name) for name in ORDERINGS[order]]
+
+    if last_values is not None:
+        last_values = [_bind_value(v) for v in last_values]
+        if len(columns) == 1:
+            query = query.filter(columns[0] > last_values[0])
+        else:
+            query = query.filter(tuple_(*columns) > tuple_(*last_values))
+
+    return query.order_by(*columns).limit(limit + 1), order, limit
+
+
+def paginate(query, model):
+    """
+    Keyset pagination: instead of OFFSET the next page starts strictly after
+    the last row already returned, so each page is an index range scan no
+    matter how deep the client has paged. Returns (rows, next_cursor).
+    """
+    window, order, limit = keyset_window(query, model)
+    return split_page(window.all(), order, limit)
+
+
+def split_page(rows, order, limit):
+    """Drops the look-ahead row fetched by keyset_window and builds the next cursor."""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(order, [getattr(last, name) for name in ORDERINGS[order]])
+    return rows, next_cursor
+
+
+def page_response(items, next_cursor):
+    return {"items": items, "next": next_cursor}
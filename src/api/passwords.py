@@ -0,0 +1,74 @@
+import os
+from werkzeug.security import check_password_hash, generate_password_hash
+from .process_pool import BoundedProcessPool, PoolBusy
+
+DEFAULT_METHOD = "scrypt:32768:8:1"
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 8      # hashing jobs waiting per pool worker
+DEFAULT_QUEUE_TIMEOUT = 2.0  # seconds a request waits for a free slot
+
+
+class HasherBusy(PoolBusy):
+    """Raised when the hashing pool is saturated; callers should answer 503."""
+
+
+def _method_of(password_hash):
+    return password_hash.split("$", 1)[0]
+
+
+class PasswordHasher:
+    """
+    Runs werkzeug's password hashing on a BoundedProcessPool so the CPU-bound
+    key derivation happens outside the request worker; a saturated pool
+    raises HasherBusy.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, workers=DEFAULT_WORKERS,
+                 queue_size=DEFAULT_QUEUE_SIZE, queue_timeout=DEFAULT_QUEUE_TIMEOUT):
+        self.configure(method, workers, queue_size, queue_timeout)
+
+    def configure(self, method, workers, queue_size, queue_timeout):
+        if getattr(self, "_pool", None) is not None:
+            self._pool.shutdown()
+        self.method = method
+        self._pool = BoundedProcessPool(workers, queue_size, queue_timeout, busy=HasherBusy,
+                                        busy_message="Password hashing is saturated, retry shortly")
+        self._dummy_hash = None
+
+    def init_app(self, app):
+        app.config.setdefault("PASSWORD_HASH_METHOD", os.getenv("PASSWORD_HASH_METHOD", DEFAULT_METHOD))
+        app.config.setdefault("PASSWORD_HASH_WORKERS", int(os.getenv("PASSWORD_HASH_WORKERS", DEFAULT_WORKERS)))
+        app.config.setdefault("PASSWORD_HASH_QUEUE_SIZE", int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)))
+        app.config.setdefault("PASSWORD_HASH_QUEUE_TIMEOUT", float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT)))
+        self.configure(
+            app.config["PASSWORD_HASH_METHOD"],
+            app.config["PASSWORD_HASH_WORKERS"],
+            app.config["PASSWORD_HASH_QUEUE_SIZE"],
+            app.config["PASSWORD_HASH_QUEUE_TIMEOUT"],
+        )
+        # Made at startup so the first unknown-user login does not pay for two hashes
+        self._dummy_hash = generate_password_hash(os.urandom(16).hex(), method=self.method)
+
+    def hash(self, password):
+        return self._pool.run(generate_password_hash, password, method=self.method)
+
+    def verify(self, password_hash, password):
+        return self._pool.run(check_password_hash, password_hash, password)
+
+    def dummy_hash(self):
+        """
+        A hash of a random password in the configured method. Logins for an
+        unknown user verify against it, so they take as long as a wrong
+        password and do not reveal which accounts exist. init_app makes it;
+        outside an app it is made on first use.
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash(os.urandom(16).hex())
+        return self._dummy_hash
+
+    def needs_rehash(self, password_hash):
+        # The dummy hash carries the full method, e.g. "scrypt:32768:8:1" for "scrypt"
+        return _method_of(password_hash) != _method_of(self.dummy_hash())
+
+
+password_hasher = PasswordHasher()
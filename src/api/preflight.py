@@ -0,0 +1,118 @@
+import io
+from PIL import Image
+from pypdf import PdfReader
+
+# Runs in the media process pool: everything here takes and returns plain,
+# picklable values and never touches the app or the database.
+
+MIN_DPI = 300
+POINTS_PER_INCH = 72
+# How far a file's size may be off the expected size, in inches
+SIZE_TOLERANCE = 1 / 16
+# Interior pages may come with bleed on every side
+INTERIOR_BLEED = 0.125
+THUMBNAIL_SIZE = (400, 400)
+THUMBNAIL_QUALITY = 85
+# Mismatched pages listed in a failed check
+MAX_REPORTED_PAGES = 10
+
+
+def _check(name, passed, detail, warning=False):
+    return {"check": name, "status": "pass" if passed else ("warn" if warning else "fail"), "detail": detail}
+
+
+def _size_matches(width, height, expected_width, expected_height):
+    return abs(width - expected_width) <= SIZE_TOLERANCE and abs(height - expected_height) <= SIZE_TOLERANCE
+
+
+def _thumbnail(image):
+    # draft() lets JPEG decode straight at a reduced scale
+    image.draft("RGB", THUMBNAIL_SIZE)
+    image.thumbnail(THUMBNAIL_SIZE)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def inspect_image(path, width, height):
+    """Effective resolution and proportions of a cover image printed at width x height inches."""
+    with Image.open(path) as image:
+        pixels_x, pixels_y = image.size
+        info = {"format": image.format, "mode": image.mode, "pixels": [pixels_x, pixels_y],
+                "dpi": list(image.info["dpi"]) if "dpi" in image.info else None}
+        thumbnail = _thumbnail(image)
+    dpi_x, dpi_y = pixels_x / width, pixels_y / height
+    dpi = min(dpi_x, dpi_y)
+    info["effective_dpi"] = round(dpi, 1)
+    checks = [
+        _check("resolution", dpi >= MIN_DPI,
+               f"{dpi:.0f} dpi at {width} x {height} in, {MIN_DPI} dpi required"),
+        _check("trim_size", _size_matches(pixels_x / dpi, pixels_y / dpi, width, height),
+               f"{pixels_x} x {pixels_y} px is {pixels_x / dpi:.3f} x {pixels_y / dpi:.3f} in at "
+               f"{dpi:.0f} dpi, expected {width} x {height} in"),
+        _check("color_mode", info["mode"] == "CMYK",
+               f"{info['mode']} image" + ("" if info["mode"] == "CMYK" else ", will be converted to CMYK"),
+               warning=info["mode"] in ("RGB", "L")),
+    ]
+    return info, checks, thumbnail
+
+
+def inspect_pdf(path, sizes, page_count=None):
+    """
+    Page count and page sizes of a PDF. Every page's trim box (media box
+    when it has none) must match one of sizes, given as (width, height) in inches.
+    """
+    reader = PdfReader(path)
+    pages = len(reader.pages)
+    mismatched, first = [], None
+    for number, page in enumerate(reader.pages, start=1):
+        box = page.trimbox
+        width, height = float(box.width) / POINTS_PER_INCH, float(box.height) / POINTS_PER_INCH
+        first = first or (round(width, 3), round(height, 3))
+        if not any(_size_matches(width, height, *size) for size in sizes):
+            mismatched.append(number)
+    info = {"format": "PDF", "pages": pages, "page_size": list(first) if first else None}
+    expected = " or ".join(f"{w} x {h} in" for w, h in sizes)
+    checks = [
+        _check("trim_size", pages and not mismatched,
+               f"Pages {', '.join(map(str, mismatched[:MAX_REPORTED_PAGES]))}"
+               f"{' and more' if len(mismatched) > MAX_REPORTED_PAGES else ''} are not {expected}"
+               if mismatched else f"All pages are {expected}"),
+    ]
+    if page_count is not None:
+        checks.append(_check("page_count", pages == page_count,
+                             f"{pages} pages, the product has {page_count}"))
+    return info, checks, None
+
+
+def preflight(path, mimetype, kind, spec):
+    """
+    Checks an uploaded cover or interior against the product's print spec
+    (see print_specs.product_print_spec) and renders a thumbnail for images.
+    Returns {"info", "checks", "passed", "thumbnail": JPEG bytes or None}.
+    """
+    try:
+        if "error" in spec:
+            info, checks, thumbnail = {}, [_check("print_spec", False, spec["error"])], None
+        elif kind == "cover":
+            width, height = spec["cover"]["width"], spec["cover"]["height"]
+            if mimetype == "application/pdf":
+                info, checks, thumbnail = inspect_pdf(path, [(width, height)], page_count=1)
+            else:
+                info, checks, thumbnail = inspect_image(path, width, height)
+        else:
+            width, height = spec["trim"]["width"], spec["trim"]["height"]
+            bleed = 2 * INTERIOR_BLEED
+            info, checks, thumbnail = inspect_pdf(path, [(width, height), (width + bleed, height + bleed)],
+                                                  page_count=spec["page_count"])
+    except Exception as error:
+        # Truncated, corrupt or oversized (decompression bomb) files
+        info, checks, thumbnail = {}, [_check("readable", False, f"Could not read the file: {error}")], None
+    return {
+        "info": info,
+        "checks": checks,
+        "passed": all(check["status"] != "fail" for check in checks),
+        "thumbnail": thumbnail,
+    }
@@ -0,0 +1,173 @@
+import math
+import re
+from functools import lru_cache
+from flask import Response, current_app, stream_with_context
+from sqlalchemy import func, literal, select
+from .models import db, Product, Book, ComicBook
+from .serializers import STREAM_CHUNK_ROWS, dumps
+from .utils import APIException
+
+# All dimensions are in inches
+
+# Thickness of one leaf (two pages) per paper stock
+PAPER_CALIPER = {
+    "white": 0.0045,
+    "cream": 0.0050,
+    "color": 0.0047,
+}
+# Comic books are printed on color stock and do not store a paper type
+DEFAULT_PAPER = {"comic_book": "color"}
+
+# Cover construction. Paperback covers only need bleed; hardcover case wraps
+# fold around the boards, with hinges either side of the spine.
+COVER_TYPES = {
+    "paperback": {"bleed": 0.125, "wrap": 0.0, "hinge": 0.0, "boards": 0.0},
+    "hardcover": {"bleed": 0.0, "wrap": 0.591, "hinge": 0.394, "boards": 0.196},
+}
+
+# Pages printed per press sheet (both sides); larger trims fit fewer pages
+SIGNATURE_PAGES = [(6.0 * 9.0, 32), (8.5 * 11.0, 16), (math.inf, 8)]
+
+# Below this many pages the spine is too thin to carry text
+MIN_SPINE_TEXT_PAGES = 79
+
+TRIM_SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*[xX]\s*(\d+(?:\.\d+)?)\s*$")
+
+
+def _trim_entry(trim_size):
+    match = TRIM_SIZE.match(trim_size or "")
+    if not match:
+        return None
+    width, height = float(match.group(1)), float(match.group(2))
+    signature_pages = next(pages for area, pages in SIGNATURE_PAGES if width * height <= area)
+    return width, height, signature_pages
+
+
+# Per (paper, trim) geometry for the stocks and trims we sell, built once at
+# import. Other "WxH" trims are parsed on first use and memoized below.
+TRIM_TABLE = {trim: _trim_entry(trim) for trim in ["5x8", "5.5x8.5", "6x9", "8.5x11", "6.625x10.25"]}
+PAPER_TRIM_TABLE = {
+    (paper, trim): (caliper,) + entry
+    for paper, caliper in PAPER_CALIPER.items()
+    for trim, entry in TRIM_TABLE.items()
+}
+
+
+def _geometry(paper_type, trim_size):
+    geometry = PAPER_TRIM_TABLE.get((paper_type, trim_size))
+    if geometry is None and paper_type in PAPER_CALIPER:
+        entry = _trim_entry(trim_size)
+        if entry is not None:
+            geometry = (PAPER_CALIPER[paper_type],) + entry
+    return geometry
+
+
+@lru_cache(maxsize=16384)
+def print_spec(page_count, trim_size, paper_type, cover_type):
+    """
+    Spine width, full cover spread and press sheet counts for one book
+    format. Memoized: a catalog has far fewer formats than products.
+    Returns {"error": ...} for formats it cannot compute.
+    """
+    geometry = _geometry(paper_type, trim_size)
+    cover = COVER_TYPES.get(cover_type)
+    if geometry is None:
+        return {"error": f"Unknown trim size {trim_size!r} or paper type {paper_type!r}"}
+    if cover is None:
+        return {"error": f"Unknown cover type {cover_type!r}"}
+    if not page_count or page_count < 1:
+        return {"error": "page_count must be positive"}
+
+    caliper, width, height, signature_pages = geometry
+    leaves = math.ceil(page_count / 2)
+    spine = leaves * caliper + cover["boards"]
+    margin = cover["bleed"] + cover["wrap"]
+    signatures = math.ceil(page_count / signature_pages)
+    return {
+        "unit": "in",
+        "page_count": page_count,
+        "trim": {"width": width, "height": height},
+        "spine_width": round(spine, 3),
+        "spine_text": page_count >= MIN_SPINE_TEXT_PAGES,
+        "cover": {
+            "width": round(2 * (margin + cover["hinge"] + width) + spine, 3),
+            "height": round(2 * margin + height, 3),
+            "bleed": cover["bleed"],
+            "wrap": cover["wrap"],
+            "hinge": cover["hinge"],
+        },
+        "sheets": {
+            "leaves": leaves,
+            "signature_pages": signature_pages,
+            "signatures": signatures,
+            "blank_pages": signatures * signature_pages - page_count,
+        },
+    }
+
+
+def spec_key(page_count, trim_size, paper_type, cover_type):
+    return f"{trim_size}/{paper_type}/{cover_type}/{page_count}"
+
+
+def _format_columns(product_type):
+    if product_type in ("book", "children_book"):
+        model = Book
+        paper = Book.paper_type
+    elif product_type == "comic_book":
+        model = ComicBook
+        paper = literal(DEFAULT_PAPER["comic_book"])
+    else:
+        raise APIException("Print specifications exist for book, children_book and comic_book",
+                           status_code=400)
+    return model, [model.page_count, model.trim_size, paper.label("paper_type"), model.cover_type]
+
+
+def product_print_spec(product):
+    product_type = product.product_type
+    if product_type not in ("book", "children_book", "comic_book"):
+        raise APIException("Print specifications exist for book, children_book and comic_book",
+                           status_code=400)
+    paper_type = getattr(product, "paper_type", None) or DEFAULT_PAPER.get(product_type)
+    options = (product.page_count, product.trim_size, paper_type, product.cover_type)
+    return dict(print_spec(*options), product_id=product.id, format=spec_key(*options))
+
+
+def _stream_catalog(product_type, model, columns, sort_keys):
+    # One spec per distinct format, computed (or taken from the memo) once
+    formats = db.session.execute(
+        select(*columns, func.count())
+        .select_from(model)
+        .where(Product.product_type == product_type)
+        .group_by(*columns)
+    ).all()
+    specs = {
+        spec_key(*row[:4]): dict(print_spec(*row[:4]), products=row[4]) for row in formats
+    }
+    header = b'{"product_type":' + dumps(product_type) + b',"specs":'
+    yield header + dumps(specs, sort_keys=sort_keys) + b',"products":{'
+
+    # Then every product's format, streamed in id order without loading the ORM
+    rows = db.session.execute(
+        select(Product.id, *columns)
+        .select_from(model)
+        .where(Product.product_type == product_type)
+        .order_by(Product.id)
+        .execution_options(stream_results=True, yield_per=STREAM_CHUNK_ROWS)
+    )
+    first = True
+    for chunk in rows.partitions(STREAM_CHUNK_ROWS):
+        body = b",".join(dumps(str(row[0])) + b":" + dumps(spec_key(*row[1:])) for row in chunk)
+        yield body if first else b"," + body
+        first = False
+    yield b"}}\n"
+
+
+def catalog_print_specs(product_type):
+    """
+    Print specs for every product of product_type in one streamed response:
+    {"specs": {format: spec}, "products": {product_id: format}}. Specs are
+    computed once per distinct (trim, paper, cover, page count) format.
+    """
+    model, columns = _format_columns(product_type)
+    body = _stream_catalog(product_type, model, columns, current_app.json.sort_keys)
+    return Response(stream_with_context(body), mimetype="application/json")
@@ -0,0 +1,78 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+
+class PoolBusy(Exception):
+    """Raised when a BoundedProcessPool is saturated; callers should answer 503."""
+
+
+class BoundedProcessPool:
+    """
+    Runs CPU-bound work on a small process pool so it happens outside the
+    request worker. The number of jobs queued or running is capped with a
+    semaphore: once it is full, callers wait up to queue_timeout and then get
+    busy (a PoolBusy subclass) instead of piling up.
+
+    With workers=0 jobs run inline (handy for scripts and the shell).
+    """
+
+    def __init__(self, workers, queue_size, queue_timeout, busy=PoolBusy, busy_message="Pool is saturated"):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.busy = busy
+        self.busy_message = busy_message
+        self._slots = threading.BoundedSemaphore(max(1, workers) * queue_size)
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def _get_executor(self, broken=None):
+        # Created lazily, and again after a fork, so each gunicorn worker owns
+        # its pool. A pool whose worker died (OOM, segfault) fails every later
+        # call, so the caller that saw it break has it replaced.
+        with self._executor_lock:
+            if broken is not None and self._executor is broken:
+                broken.shutdown(wait=False)
+                self._executor = None
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _submit(self, fn, *args, **kwargs):
+        if self.workers <= 0:
+            return fn(*args, **kwargs)
+        executor = self._get_executor()
+        try:
+            return executor.submit(fn, *args, **kwargs).result()
+        except BrokenProcessPool:
+            # Retried once on a fresh pool; a job that kills its worker every time still fails
+            return self._get_executor(broken=executor).submit(fn, *args, **kwargs).result()
+
+    @contextmanager
+    def slot(self):
+        """
+        Holds one slot for the block and yields a run(fn, *args, **kwargs)
+        that uses it. Keep the block to the jobs themselves: a slot held
+        through I/O turns callers away while the pool sits idle.
+        """
+        if self.workers <= 0:
+            yield self._submit
+            return
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise self.busy(self.busy_message)
+        try:
+            yield self._submit
+        finally:
+            self._slots.release()
+
+    def run(self, fn, *args, **kwargs):
+        with self.slot() as run:
+            return run(fn, *args, **kwargs)
@@ -0,0 +1,192 @@
+import html
+import re
+from contextlib import contextmanager
+from sqlalchemy import event
+from .admin import ProductView
+from .cache import NullBackend, catalog_cache
+from .models import db, User, Product, Order
+from .sitemap import product_sitemap
+
+# SQLite plan steps that read a whole table. "SCAN t USING [COVERING] INDEX"
+# walks an index in order and virtual tables (FTS5) plan their own access.
+_SQLITE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)\b(?! USING (?:COVERING )?INDEX| VIRTUAL TABLE)")
+
+
+class PlanCheck:
+    """Queries run by one route, their plans and any unexpected table scans."""
+
+    def __init__(self, name, allowed_scans=()):
+        self.name = name
+        self.allowed_scans = set(allowed_scans)
+        self.statements = []  # (sql, plan lines, scanned tables)
+
+    @property
+    def failures(self):
+        return [(sql, table) for sql, _, tables in self.statements
+                for table in tables if table not in self.allowed_scans]
+
+
+@contextmanager
+def _captured_statements():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+
+def _explain_sqlite(connection, statement, parameters):
+    rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    lines = [row[-1] for row in rows]
+    # Subquery aliases and constant rows show up as SCANs too; only tables count
+    scans = [m.group(1) for m in map(_SQLITE_SCAN.match, lines) if m]
+    return lines, [table for table in scans if table in db.metadata.tables]
+
+
+def _seq_scans(node):
+    found = [node["Relation Name"]] if node["Node Type"] == "Seq Scan" else []
+    for child in node.get("Plans", []):
+        found += _seq_scans(child)
+    return found
+
+
+def _explain_postgresql(connection, statement, parameters):
+    # Small tables are cheaper to scan, so the planner would pick a Seq Scan
+    # even with the right index in place. Discouraging scans only leaves them
+    # in the plan when no index can serve the query.
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    root = plan[0]["Plan"]
+    lines = []
+
+    def walk(node, depth):
+        relation = f" on {node['Relation Name']}" if "Relation Name" in node else ""
+        index = f" using {node['Index Name']}" if "Index Name" in node else ""
+        lines.append("  " * depth + node["Node Type"] + relation + index)
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return lines, _seq_scans(root)
+
+
+_EXPLAINERS = {
+    "sqlite": _explain_sqlite,
+    "postgresql": _explain_postgresql,
+}
+
+
+def explain(statement, parameters):
+    """Returns (plan lines, tables read by a full scan) for one captured statement."""
+    dialect = db.engine.dialect.name
+    if dialect not in _EXPLAINERS:
+        raise ValueError(f"Query plan checks are not supported on {dialect}")
+    with db.engine.connect() as connection:
+        with connection.begin():
+            return _EXPLAINERS[dialect](connection, statement, parameters)
+
+
+def _second_page(client, url):
+    """url with the cursor of its second page, so the keyset range query is planned too."""
+    separator = "&" if "?" in url else "?"
+    next_cursor = client.get(f"{url}{separator}limit=1").get_json().get("next")
+    return f"{url}{separator}limit=1&cursor={next_cursor}" if next_cursor else None
+
+
+def _admin_next_page(client, url):
+    """The next page link of an admin list, which carries its keyset cursor."""
+    match = re.search(r'href="([^"]*\bafter=[^"]*)"', client.get(url).get_data(as_text=True))
+    return html.unescape(match.group(1)) if match else None
+
+
+def plan_checks(client):
+    """
+    (PlanCheck, action) pairs for the routes worth guarding. The first page
+    of an unfiltered list reads its table in primary key order and stops at
+    LIMIT, so that scan is expected; every other scan is a regression.
+    """
+    product = db.session.query(Product.id, Product.product_type).order_by(Product.id).first()
+    user_id = db.session.query(User.id).order_by(User.id).limit(1).scalar()
+    if product is None or user_id is None:
+        raise ValueError("Query plan checks need data, run `flask insert-test-data` first")
+    product_id, product_type = product
+
+    urls = [
+        ("GET /api/users", "/api/users", {"users"}),
+        ("GET /api/users/<id>", f"/api/users/{user_id}", ()),
+        ("GET /api/products", "/api/products", {"products"}),
+        ("GET /api/products?type=", f"/api/products?type={product_type}", ()),
+        ("GET /api/products?type=&order=updated_at", f"/api/products?type={product_type}&order=updated_at", ()),
+        ("GET /api/products/<id>", f"/api/products/{product_id}", ()),
+        ("GET /api/products/search", "/api/products/search?q=a", ()),
+        ("GET /api/standard_specifications/<type>", f"/api/standard_specifications/{product_type}", ()),
+        ("GET /pricing/pricing", "/pricing/pricing", {"pricing"}),
+        ("GET /pricing/pricing/<id>", f"/pricing/pricing/{product_id}", ()),
+    ]
+    order_id = db.session.query(Order.id).order_by(Order.id).limit(1).scalar()
+    if order_id is not None:
+        urls.append(("GET /api/orders/<id>", f"/api/orders/{order_id}", ()))
+    for name, url in [("GET /api/users (page 2)", "/api/users"),
+                      ("GET /api/products (page 2)", "/api/products"),
+                      ("GET /api/products?order=updated_at (page 2)", "/api/products?order=updated_at"),
+                      ("GET /pricing/pricing (page 2)", "/pricing/pricing")]:
+        second = _second_page(client, url)
+        if second:
+            urls.append((name, second, ()))
+
+    # Admin list pages, see KeysetModelView
+    by_updated_at = f"/admin/product/?sort={ProductView.column_list.index('updated_at')}"
+    admin_lists = [
+        ("GET /admin/user/", "/admin/user/", {"users"}),
+        ("GET /admin/product/", "/admin/product/", {"products"}),
+        ("GET /admin/product/ by updated_at", by_updated_at, ()),
+        ("GET /admin/<type>/", f"/admin/{product_type.replace('_', '')}/", ()),
+        ("GET /admin/pricing/", "/admin/pricing/", {"pricing"}),
+        ("GET /admin/order/", "/admin/order/", {"orders"}),
+    ]
+    for name, url, allowed in admin_lists:
+        urls.append((name, url, allowed))
+        second = _admin_next_page(client, url)
+        if second:
+            urls.append((f"{name} (page 2)", second, ()))
+
+    # buffered: list bodies are streamed and only query once they are read
+    checks = [(PlanCheck(name, allowed), lambda url=url: client.get(url, buffered=True))
+              for name, url, allowed in urls]
+    # DELETE /api/users/<id> loads the user's orders to cascade the delete
+    checks.append((PlanCheck("DELETE /api/users/<id> (orders)"),
+                   lambda: db.session.get(User, user_id).orders))
+
+    # The sitemap reads products changed since its watermark and one shard's id range
+    def in_request(fn, *args):
+        with client.application.test_request_context():
+            return fn(*args)
+    checks.append((PlanCheck("GET /sitemap.xml (refresh)"), lambda: in_request(product_sitemap.refresh, True)))
+    checks.append((PlanCheck("GET /sitemaps/products-<n>.xml (build)"),
+                   lambda: in_request(product_sitemap.build_shard, (product_id - 1) // product_sitemap.shard_size)))
+    return checks
+
+
+def check_query_plans(app):
+    """Runs every plan check with the catalog cache off and returns the PlanChecks."""
+    backend, catalog_cache.backend = catalog_cache.backend, NullBackend()
+    client = app.test_client()
+    results = []
+    try:
+        for check, action in plan_checks(client):
+            with _captured_statements() as statements:
+                action()
+            db.session.rollback()
+            for statement, parameters in statements:
+                lines, scans = explain(statement, parameters)
+                check.statements.append((statement, lines, scans))
+            results.append(check)
+    finally:
+        catalog_cache.backend = backend
+    return results
@@ -0,0 +1,159 @@
+from functools import lru_cache
+import numpy as np
+from sqlalchemy import func, select
+from .models import db, Product, Book, ComicBook, Pricing
+from .print_specs import COVER_TYPES, PAPER_CALIPER, TRIM_TABLE
+from .utils import APIException
+
+# Production costs per copy at the 6x9 reference trim; other trims scale by area
+REFERENCE_TRIM_AREA = 6.0 * 9.0
+PAGE_RATES = {"white": 0.012, "cream": 0.013, "color": 0.065}
+COVER_RATES = {"paperback": 0.85, "hardcover": 5.50}
+# Fixed cost per print run, spread over its copies
+SETUP_COSTS = {"paperback": 45.0, "hardcover": 120.0}
+# (minimum run, multiplier on the production cost)
+QUANTITY_DISCOUNTS = [(1, 1.0), (100, 0.9), (500, 0.8), (1000, 0.7), (5000, 0.6)]
+
+DEFAULT_QUANTITIES = (1, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+MAX_QUANTITY = 1_000_000
+MAX_QUANTITIES = 50
+MAX_PRODUCTS = 100
+
+
+class RateTables:
+    """
+    Every (paper, trim, cover) option with its per-page, per-cover and setup
+    cost as parallel NumPy arrays, so quoting any subset of options is a
+    fancy-indexing operation.
+    """
+
+    def __init__(self):
+        options = [
+            (paper, trim, cover)
+            for paper in PAPER_CALIPER for trim in TRIM_TABLE for cover in COVER_TYPES
+        ]
+        self.options = options
+        self.index = {option: i for i, option in enumerate(options)}
+        area = np.array([TRIM_TABLE[trim][0] * TRIM_TABLE[trim][1] for _, trim, _ in options])
+        scale = area / REFERENCE_TRIM_AREA
+        self.page_cost = np.array([PAGE_RATES[paper] for paper, _, _ in options]) * scale
+        self.cover_cost = np.array([COVER_RATES[cover] for _, _, cover in options]) * scale
+        self.setup_cost = np.array([SETUP_COSTS[cover] for _, _, cover in options])
+        self.discount_runs = np.array([run for run, _ in QUANTITY_DISCOUNTS])
+        self.discount_rates = np.array([rate for _, rate in QUANTITY_DISCOUNTS])
+
+    def discounts(self, quantities):
+        return self.discount_rates[np.searchsorted(self.discount_runs, quantities, side="right") - 1]
+
+
+@lru_cache(maxsize=1)
+def rate_tables():
+    """Built on first use and kept for the life of the worker process."""
+    return RateTables()
+
+
+def _list_arg(args, name, allowed):
+    raw = args.get(name)
+    if raw is None:
+        return list(allowed)
+    values = [value.strip() for value in raw.split(",") if value.strip()]
+    unknown = [value for value in values if value not in allowed]
+    if unknown or not values:
+        raise APIException(f"Unknown {name}: {', '.join(unknown) or '(none given)'}. "
+                           f"Available: {', '.join(allowed)}", status_code=400)
+    return list(dict.fromkeys(values))
+
+
+def _int_list_arg(args, name, upper, limit, default=None):
+    raw = args.get(name)
+    if raw is None:
+        if default is None:
+            raise APIException(f"{name} is required", status_code=400)
+        return list(default)
+    try:
+        values = list(dict.fromkeys(int(value) for value in raw.split(",") if value.strip()))
+    except ValueError:
+        raise APIException(f"{name} must be a comma separated list of integers", status_code=400)
+    if not values or len(values) > limit or not all(1 <= value <= upper for value in values):
+        raise APIException(f"{name} takes 1 to {limit} integers between 1 and {upper}", status_code=400)
+    return values
+
+
+def parse_quote_request(args):
+    product_ids = _int_list_arg(args, "product_id", 2 ** 31 - 1, MAX_PRODUCTS)
+    quantities = sorted(_int_list_arg(args, "quantity", MAX_QUANTITY, MAX_QUANTITIES, DEFAULT_QUANTITIES))
+    papers = _list_arg(args, "paper", list(PAPER_CALIPER))
+    trims = _list_arg(args, "trim", list(TRIM_TABLE))
+    covers = _list_arg(args, "cover", list(COVER_TYPES))
+    return product_ids, quantities, [(p, t, c) for p in papers for t in trims for c in covers]
+
+
+def _quote_inputs(product_ids):
+    """(ids, page counts, base prices) for the printable products among product_ids."""
+    books, comics = Book.__table__, ComicBook.__table__
+    rows = db.session.execute(
+        select(
+            Product.id,
+            func.coalesce(books.c.page_count, comics.c.page_count),
+            func.coalesce(Pricing.base_price, Product.price),
+        )
+        .select_from(Product)
+        .outerjoin(books, books.c.id == Product.id)
+        .outerjoin(comics, comics.c.id == Product.id)
+        .outerjoin(Pricing, Pricing.product_id == Product.id)
+        .where(Product.id.in_(product_ids))
+    ).all()
+    found = {row[0]: row for row in rows if row[1] is not None}
+    missing = [product_id for product_id in product_ids if product_id not in found]
+    if missing:
+        raise APIException(f"Not a printable product: {', '.join(map(str, missing))}", status_code=400)
+    ordered = [found[product_id] for product_id in product_ids]
+    return (
+        [row[0] for row in ordered],
+        np.array([row[1] for row in ordered], dtype=np.float64),
+        np.array([float(row[2]) for row in ordered], dtype=np.float64),
+    )
+
+
+def quote_grid(page_counts, base_prices, quantities, options):
+    """
+    Per-copy price for every (product, quantity, option) as one
+    (products, quantities, options) array:
+        base price + (cover + pages * page cost) * volume discount + setup / quantity
+    rounded to cents.
+    """
+    rates = rate_tables()
+    pick = np.array([rates.index[option] for option in options])
+    quantities = np.asarray(quantities, dtype=np.float64)
+    production = rates.cover_cost[pick] + page_counts[:, None] * rates.page_cost[pick]
+    discounted = production[:, None, :] * rates.discounts(quantities)[None, :, None]
+    setup = rates.setup_cost[pick][None, None, :] / quantities[None, :, None]
+    unit = base_prices[:, None, None] + discounted + setup
+    return np.round(unit, 2)
+
+
+def print_quotes(args):
+    """
+    Price grids for ?product_id=1,2&quantity=100,500&paper=&trim=&cover=
+    (every paper, trim and cover by default). Grids are indexed
+    [quantity][option]; prices are per copy and totals per run, in the
+    product's currency as floats.
+    """
+    product_ids, quantities, options = parse_quote_request(args)
+    ids, page_counts, base_prices = _quote_inputs(product_ids)
+    unit = quote_grid(page_counts, base_prices, quantities, options)
+    total = np.round(unit * np.asarray(quantities, dtype=np.float64)[None, :, None], 2)
+    return {
+        "quantities": quantities,
+        "options": [{"paper": paper, "trim": trim, "cover": cover} for paper, trim, cover in options],
+        "quotes": [
+            {
+                "product_id": product_id,
+                "page_count": int(page_counts[i]),
+                "base_price": float(base_prices[i]),
+                "unit_price": unit[i].tolist(),
+                "total": total[i].tolist(),
+            }
+            for i, product_id in enumerate(ids)
+        ],
+    }
@@ -0,0 +1,119 @@
+import time
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import func, literal, select, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .cache import catalog_cache
+from .jobs import task
+from .models import db, Product, Pricing
+from .utils import APIException
+
+_UPSERTS = {
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+
+def _rate(rule, key, upper=None):
+    if key not in rule or rule[key] is None:
+        return None
+    try:
+        value = Decimal(str(rule[key]))
+    except InvalidOperation:
+        raise APIException(f"{key} must be a number", status_code=400)
+    # NaN cannot be compared and Infinity overflows the DECIMAL columns
+    if not value.is_finite():
+        raise APIException(f"{key} must be a finite number", status_code=400)
+    if value < 0 or (upper is not None and value > upper):
+        raise APIException(f"{key} must be between 0 and {upper}" if upper else f"{key} must not be negative",
+                           status_code=400)
+    return value
+
+
+def validate_pricing_rule(rule):
+    """Returns the rule's (discount, tax_rate), raising APIException for an invalid rule."""
+    discount = _rate(rule, "discount", upper=1)
+    tax_rate = _rate(rule, "tax_rate")
+    if discount is None and tax_rate is None:
+        raise APIException("Rule must set discount and/or tax_rate", status_code=400)
+    return discount, tax_rate
+
+
+def _target_filter(rule):
+    conditions = []
+    if rule.get("product_type"):
+        conditions.append(Product.product_type == rule["product_type"])
+    if rule.get("skus"):
+        conditions.append(Product.sku.in_(rule["skus"]))
+    if rule.get("product_ids"):
+        conditions.append(Product.id.in_(rule["product_ids"]))
+    # SQLite needs an explicit WHERE on INSERT ... SELECT ... ON CONFLICT to
+    # tell the upsert clause apart from a join constraint.
+    return conditions or [text("1 = 1")]
+
+
+def apply_pricing_rule(rule):
+    """
+    Reprices every product matched by the rule in one INSERT ... SELECT ...
+    ON CONFLICT (product_id) DO UPDATE statement. The final price is computed
+    by the database for the whole set at once; products without a pricing row
+    get one based on their list price. Returns a summary with timings.
+
+    rule: {"product_type"?, "skus"?, "product_ids"?, "discount"?, "tax_rate"?}
+    Omitted rates keep each product's current value.
+    """
+    discount, tax_rate = validate_pricing_rule(rule)
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in _UPSERTS:
+        raise APIException(f"Bulk repricing is not supported on {dialect}", status_code=501)
+
+    started = time.perf_counter()
+    base_price = func.coalesce(Pricing.base_price, Product.price)
+    new_discount = literal(discount) if discount is not None else func.coalesce(Pricing.discount, 0)
+    new_tax_rate = literal(tax_rate) if tax_rate is not None else func.coalesce(Pricing.tax_rate, 0)
+    final_price = func.round(base_price * (1 - new_discount) * (1 + new_tax_rate), 2)
+
+    source = (
+        select(Product.id, base_price, new_discount, new_tax_rate, final_price)
+        .select_from(Product.__table__.outerjoin(Pricing.__table__, Pricing.product_id == Product.id))
+        .where(*_target_filter(rule))
+    )
+    stmt = _UPSERTS[dialect](Pricing.__table__).from_select(
+        ["product_id", "base_price", "discount", "tax_rate", "final_price"], source
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Pricing.product_id],
+        set_={
+            "discount": stmt.excluded.discount,
+            "tax_rate": stmt.excluded.tax_rate,
+            "final_price": stmt.excluded.final_price,
+            "updated_at": func.now(),
+        },
+    )
+    try:
+        result = db.session.execute(stmt)
+        written = time.perf_counter()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finished = time.perf_counter()
+
+    return {
+        "repriced": result.rowcount,
+        "timings_ms": {
+            "statement": round((written - started) * 1000, 3),
+            "commit": round((finished - written) * 1000, 3),
+            "total": round((finished - started) * 1000, 3),
+        },
+    }
+
+
+@task("reprice")
+def reprice_job(rule):
+    result = apply_pricing_rule(rule)
+    # Only reaches the cache this process shares with the web workers (the
+    # SQLite backend); per-process memory caches expire with CATALOG_CACHE_TTL
+    catalog_cache.invalidate_all("pricing")
+    return result
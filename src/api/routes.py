@@ -1,20 +1,45 @@
+import io
 from flask import Blueprint, jsonify, request
-from .models import db, User, Product, Book, ComicBook, ChildrenBook, EBook, TShirt, Pricing
+from flask_jwt_extended import create_access_token
+from sqlalchemy import or_
+from .models import db, User, Product, Pricing, Order, Job, ProductAsset, PRODUCT_MODELS, polymorphic_product
+from .pagination import page_response
+from .utils import APIException
+from .cache import catalog_cache
+from .passwords import password_hasher, HasherBusy
+from .conditional import list_response, resource_response
+from .repricing import apply_pricing_rule, validate_pricing_rule
+from .importer import import_products, iter_csv, iter_ndjson, DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE
+from .search import search_products
+from .serializers import serialize
+from .fieldsets import load_one, page_builder, requested_fields
+from .orders import order_response, place_order
+from .jobs import enqueue, queue_stats
+from .print_specs import catalog_print_specs, product_print_spec
+from .quotes import print_quotes
+from .ebooks import ebook_download, upload_ebook_file
+from .media import media_library, MediaBusy
+from .sitemap import product_sitemap
 
 api = Blueprint("api", __name__)
 pricing_api = Blueprint("pricing_api", __name__)
+sitemap_api = Blueprint("sitemap_api", __name__)
 
 # -------------------- User Routes --------------------
 
 @api.route("/users", methods=["GET"])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users]), 200
+    return list_response("users", User.query, User, page_builder(requested_fields(User)))
 
 @api.route("/users/<int:user_id>", methods=["GET"])
 def get_user(user_id):
-    user = User.query.get_or_404(user_id)
-    return jsonify(user.to_dict()), 200
+    fields = requested_fields(User)
+    return resource_response(
+        "user", user_id,
+        probe=lambda: db.session.query(User.updated_at).filter(User.id == user_id).scalar(),
+        load=lambda: load_one(User.query.filter(User.id == user_id), User, fields),
+        fields=fields,
+    )
 
 @api.route("/users", methods=["POST"])
 def create_user():
@@ -29,11 +54,41 @@ def create_user():
         user.set_password(data["password"])
         db.session.add(user)
         db.session.commit()
-        return jsonify({"message": "User created successfully!", "user": user.to_dict()}), 201
+        return jsonify({"message": "User created successfully!", "user": serialize(user)}), 201
+    except HasherBusy as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Error creating user: {str(e)}"}), 400
 
+@api.route("/login", methods=["POST"])
+def login():
+    data = request.json or {}
+    identifier = data.get("username") or data.get("email")
+    password = data.get("password")
+    if not identifier or not password:
+        return jsonify({"error": "username or email and password are required"}), 400
+
+    user = User.query.filter(or_(User.username == identifier, User.email == identifier)).first()
+    try:
+        if user is None:
+            # Costs a full verify like a wrong password, so timing does not tell which accounts exist
+            password_hasher.verify(password_hasher.dummy_hash(), password)
+            return jsonify({"error": "Invalid credentials"}), 401
+        if not user.check_password(password):
+            return jsonify({"error": "Invalid credentials"}), 401
+        # Upgrade hashes made with older cost parameters while we have the plain password
+        if password_hasher.needs_rehash(user.password_hash):
+            user.set_password(password)
+            db.session.commit()
+    except HasherBusy as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+
+    token = create_access_token(identity=str(user.id))
+    return jsonify({"message": "Logged in successfully!", "token": token, "user": serialize(user)}), 200
+
 @api.route("/users/<int:user_id>", methods=["PUT"])
 def update_user(user_id):
     user = User.query.get_or_404(user_id)
@@ -43,7 +98,7 @@ def update_user(user_id):
             if hasattr(user, key):
                 setattr(user, key, value)
         db.session.commit()
-        return jsonify({"message": "User updated successfully!", "user": user.to_dict()}), 200
+        return jsonify({"message": "User updated successfully!", "user": serialize(user)}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Error updating user: {str(e)}"}), 400
@@ -62,33 +117,44 @@ def delete_user(user_id):
 
 # -------------------- Product Routes --------------------
 
+def product_query(product_type=None, fields=None):
+    """
+    Products, of one type when product_type is given. Whole rows come with
+    their subclass tables joined in (see polymorphic_product); sparse fields
+    join only the tables they read.
+    """
+    query = db.session.query(Product if fields else polymorphic_product(product_type))
+    return query if product_type is None else query.filter(Product.product_type == product_type)
+
 @api.route("/products", methods=["GET"])
 def get_products():
     product_type = request.args.get("type")
-    if product_type:
-        products = Product.query.filter_by(product_type=product_type).all()
-    else:
-        products = Product.query.all()
-    return jsonify([product.to_dict() for product in products]), 200
+    fields = requested_fields(Product)
+    return list_response("products", product_query(product_type, fields), Product, page_builder(fields))
+
+@api.route("/products/search", methods=["GET"])
+def search_products_route():
+    items, next_cursor = search_products(request.args.get("q"), request.args, requested_fields(Product))
+    return jsonify(page_response(items, next_cursor))
 
 @api.route("/products/<int:product_id>", methods=["GET"])
 def get_product(product_id):
-    product = Product.query.get_or_404(product_id)
-    return jsonify(product.to_dict()), 200
+    fields = requested_fields(Product)
+    return resource_response(
+        "product", product_id,
+        probe=lambda: db.session.query(Product.updated_at).filter(Product.id == product_id).scalar(),
+        load=lambda: load_one(product_query(fields=fields).filter(Product.id == product_id), Product, fields),
+        # Sparse copies are cheap to load and would crowd out full ones
+        cache=catalog_cache if fields is None else None,
+        fields=fields,
+    )
 
 @api.route("/products", methods=["POST"])
 def create_product():
     data = request.json
     product_type = data.pop("product_type", "product")
 
-    model_map = {
-        "book": Book,
-        "comic_book": ComicBook,
-        "children_book": ChildrenBook,
-        "tshirt": TShirt,
-        "ebook": EBook,
-        "product": Product,
-    }
+    model_map = PRODUCT_MODELS
 
     try:
         if product_type not in model_map:
@@ -97,11 +163,33 @@ def create_product():
         product = model_map[product_type](**data)
         db.session.add(product)
         db.session.commit()
-        return jsonify({"message": f"{product_type.title()} created successfully!", "product": product.to_dict()}), 201
+        catalog_cache.invalidate("product", product.id)
+        return jsonify({"message": f"{product_type.title()} created successfully!", "product": serialize(product)}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Error creating product: {str(e)}"}), 400
 
+@api.route("/products/bulk", methods=["POST"])
+def bulk_create_products():
+    try:
+        chunk_size = int(request.args.get("chunk_size", DEFAULT_CHUNK_SIZE))
+    except ValueError:
+        return jsonify({"error": "chunk_size must be an integer"}), 400
+    if not 1 <= chunk_size <= MAX_CHUNK_SIZE:
+        return jsonify({"error": f"chunk_size must be between 1 and {MAX_CHUNK_SIZE}"}), 400
+
+    # Read the body as a stream so large catalogs are never buffered whole.
+    # Invalid UTF-8 survives decoding and is reported on its own row.
+    lines = io.TextIOWrapper(request.stream, encoding="utf-8", errors="surrogateescape", newline="")
+    if request.mimetype == "text/csv":
+        rows = iter_csv(lines)
+    else:
+        rows = iter_ndjson(lines)
+
+    report = import_products(rows, chunk_size=chunk_size)
+    status = 201 if report.inserted else 400
+    return jsonify(report.to_dict()), status
+
 @api.route("/products/<int:product_id>", methods=["PUT"])
 def update_product(product_id):
     product = Product.query.get_or_404(product_id)
@@ -111,7 +199,8 @@ def update_product(product_id):
             if hasattr(product, key):
                 setattr(product, key, value)
         db.session.commit()
-        return jsonify({"message": "Product updated successfully!", "product": product.to_dict()}), 200
+        catalog_cache.invalidate("product", product_id)
+        return jsonify({"message": "Product updated successfully!", "product": serialize(product)}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Error updating product: {str(e)}"}), 400
@@ -122,23 +211,74 @@ def delete_product(product_id):
     try:
         db.session.delete(product)
         db.session.commit()
+        catalog_cache.invalidate("product", product_id)
+        catalog_cache.invalidate("pricing", product_id)
+        product_sitemap.invalidate(product_id)
         return jsonify({"message": "Product deleted successfully!"}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Error deleting product: {str(e)}"}), 400
 
+@api.route("/ebooks/<int:ebook_id>/file", methods=["PUT"])
+def put_ebook_file(ebook_id):
+    # The raw body is streamed to disk; request.data would buffer all of it
+    ebook = upload_ebook_file(ebook_id, request.stream, request.mimetype, request.content_length)
+    return jsonify({"message": "EBook file stored", "product": ebook}), 200
+
+@api.route("/ebooks/<int:ebook_id>/download", methods=["GET"])
+def download_ebook(ebook_id):
+    return ebook_download(ebook_id)
+
+@api.route("/products/<int:product_id>/assets/<kind>", methods=["PUT"])
+def upload_product_asset(product_id, kind):
+    # The raw body is streamed to disk; request.data would buffer all of it
+    try:
+        asset = media_library.upload(product_id, kind, request.stream, request.mimetype,
+                                     request.args.get("filename"), request.content_length)
+    except MediaBusy as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    return jsonify(asset), 201
+
+@api.route("/products/<int:product_id>/assets", methods=["GET"])
+def list_product_assets(product_id):
+    assets = ProductAsset.query.filter_by(product_id=product_id).order_by(ProductAsset.kind, ProductAsset.id)
+    return jsonify([serialize(asset) for asset in assets]), 200
+
+@api.route("/assets/<int:asset_id>/<variant>", methods=["GET"])
+def get_asset_file(asset_id, variant):
+    return media_library.send(asset_id, variant)
+
+
+# -------------------- Order Routes --------------------
+
+@api.route("/orders", methods=["POST"])
+def create_order():
+    order, created = place_order(request.get_json(silent=True), request.headers.get("Idempotency-Key"))
+    # A retry gets the response of the original request back
+    headers = {} if created else {"Idempotent-Replayed": "true"}
+    return jsonify({"message": "Order placed successfully!", "order": order}), 201, headers
+
+@api.route("/orders/<int:order_id>", methods=["GET"])
+def get_order(order_id):
+    return jsonify(order_response(Order.query.get_or_404(order_id))), 200
+
 
 # -------------------- Pricing Routes --------------------
 
 @pricing_api.route("/pricing", methods=["GET"])
 def get_pricing():
-    pricing_records = Pricing.query.all()
-    return jsonify([pricing.to_dict() for pricing in pricing_records]), 200
+    return list_response("pricing", Pricing.query, Pricing, page_builder(requested_fields(Pricing)))
 
 @pricing_api.route("/pricing/<int:product_id>", methods=["GET"])
 def get_product_pricing(product_id):
-    pricing = Pricing.query.filter_by(product_id=product_id).first_or_404()
-    return jsonify(pricing.to_dict()), 200
+    fields = requested_fields(Pricing)
+    return resource_response(
+        "pricing", product_id,
+        probe=lambda: db.session.query(Pricing.updated_at).filter(Pricing.product_id == product_id).scalar(),
+        load=lambda: load_one(Pricing.query.filter_by(product_id=product_id), Pricing, fields),
+        cache=catalog_cache if fields is None else None,
+        fields=fields,
+    )
 
 @pricing_api.route("/pricing", methods=["POST"])
 def create_or_update_pricing():
@@ -157,17 +297,42 @@ def create_or_update_pricing():
 
         db.session.add(pricing)
         db.session.commit()
-        return jsonify({"message": "Pricing created/updated successfully!", "pricing": pricing.to_dict()}), 201
+        catalog_cache.invalidate("pricing", product_id)
+        return jsonify({"message": "Pricing created/updated successfully!", "pricing": serialize(pricing)}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Error updating pricing: {str(e)}"}), 400
 
+@pricing_api.route("/bulk", methods=["POST"])
+def bulk_reprice():
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON pricing rule"}), 400
+    if request.args.get("async") in ("1", "true"):
+        try:
+            priority = int(request.args.get("priority", 0))
+        except ValueError:
+            return jsonify({"error": "priority must be an integer"}), 400
+        # Reject bad rules now rather than in the worker
+        validate_pricing_rule(data)
+        job = enqueue("reprice", data, priority=priority)
+        return jsonify({"message": "Repricing queued", "job": serialize(job)}), 202, {"Location": f"/api/jobs/{job.id}"}
+    try:
+        summary = apply_pricing_rule(data)
+        catalog_cache.invalidate_all("pricing")
+        return jsonify(summary), 200
+    except APIException:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"Error repricing products: {str(e)}"}), 400
+
 @pricing_api.route("/pricing/<int:product_id>", methods=["DELETE"])
 def delete_pricing(product_id):
     pricing = Pricing.query.filter_by(product_id=product_id).first_or_404()
     try:
         db.session.delete(pricing)
         db.session.commit()
+        catalog_cache.invalidate("pricing", product_id)
         return jsonify({"message": "Pricing deleted successfully!"}), 200
     except Exception as e:
         db.session.rollback()
@@ -179,7 +344,46 @@ def delete_pricing(product_id):
 @api.route("/standard_specifications/<product_type>", methods=["GET"])
 def get_standard_specifications(product_type):
     try:
-        products = Product.query.filter_by(product_type=product_type).all()
-        return jsonify([product.to_dict() for product in products]), 200
+        fields = requested_fields(Product)
+        return list_response(
+            f"standard_specifications:{product_type}",
+            product_query(product_type, fields), Product, page_builder(fields),
+        )
+    except APIException:
+        raise
     except Exception as e:
         return jsonify({"error": f"Error fetching specifications: {str(e)}"}), 400
+
+@api.route("/standard_specifications/<product_type>/print_specs", methods=["GET"])
+def get_print_specifications(product_type):
+    return catalog_print_specs(product_type)
+
+@api.route("/products/<int:product_id>/print_spec", methods=["GET"])
+def get_product_print_spec(product_id):
+    return jsonify(product_print_spec(Product.query.get_or_404(product_id))), 200
+
+@api.route("/quotes", methods=["GET"])
+def get_print_quotes():
+    return jsonify(print_quotes(request.args)), 200
+
+@api.route("/cache/stats", methods=["GET"])
+def get_cache_stats():
+    return jsonify(catalog_cache.stats()), 200
+
+@api.route("/jobs/stats", methods=["GET"])
+def get_job_stats():
+    return jsonify(queue_stats()), 200
+
+@api.route("/jobs/<int:job_id>", methods=["GET"])
+def get_job(job_id):
+    return jsonify(serialize(Job.query.get_or_404(job_id))), 200
+
+# -------------------- Sitemap Routes --------------------
+
+@sitemap_api.route("/sitemap.xml", methods=["GET"])
+def get_sitemap_index():
+    return product_sitemap.index_response()
+
+@sitemap_api.route("/sitemaps/products-<int:shard>.xml", methods=["GET"])
+def get_sitemap_shard(shard):
+    return product_sitemap.shard_response(shard)
@@ -0,0 +1,201 @@
+import re
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+from .models import db, Product, polymorphic_product
+from .fieldsets import RowEncoder, sparse_query
+from .pagination import decode_cursor, encode_cursor, get_page_limit
+from .serializers import serialize
+from .utils import APIException
+
+SEARCH_TABLE = "product_search"
+# The table and the shadow tables FTS5 keeps next to it on SQLite
+SEARCH_TABLES = {SEARCH_TABLE} | {f"{SEARCH_TABLE}_{shadow}" for shadow in ("data", "idx", "content", "docsize", "config")}
+MAX_TERMS = 8
+# Search results are ordered by relevance, then id; the cursor carries both
+SEARCH_ORDERINGS = {"rank": ("score", "id")}
+
+# SQLite: an FTS5 table whose rowid is the product id. bm25() weights follow
+# the column order: name, description, author, series_title, isbn, sku.
+SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        name, description, author, series_title, isbn, sku,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')""",
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25(10.0, 1.0, 5.0, 5.0, 10.0, 10.0)')",
+    f"""CREATE TRIGGER IF NOT EXISTS products_search_insert AFTER INSERT ON products BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, name, description, sku) VALUES (new.id, new.name, new.description, new.sku);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_search_update AFTER UPDATE OF name, description, sku ON products BEGIN
+        UPDATE {SEARCH_TABLE} SET name = new.name, description = new.description, sku = new.sku
+        WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_search_delete AFTER DELETE ON products BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_search_insert AFTER INSERT ON books BEGIN
+        UPDATE {SEARCH_TABLE} SET author = new.author, isbn = new.isbn WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_search_update AFTER UPDATE OF author, isbn ON books BEGIN
+        UPDATE {SEARCH_TABLE} SET author = new.author, isbn = new.isbn WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS comic_books_search_insert AFTER INSERT ON comic_books BEGIN
+        UPDATE {SEARCH_TABLE} SET series_title = new.series_title WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS comic_books_search_update AFTER UPDATE OF series_title ON comic_books BEGIN
+        UPDATE {SEARCH_TABLE} SET series_title = new.series_title WHERE rowid = new.id;
+    END""",
+]
+
+SQLITE_BACKFILL = [
+    f"DELETE FROM {SEARCH_TABLE}",
+    f"""INSERT INTO {SEARCH_TABLE}(rowid, name, description, author, series_title, isbn, sku)
+        SELECT p.id, p.name, p.description, b.author, c.series_title, b.isbn, p.sku
+        FROM products p LEFT JOIN books b ON b.id = p.id LEFT JOIN comic_books c ON c.id = p.id""",
+]
+
+# Postgres: a weighted tsvector per product behind a GIN index. The 'simple'
+# configuration skips stemming, which suits titles, author names and SKUs.
+_PG_DOCUMENT = """
+    SELECT p.id,
+           setweight(to_tsvector('simple', coalesce(p.name, '') || ' ' || coalesce(p.sku, '')
+                                 || ' ' || coalesce(b.isbn, '')), 'A')
+           || setweight(to_tsvector('simple', coalesce(b.author, '') || ' ' || coalesce(c.series_title, '')), 'B')
+           || setweight(to_tsvector('simple', coalesce(p.description, '')), 'C')
+    FROM products p LEFT JOIN books b ON b.id = p.id LEFT JOIN comic_books c ON c.id = p.id"""
+
+POSTGRES_DDL = [
+    f"""CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} (
+        product_id INTEGER PRIMARY KEY REFERENCES products (id) ON DELETE CASCADE,
+        document TSVECTOR NOT NULL)""",
+    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)",
+    f"""CREATE OR REPLACE FUNCTION product_search_refresh() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO {SEARCH_TABLE} (product_id, document)
+        {_PG_DOCUMENT} WHERE p.id = NEW.id
+        ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS products_search_refresh ON products",
+    """CREATE TRIGGER products_search_refresh AFTER INSERT OR UPDATE OF name, description, sku ON products
+        FOR EACH ROW EXECUTE FUNCTION product_search_refresh()""",
+    "DROP TRIGGER IF EXISTS books_search_refresh ON books",
+    """CREATE TRIGGER books_search_refresh AFTER INSERT OR UPDATE OF author, isbn ON books
+        FOR EACH ROW EXECUTE FUNCTION product_search_refresh()""",
+    "DROP TRIGGER IF EXISTS comic_books_search_refresh ON comic_books",
+    """CREATE TRIGGER comic_books_search_refresh AFTER INSERT OR UPDATE OF series_title ON comic_books
+        FOR EACH ROW EXECUTE FUNCTION product_search_refresh()""",
+]
+
+POSTGRES_BACKFILL = [
+    f"""INSERT INTO {SEARCH_TABLE} (product_id, document) {_PG_DOCUMENT}
+        ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document""",
+]
+
+# Ranked matches, best first. :after_score/:after_id continue from a cursor.
+SQLITE_SEARCH = f"""
+    SELECT rowid AS id, -rank AS score FROM {SEARCH_TABLE}
+    WHERE {SEARCH_TABLE} MATCH :query {{filters}}
+    ORDER BY rank, rowid LIMIT :limit"""
+
+POSTGRES_SEARCH = f"""
+    SELECT id, score FROM (
+        SELECT product_id AS id, ts_rank_cd(document, query) AS score
+        FROM {SEARCH_TABLE}, to_tsquery('simple', :query) AS query
+        WHERE document @@ query
+    ) AS matches
+    WHERE true {{filters}}
+    ORDER BY score DESC, id LIMIT :limit"""
+
+_DIALECTS = {
+    "sqlite": (SQLITE_DDL, SQLITE_BACKFILL, SQLITE_SEARCH, "rowid", "-rank"),
+    "postgresql": (POSTGRES_DDL, POSTGRES_BACKFILL, POSTGRES_SEARCH, "id", "score"),
+}
+
+
+def _dialect():
+    name = db.session.get_bind().dialect.name
+    if name not in _DIALECTS:
+        raise APIException(f"Product search is not supported on {name}", status_code=501)
+    return _DIALECTS[name]
+
+
+def search_terms(q):
+    """Splits q into at most MAX_TERMS words, dropping any query syntax."""
+    return re.findall(r"\w+", (q or "").lower())[:MAX_TERMS]
+
+
+def match_expression(terms, dialect):
+    # Every term must match, each as a prefix so partial words find results while typing
+    if dialect == "postgresql":
+        return " & ".join(f"{term}:*" for term in terms)
+    return " AND ".join(f'"{term}"*' for term in terms)
+
+
+def rebuild_search_index():
+    """Creates the search table and triggers if needed and reindexes every product."""
+    ddl, backfill, _, _, _ = _dialect()
+    for statement in ddl + backfill:
+        db.session.execute(text(statement))
+    db.session.commit()
+    return db.session.execute(text(f"SELECT count(*) FROM {SEARCH_TABLE}")).scalar()
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    Alembic include_object hook: the search tables are created by
+    rebuild_search_index, not the models, so autogenerate must leave them
+    and their indexes alone instead of emitting drops.
+    """
+    table = object if type_ == "table" else getattr(object, "table", None)
+    return table is None or table.name not in SEARCH_TABLES
+
+
+def search_products(q, args, fields=None):
+    """
+    Ranked full-text search over product names, descriptions, authors, series
+    titles, ISBNs and SKUs. Pages are keyset paginated on (score, id), so deep
+    pages cost the same as the first. Returns (items, next_cursor), each item
+    a product dict (only fields, when given) with its score.
+    """
+    terms = search_terms(q)
+    if not terms:
+        raise APIException("q must contain at least one word", status_code=400)
+    _, _, statement, id_column, score_column = _dialect()
+    limit = get_page_limit(args)
+
+    filters, params = [], {
+        "query": match_expression(terms, db.session.get_bind().dialect.name),
+        "limit": limit + 1,
+    }
+    if args.get("cursor"):
+        _, (params["after_score"], params["after_id"]) = decode_cursor(args["cursor"], SEARCH_ORDERINGS)
+        filters.append(f"AND ({score_column} < :after_score "
+                       f"OR ({score_column} = :after_score AND {id_column} > :after_id))")
+    if args.get("type"):
+        params["product_type"] = args["type"]
+        filters.append(f"AND {id_column} IN (SELECT id FROM products WHERE product_type = :product_type)")
+
+    try:
+        matches = db.session.execute(text(statement.format(filters=" ".join(filters))), params).all()
+    except DBAPIError:
+        db.session.rollback()
+        if not inspect(db.engine).has_table(SEARCH_TABLE):
+            raise APIException("Search index is not built, run `flask rebuild-search-index`", status_code=503)
+        raise
+
+    next_cursor = None
+    if len(matches) > limit:
+        matches = matches[:limit]
+        next_cursor = encode_cursor("rank", [matches[-1].score, matches[-1].id])
+
+    ids = [m.id for m in matches]
+    if fields is None:
+        # Subclass tables joined in, like the list routes, instead of lazy-loaded per hit
+        query = db.session.query(polymorphic_product(args.get("type"))).filter(Product.id.in_(ids))
+        products = {product.id: serialize(product) for product in query}
+    else:
+        encode = RowEncoder(Product, fields)
+        query = Product.query.filter(Product.id.in_(ids))
+        products = {row.id: encode(row) for row in sparse_query(query, Product, fields)}
+    items = [dict(products[m.id], score=m.score) for m in matches if m.id in products]
+    return items, next_cursor
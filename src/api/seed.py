@@ -0,0 +1,242 @@
+import random
+import time
+from decimal import Decimal
+from sqlalchemy import func, select, text
+from .passwords import password_hasher
+from .models import db, User, Product, Book, ComicBook, ChildrenBook, TShirt, EBook, Pricing, Order, OrderItem
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_PASSWORD = "123456"
+MAX_CUSTOMER_SAMPLE = 100000
+MAX_PRODUCT_SAMPLE = 100000
+MAX_ORDER_ITEMS = 5
+MAX_ITEM_QUANTITY = 3
+
+# Share of generated products per type
+PRODUCT_MIX = [
+    ("book", 0.40),
+    ("children_book", 0.15),
+    ("comic_book", 0.20),
+    ("ebook", 0.15),
+    ("tshirt", 0.10),
+]
+
+TRIM_SIZES = ["5x8", "5.5x8.5", "6x9", "8.5x11", "6.625x10.25"]
+PAPER_TYPES = ["white", "cream", "color"]
+COVER_TYPES = ["paperback", "hardcover"]
+ORDER_STATUSES = ["pending", "paid", "shipped", "delivered", "cancelled"]
+WORDS = ("moon river garden shadow winter atlas silver harbor quiet engine lantern "
+         "orchard paper thunder island copper meadow signal ember voyage").split()
+
+
+class SeedReport:
+    def __init__(self):
+        self.tables = []
+
+    def add(self, table, rows, seconds):
+        self.tables.append((table, rows, seconds))
+
+    def lines(self):
+        for table, rows, seconds in self.tables:
+            rate = rows / seconds if seconds else 0
+            yield f"{table:<16} {rows:>10} rows {seconds:>9.2f}s {rate:>12,.0f} rows/s"
+        total_rows = sum(rows for _, rows, _ in self.tables)
+        total_seconds = sum(seconds for _, _, seconds in self.tables)
+        rate = total_rows / total_seconds if total_seconds else 0
+        yield f"{'total':<16} {total_rows:>10} rows {total_seconds:>9.2f}s {rate:>12,.0f} rows/s"
+
+
+def _next_id(model):
+    return (db.session.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _title(rng):
+    return " ".join(rng.choices(WORDS, k=rng.randint(2, 4))).title()
+
+
+def _write(batches, report, label):
+    """Executes (table, rows) batches, committing after each group of rows."""
+    started = time.perf_counter()
+    written = 0
+    for statements in batches:
+        for table, rows in statements:
+            if rows:
+                db.session.execute(table.insert(), rows)
+        db.session.commit()
+        written += len(statements[0][1])
+    report.add(label, written, time.perf_counter() - started)
+
+
+def _reset_sequences(*models):
+    # Rows are inserted with explicit ids; move Postgres sequences past them
+    if db.session.get_bind().dialect.name != "postgresql":
+        return
+    for model in models:
+        table = model.__table__.name
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"
+        ))
+    db.session.commit()
+
+
+def _user_batches(rng, count, batch_size, password_hash):
+    first = _next_id(User)
+    for start in range(first, first + count, batch_size):
+        rows = []
+        for user_id in range(start, min(start + batch_size, first + count)):
+            rows.append({
+                "id": user_id,
+                "username": f"test_user{user_id}",
+                "email": f"test_user{user_id}@test.com",
+                "password_hash": password_hash,
+                "first_name": rng.choice(WORDS).title(),
+                "last_name": rng.choice(WORDS).title(),
+            })
+        yield [(User.__table__, rows)]
+
+
+def _subclass_values(rng, product_type, product_id):
+    if product_type in ("book", "children_book"):
+        values = {Book.__table__: {
+            "id": product_id,
+            "isbn": f"97{product_id:011d}",
+            "author": f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}",
+            "page_count": rng.randint(24, 900),
+            "cover_type": rng.choice(COVER_TYPES),
+            "trim_size": rng.choice(TRIM_SIZES),
+            "paper_type": rng.choice(PAPER_TYPES),
+        }}
+        if product_type == "children_book":
+            values[ChildrenBook.__table__] = {
+                "id": product_id,
+                "age_group": rng.choice(["0-2", "3-5", "6-8", "9-12"]),
+                "illustration_style": rng.choice(["watercolor", "digital", "pencil", "collage"]),
+            }
+        return values
+    if product_type == "comic_book":
+        return {ComicBook.__table__: {
+            "id": product_id,
+            "issue_number": rng.randint(1, 300),
+            "series_title": _title(rng),
+            "cover_type": rng.choice(COVER_TYPES),
+            "trim_size": "6.625x10.25",
+            "page_count": rng.choice([24, 32, 48]),
+        }}
+    if product_type == "ebook":
+        return {EBook.__table__: {
+            "id": product_id,
+            "file_format": rng.choice(["epub", "pdf", "mobi"]),
+            "download_url": f"https://example.com/ebooks/{product_id}",
+            "file_size": f"{rng.randint(1, 50)} MB",
+        }}
+    return {TShirt.__table__: {
+        "id": product_id,
+        "size": rng.choice(["XS", "S", "M", "L", "XL"]),
+        "color": rng.choice(["black", "white", "navy", "red"]),
+        "material": rng.choice(["cotton", "polyester", "blend"]),
+    }}
+
+
+def _product_batches(rng, count, batch_size):
+    types, weights = zip(*PRODUCT_MIX)
+    tables = [Product.__table__, Book.__table__, ChildrenBook.__table__, ComicBook.__table__,
+              EBook.__table__, TShirt.__table__, Pricing.__table__]
+    first = _next_id(Product)
+    pricing_id = _next_id(Pricing)
+    for start in range(first, first + count, batch_size):
+        rows = {table: [] for table in tables}
+        for product_id in range(start, min(start + batch_size, first + count)):
+            product_type = rng.choices(types, weights)[0]
+            price = Decimal(rng.randint(299, 4999)) / 100
+            rows[Product.__table__].append({
+                "id": product_id,
+                "product_type": product_type,
+                "name": _title(rng),
+                "description": " ".join(rng.choices(WORDS, k=rng.randint(10, 40))),
+                "sku": f"GEN-{product_id:09d}",
+                "price": price,
+            })
+            for table, values in _subclass_values(rng, product_type, product_id).items():
+                rows[table].append(values)
+
+            discount = rng.choice([Decimal("0"), Decimal("0.10"), Decimal("0.20")])
+            tax_rate = rng.choice([Decimal("0"), Decimal("0.07")])
+            rows[Pricing.__table__].append({
+                "id": pricing_id,
+                "product_id": product_id,
+                "base_price": price,
+                "discount": discount,
+                "tax_rate": tax_rate,
+                "final_price": (price * (1 - discount) * (1 + tax_rate)).quantize(Decimal("0.01")),
+            })
+            pricing_id += 1
+        # Parent tables come first in `tables`, so child rows always find their parent
+        yield [(table, rows[table]) for table in tables]
+
+
+def _order_batches(rng, count, batch_size, customer_ids, products):
+    # Lines are priced like a checkout, and orders total their lines
+    first = _next_id(Order)
+    item_id = _next_id(OrderItem)
+    for start in range(first, first + count, batch_size):
+        rows, items = [], []
+        for order_id in range(start, min(start + batch_size, first + count)):
+            total = Decimal("0")
+            lines = rng.sample(products, rng.randint(1, min(MAX_ORDER_ITEMS, len(products))))
+            for product_id, unit_price in sorted(lines):
+                unit_price = Decimal(unit_price).quantize(Decimal("0.01"))
+                quantity = rng.randint(1, MAX_ITEM_QUANTITY)
+                items.append({
+                    "id": item_id,
+                    "order_id": order_id,
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "unit_price": unit_price,
+                    "line_total": unit_price * quantity,
+                })
+                total += unit_price * quantity
+                item_id += 1
+            rows.append({
+                "id": order_id,
+                "customer_id": rng.choice(customer_ids),
+                "status": rng.choice(ORDER_STATUSES),
+                "total_price": total,
+            })
+        yield [(Order.__table__, rows), (OrderItem.__table__, items)]
+
+
+def generate(users=0, products=0, orders=0, seed=42, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Appends deterministic synthetic data: the same seed against the same
+    starting ids always produces the same rows. Every generated user shares
+    DEFAULT_PASSWORD, hashed once, so password hashing does not dominate.
+    """
+    rng = random.Random(seed)
+    report = SeedReport()
+
+    if users:
+        password_hash = password_hasher.hash(DEFAULT_PASSWORD)
+        _write(_user_batches(rng, users, batch_size, password_hash), report, "users")
+    if products:
+        _write(_product_batches(rng, products, batch_size), report, "products+pricing")
+    if orders:
+        # Sample existing customers rather than assuming ids without gaps
+        customer_ids = db.session.execute(
+            select(User.id).order_by(User.id).limit(MAX_CUSTOMER_SAMPLE)
+        ).scalars().all()
+        if not customer_ids:
+            raise ValueError("Orders need customers, generate some users first")
+        # Products with the price a checkout would charge: pricing row, else list price
+        products = db.session.execute(
+            select(Product.id, func.coalesce(Pricing.final_price, Product.price))
+            .outerjoin(Pricing, Pricing.product_id == Product.id)
+            .order_by(Product.id).limit(MAX_PRODUCT_SAMPLE)
+        ).all()
+        if not products:
+            raise ValueError("Orders need products, generate some products first")
+        _write(_order_batches(rng, orders, batch_size, customer_ids, [tuple(p) for p in products]),
+               report, "orders+items")
+
+    _reset_sequences(User, Product, Pricing, Order, OrderItem)
+    return report
@@ -0,0 +1,143 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from operator import attrgetter, itemgetter
+from flask import Response, current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from .pagination import keyset_window, encode_cursor, ORDERINGS
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in the Pipfile, stdlib json is the fallback
+    orjson = None
+
+# Rows fetched from the database cursor, serialized and sent per chunk
+STREAM_CHUNK_ROWS = 250
+
+# Never serialized, whatever the model
+HIDDEN_FIELDS = {"password_hash", "idempotency_key", "request_hash"}
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+# Python types that to_dict() turns into strings; everything else is JSON native
+_CONVERTERS = {
+    datetime: _isoformat,
+    date: _isoformat,
+    Decimal: str,
+}
+
+
+def converter_for(column_type):
+    """The to_dict() conversion for values of a SQL column type, or None."""
+    try:
+        return _CONVERTERS.get(column_type.python_type)
+    except NotImplementedError:
+        return None
+
+
+class Encoder:
+    """
+    Turns instances of one mapped class into the dict its to_dict() builds,
+    without the per-level dict merges. Loaded column values are read in one
+    call straight from the instance __dict__, skipping the ORM attribute
+    descriptors; only the datetime and Decimal columns get converted.
+    """
+
+    def __init__(self, cls):
+        columns = [prop for prop in cls.__mapper__.column_attrs if prop.key not in HIDDEN_FIELDS]
+        self.keys = tuple(prop.key for prop in columns)
+        self.loaded_getter = itemgetter(*self.keys)
+        # Expired or deferred attributes are missing from __dict__; the
+        # descriptors load them
+        self.getter = attrgetter(*self.keys)
+        self.converters = []
+        for i, prop in enumerate(columns):
+            convert = converter_for(prop.columns[0].type)
+            if convert is not None:
+                self.converters.append((i, convert))
+
+    def __call__(self, obj):
+        try:
+            values = self.loaded_getter(obj.__dict__)
+        except KeyError:
+            values = self.getter(obj)
+        values = list(values) if len(self.keys) > 1 else [values]
+        for i, convert in self.converters:
+            if values[i] is not None:
+                values[i] = convert(values[i])
+        return dict(zip(self.keys, values))
+
+
+_encoders = {}
+
+
+def encoder_for(cls):
+    encoder = _encoders.get(cls)
+    if encoder is None:
+        encoder = _encoders[cls] = Encoder(cls)
+    return encoder
+
+
+def serialize(obj):
+    """The to_dict() representation of any model instance, built by its class's encoder."""
+    return encoder_for(type(obj))(obj)
+
+
+# -------------------- JSON backend --------------------
+
+def dumps(obj, sort_keys=False, default=None):
+    """JSON bytes, encoded with orjson when it is installed."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option)
+    return json.dumps(obj, sort_keys=sort_keys, default=default, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with compact responses encoded by orjson when available."""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get("indent") is not None or kwargs.get("cls") is not None:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, sort_keys=kwargs.get("sort_keys", self.sort_keys),
+                     default=kwargs.get("default", self.default)).decode("utf-8")
+
+
+# -------------------- Streamed pages --------------------
+
+def _stream_page(window, order, limit, encode, sort_keys):
+    # Rows come off a server-side cursor STREAM_CHUNK_ROWS at a time, so only
+    # one chunk of ORM objects and JSON is alive however large the page is.
+    yield b'{"items":['
+    chunk, last, sent = [], None, 0
+    for row in window.yield_per(STREAM_CHUNK_ROWS):
+        if sent == limit:
+            # The look-ahead row: another page exists after `last`
+            break
+        chunk.append(dumps(encode(row), sort_keys=sort_keys))
+        last, sent = row, sent + 1
+        if len(chunk) == STREAM_CHUNK_ROWS:
+            yield (b"," if sent > len(chunk) else b"") + b",".join(chunk)
+            chunk = []
+    else:
+        last = None
+    if chunk:
+        yield (b"," if sent > len(chunk) else b"") + b",".join(chunk)
+    next_cursor = encode_cursor(order, [getattr(last, name) for name in ORDERINGS[order]]) if last else None
+    yield b'],"next":' + dumps(next_cursor) + b"}\n"
+
+
+def stream_page(query, model, encode=serialize):
+    """
+    Keyset page of query as a streamed {"items": [...], "next": cursor}
+    response, with the same shape as page_response() but never built in
+    memory. encode(row) -> dict defaults to serialize().
+    """
+    window, order, limit = keyset_window(query, model)
+    body = _stream_page(window, order, limit, encode, current_app.json.sort_keys)
+    return Response(stream_with_context(body), mimetype="application/json")
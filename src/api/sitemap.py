@@ -0,0 +1,296 @@
+import fcntl
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+from flask import abort, current_app, request
+from sqlalchemy import false, func, select
+from werkzeug.utils import send_file
+from .models import db, Product
+from .pagination import _bind_value
+from .serializers import STREAM_CHUNK_ROWS
+from .utils import APIException
+
+SHARD_SIZE = 50000  # URLs per shard, the most the sitemap protocol allows
+DEFAULT_PRODUCT_PATH = "/products/{id}"
+DEFAULT_REFRESH_SECONDS = 300
+# A row can commit with an updated_at older than the watermark (Postgres
+# stamps the transaction start), so refreshes look back this far and skip
+# the rows they have already seen
+DEFAULT_LAG_SECONDS = 120
+XMLNS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def _w3c(timestamp):
+    # Stored timestamps are naive UTC (func.now())
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.isoformat(timespec="seconds")
+
+
+def _later(stamp, timestamp):
+    """The later of an ISO stamp (or None) and a datetime, as an ISO stamp."""
+    if stamp is None or datetime.fromisoformat(stamp) < timestamp:
+        return timestamp.isoformat()
+    return stamp
+
+
+class ProductSitemap:
+    """
+    /sitemap.xml for the product catalog: a sitemap index over shards of at
+    most shard_size URLs. Shard k lists the products with ids in
+    (k * shard_size, (k + 1) * shard_size], so a product never changes shard
+    and a shard is read with one range scan of the primary key, through a
+    server-side cursor.
+
+    Shards are written to files under root and served from there. state.json
+    next to them holds each shard's lastmod and stale flag, and a watermark
+    on products.updated_at: a refresh reads only the rows updated since the
+    watermark (ix_products_updated_at_id) and marks their shards stale, and
+    a stale shard is rebuilt when it is next requested. No crawler request
+    reads more than one shard's id range.
+    """
+
+    def __init__(self, root=None, base_url=None, product_path=DEFAULT_PRODUCT_PATH, shard_size=SHARD_SIZE,
+                 refresh_seconds=DEFAULT_REFRESH_SECONDS, lag_seconds=DEFAULT_LAG_SECONDS):
+        self.root = root
+        self.base_url = base_url
+        self.product_path = product_path
+        self.shard_size = shard_size
+        self.refresh_seconds = refresh_seconds
+        self.lag_seconds = lag_seconds
+
+    def init_app(self, app):
+        app.config.setdefault("SITEMAP_DIR", os.getenv("SITEMAP_DIR", os.path.join(app.instance_path, "sitemaps")))
+        app.config.setdefault("SITEMAP_BASE_URL", os.getenv("SITEMAP_BASE_URL"))
+        app.config.setdefault("SITEMAP_PRODUCT_PATH", os.getenv("SITEMAP_PRODUCT_PATH", DEFAULT_PRODUCT_PATH))
+        app.config.setdefault("SITEMAP_SHARD_SIZE", int(os.getenv("SITEMAP_SHARD_SIZE", SHARD_SIZE)))
+        app.config.setdefault("SITEMAP_REFRESH_SECONDS", int(os.getenv("SITEMAP_REFRESH_SECONDS", DEFAULT_REFRESH_SECONDS)))
+        if not 0 < app.config["SITEMAP_SHARD_SIZE"] <= SHARD_SIZE:
+            raise ValueError(f"SITEMAP_SHARD_SIZE must be between 1 and {SHARD_SIZE}")
+        self.root = app.config["SITEMAP_DIR"]
+        # Server configuration only, never the request's Host header: a
+        # forged host would end up in every cached <loc>
+        self.base_url = app.config["SITEMAP_BASE_URL"]
+        if not self.base_url and app.config.get("SERVER_NAME"):
+            self.base_url = (f"{app.config['PREFERRED_URL_SCHEME']}://{app.config['SERVER_NAME']}"
+                             f"{app.config['APPLICATION_ROOT']}")
+        self.product_path = app.config["SITEMAP_PRODUCT_PATH"]
+        self.shard_size = app.config["SITEMAP_SHARD_SIZE"]
+        self.refresh_seconds = app.config["SITEMAP_REFRESH_SECONDS"]
+
+    # ---- State ----
+
+    def _shard_path(self, shard):
+        return os.path.join(self.root, f"products-{shard}.xml")
+
+    def _new_state(self):
+        return {"layout": [self.product_path, self.shard_size], "base_url": self.base_url, "watermark": None,
+                "recent": {}, "refreshed_at": 0, "shard_count": 0, "shards": {}}
+
+    @contextmanager
+    def _locked(self):
+        """
+        Yields state.json under an exclusive file lock shared by every worker
+        on the host, and writes it back atomically if it changed.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, "state.json")
+        with open(os.path.join(self.root, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(path) as f:
+                    saved = f.read()
+                state = json.loads(saved)
+            except (FileNotFoundError, ValueError):
+                saved, state = None, self._new_state()
+            # Another base URL, product path or shard size changes every URL: start over
+            if state.get("layout") != [self.product_path, self.shard_size] or state.get("base_url") != self.base_url:
+                state = self._new_state()
+            yield state
+            text = json.dumps(state)
+            if text != saved:
+                fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+                with os.fdopen(fd, "w") as f:
+                    f.write(text)
+                os.replace(tmp_path, path)
+
+    def _require_base_url(self):
+        if not self.base_url:
+            raise APIException("The sitemap is not configured: set SITEMAP_BASE_URL", status_code=503)
+        return self.base_url.rstrip("/")
+
+    def _mark_stale(self, state, shard, updated_at=None):
+        entry = state["shards"].setdefault(str(shard), {"lastmod": None, "urls": None, "version": 0})
+        entry["stale"] = True
+        entry["version"] += 1
+        if updated_at is not None:
+            entry["lastmod"] = _later(entry["lastmod"], updated_at)
+
+    def invalidate(self, product_id):
+        """Marks the shard of a deleted product stale; updates are picked up by refresh."""
+        with self._locked() as state:
+            self._mark_stale(state, (product_id - 1) // self.shard_size)
+
+    def refresh(self, force=False):
+        """
+        Marks the shards of products created or updated since the last
+        refresh stale, at most once every refresh_seconds unless force.
+        Returns the state.
+        """
+        with self._locked() as state:
+            if not force and time.time() - state["refreshed_at"] < self.refresh_seconds:
+                return state
+            self._require_base_url()
+            max_id = db.session.scalar(select(func.max(Product.id))) or 0
+            shard_count = -(-max_id // self.shard_size)
+            for shard in range(shard_count):
+                if str(shard) not in state["shards"]:
+                    self._mark_stale(state, shard)
+            for shard in [int(key) for key in state["shards"] if int(key) >= shard_count]:
+                # Every product past the last shard was deleted
+                del state["shards"][str(shard)]
+                if os.path.exists(self._shard_path(shard)):
+                    os.unlink(self._shard_path(shard))
+
+            lag = timedelta(seconds=self.lag_seconds)
+            if state["watermark"]:
+                watermark = datetime.fromisoformat(state["watermark"])
+            else:
+                # First refresh: every shard is stale already, start from the newest row
+                watermark = db.session.scalar(select(func.max(Product.updated_at)))
+            # Newest first, so rows within lag of the new watermark are the
+            # first ones read and only they are remembered
+            rows = db.session.execute(
+                select(Product.id, Product.updated_at)
+                .where(Product.updated_at >= _bind_value(watermark - lag) if watermark else false())
+                .order_by(Product.updated_at.desc(), Product.id.desc())
+                .execution_options(stream_results=True, yield_per=STREAM_CHUNK_ROWS)
+            )
+            seen, recent = state["recent"], {}
+            for product_id, updated_at in rows:
+                if not recent and updated_at > watermark:
+                    watermark = updated_at
+                stamp = updated_at.isoformat()
+                if seen.get(str(product_id)) != stamp:
+                    self._mark_stale(state, (product_id - 1) // self.shard_size, updated_at)
+                if updated_at >= watermark - lag:
+                    recent[str(product_id)] = stamp
+            db.session.rollback()
+
+            state["watermark"] = watermark.isoformat() if watermark else None
+            state["recent"] = recent
+            state["shard_count"] = shard_count
+            state["refreshed_at"] = time.time()
+            return state
+
+    # ---- Shards ----
+
+    def build_shard(self, shard):
+        """
+        Writes a shard's urlset from a server-side cursor over its id range
+        and clears its stale flag, unless it was marked stale again
+        meanwhile. Returns the number of URLs.
+        """
+        with self._locked() as state:
+            template = escape(self._require_base_url() + self.product_path)
+            version = state["shards"].get(str(shard), {}).get("version")
+        low = shard * self.shard_size
+        rows = db.session.execute(
+            select(Product.id, Product.updated_at)
+            .where(Product.id > low, Product.id <= low + self.shard_size)
+            .order_by(Product.id)
+            .execution_options(stream_results=True, yield_per=STREAM_CHUNK_ROWS)
+        )
+        count, lastmod = 0, None
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{XMLNS}">\n')
+                for chunk in rows.partitions(STREAM_CHUNK_ROWS):
+                    f.writelines(
+                        f"<url><loc>{template.format(id=product_id)}</loc><lastmod>{_w3c(updated_at)}</lastmod></url>\n"
+                        for product_id, updated_at in chunk
+                    )
+                    count += len(chunk)
+                    lastmod = max(lastmod or chunk[0][1], *(row[1] for row in chunk))
+                f.write("</urlset>\n")
+            db.session.rollback()
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self._shard_path(shard))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        with self._locked() as state:
+            entry = state["shards"].setdefault(str(shard), {"lastmod": None, "stale": False, "version": 0})
+            if entry["version"] == version:
+                entry["stale"] = False
+            entry["urls"] = count
+            if lastmod is not None:
+                entry["lastmod"] = _later(entry["lastmod"], lastmod)
+        return count
+
+    def build(self, full=False):
+        """
+        Refreshes and rebuilds every stale shard (every shard when full), e.g.
+        after a deploy so crawlers never wait on a cold shard. Returns
+        (shards built, URLs written).
+        """
+        if full:
+            with self._locked() as state:
+                state.clear()
+                state.update(self._new_state())
+        state = self.refresh(force=True)
+        built = urls = 0
+        for shard in range(state["shard_count"]):
+            entry = state["shards"][str(shard)]
+            if entry["stale"] or not os.path.isfile(self._shard_path(shard)):
+                urls += self.build_shard(shard)
+                built += 1
+        return built, urls
+
+    # ---- Responses ----
+
+    def index_response(self):
+        """The sitemap index: one entry per shard, dated by its newest product."""
+        base_url = escape(self._require_base_url())
+        state = self.refresh()
+        parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{XMLNS}">\n']
+        for shard in range(state["shard_count"]):
+            entry = state["shards"][str(shard)]
+            if entry["urls"] == 0 and not entry["stale"]:
+                # Every product of the range was deleted
+                continue
+            lastmod = f"<lastmod>{_w3c(datetime.fromisoformat(entry['lastmod']))}</lastmod>" if entry["lastmod"] else ""
+            parts.append(f"<sitemap><loc>{base_url}/sitemaps/products-{shard}.xml</loc>{lastmod}</sitemap>\n")
+        parts.append("</sitemapindex>\n")
+        response = current_app.response_class("".join(parts), mimetype="application/xml")
+        response.add_etag()
+        response.cache_control.public = True
+        response.cache_control.max_age = self.refresh_seconds
+        return response.make_conditional(request)
+
+    def shard_response(self, shard):
+        """A shard's urlset from disk, rebuilt first if it is stale."""
+        self._require_base_url()
+        state = self.refresh()
+        entry = state["shards"].get(str(shard))
+        if entry is None or shard >= state["shard_count"]:
+            abort(404)
+        path = self._shard_path(shard)
+        if entry["stale"] or not os.path.isfile(path):
+            self.build_shard(shard)
+        response = send_file(
+            path, request.environ, mimetype="application/xml", conditional=True,
+            max_age=self.refresh_seconds, response_class=current_app.response_class,
+        )
+        response.cache_control.public = True
+        return response
+
+
+product_sitemap = ProductSitemap()
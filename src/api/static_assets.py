@@ -0,0 +1,96 @@
+import hashlib
+import mimetypes
+import os
+import re
+from flask import Response, request, send_file
+
+# Webpack [contenthash] file names, e.g. main.3f2a9c1b.js or 3f2a9c1b4d5e.png
+HASHED_NAME = re.compile(r"(^|\.)[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Precompressed variants, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class Asset:
+    def __init__(self, path, relpath):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.mimetype = mimetypes.guess_type(relpath)[0] or "application/octet-stream"
+        self.immutable = bool(HASHED_NAME.search(os.path.basename(relpath)))
+        self.etag = hashlib.sha1(f"{relpath}:{self.size}:{self.mtime}".encode("utf-8")).hexdigest()
+        self.variants = {
+            encoding: path + suffix for encoding, suffix in ENCODINGS if os.path.isfile(path + suffix)
+        }
+
+
+class StaticManifest:
+    """
+    In-memory index of the built front end in public/, taken once at startup
+    so serving a file never touches the filesystem to find out whether it
+    exists. index.html, the SPA fallback, is held in memory as bytes.
+    """
+
+    def __init__(self, root, auto_reload=False):
+        self.root = root
+        self.auto_reload = auto_reload
+        self.scan()
+
+    def scan(self):
+        assets = {}
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+                    continue
+                path = os.path.join(directory, name)
+                relpath = os.path.relpath(path, self.root).replace(os.sep, "/")
+                assets[relpath] = Asset(path, relpath)
+        self.assets = assets
+
+        index = assets.get("index.html")
+        self.index_html = None
+        if index is not None:
+            with open(index.path, "rb") as f:
+                self.index_html = f.read()
+            self.index_etag = index.etag
+
+    def index_response(self):
+        if self.index_html is None:
+            return Response("Front end not built, run: npm run build", status=404)
+        response = Response(self.index_html, mimetype="text/html")
+        response.set_etag(self.index_etag)
+        # The entry document must always be revalidated so new bundle names are picked up
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    def response(self, path):
+        asset = self.assets.get(path)
+        if asset is None and self.auto_reload:
+            self.scan()
+            asset = self.assets.get(path)
+        if asset is None or path == "index.html":
+            return self.index_response()
+
+        encoding = next(
+            (e for e, _ in ENCODINGS if e in asset.variants and e in request.accept_encodings), None
+        )
+        response = send_file(
+            asset.variants[encoding] if encoding else asset.path,
+            mimetype=asset.mimetype,
+            etag=f"{asset.etag}-{encoding}" if encoding else asset.etag,
+            last_modified=asset.mtime,
+            conditional=True,
+            max_age=IMMUTABLE_MAX_AGE if asset.immutable else None,
+        )
+        if encoding:
+            response.content_encoding = encoding
+        if asset.variants:
+            response.vary.add("Accept-Encoding")
+        if asset.immutable:
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
@@ -0,0 +1,7 @@
+# ASGI entry point for the async, read-only catalog endpoints. Serve it with uvicorn
+# next to the gunicorn/wsgi.py app and route catalog reads to it:
+#   $ uvicorn asgi:application --app-dir src --port 3002
+
+from api.async_catalog import CatalogApp
+
+application = CatalogApp()
@@ -0,0 +1,330 @@
+"""
+In-process benchmark for the API routes and the model serializers.
+
+Every dataset size is seeded into a scratch database (SQLite by default) with
+the synthetic data generator, then each endpoint is exercised through the
+Flask test client. Results are written as JSON so two commits can be compared:
+
+    $ python src/benchmark.py --sizes 1000,10000 --output bench-main.json
+    $ python src/benchmark.py --sizes 1000,10000 --output bench-mine.json --compare bench-main.json
+
+--asgi also drives the read-only catalog endpoints through the async app in
+asgi.py and compares its throughput under --concurrency in-flight requests
+with the sync Flask app served from a thread per request.
+
+--checkout stress tests POST /api/orders: --concurrency threads place orders
+for a handful of hot products, every order sent twice with its
+Idempotency-Key as a client retry would. The run fails if any request errors,
+a retry creates a second order or an order total disagrees with its lines.
+
+Use --database-url postgresql://... to run against a local Postgres database.
+All of its tables are dropped and recreated, so never point it at real data.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000", help="comma separated product counts")
+    parser.add_argument("--requests", type=int, default=100, help="timed requests per endpoint")
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument("--cache", action="store_true", help="keep the catalog cache enabled")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--asgi", action="store_true", help="compare catalog reads with the async app")
+    parser.add_argument("--concurrency", type=int, default=50, help="in-flight requests for --asgi/--checkout")
+    parser.add_argument("--checkout", action="store_true", help="stress test concurrent order placement")
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "benchmark.db")
+os.environ["CATALOG_CACHE_BACKEND"] = "memory" if args.cache else "none"
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+
+from sqlalchemy import event, func, text  # noqa: E402
+from app import app  # noqa: E402
+from api.models import db, User, Product, Pricing, Order, OrderItem, PRODUCT_MODELS  # noqa: E402
+from api.seed import generate  # noqa: E402
+from api.serializers import serialize  # noqa: E402
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def endpoints(ids):
+    """(name, method, url, body, conditional) for every route worth timing."""
+    product_id, user_id = ids["product"], ids["user"]
+    return [
+        ("GET /api/users", "GET", "/api/users", None, False),
+        ("GET /api/users/<id>", "GET", f"/api/users/{user_id}", None, False),
+        ("GET /api/products", "GET", "/api/products", None, False),
+        ("GET /api/products?limit=500", "GET", "/api/products?limit=500", None, False),
+        ("GET /api/products?type=book", "GET", "/api/products?type=book", None, False),
+        ("GET /api/products/<id>", "GET", f"/api/products/{product_id}", None, False),
+        ("GET /api/products/<id> (304)", "GET", f"/api/products/{product_id}", None, True),
+        ("GET /api/standard_specifications/book", "GET", "/api/standard_specifications/book", None, False),
+        ("GET /pricing/pricing", "GET", "/pricing/pricing", None, False),
+        ("GET /pricing/pricing/<id>", "GET", f"/pricing/pricing/{product_id}", None, False),
+        ("PUT /api/products/<id>", "PUT", f"/api/products/{product_id}", {"description": "benchmark"}, False),
+        ("POST /pricing/pricing", "POST", "/pricing/pricing",
+         {"product_id": product_id, "base_price": 10, "discount": 0, "tax_rate": 0}, False),
+    ]
+
+
+def bench_endpoint(client, counter, method, url, body, conditional, requests):
+    # Conditional requests revalidate the copy from a first, unconditional GET
+    headers = {"If-None-Match": client.get(url).headers["ETag"]} if conditional else {}
+    client.open(url, method=method, json=body, headers=headers, buffered=True)  # warm up
+
+    latencies, queries = [], []
+    for _ in range(requests):
+        counter.count = 0
+        started = time.perf_counter()
+        response = client.open(url, method=method, json=body, headers=headers, buffered=True)
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+    status = response.status_code
+
+    tracemalloc.start()
+    for _ in range(min(requests, 10)):
+        client.open(url, method=method, json=body, headers=headers, buffered=True)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "status": status,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "queries_per_request": round(statistics.mean(queries), 2),
+        "alloc_peak_kib": round(peak / 1024, 1),
+    }
+
+
+def bench_serializers(requests):
+    results = {}
+    for name, model in list(PRODUCT_MODELS.items()) + [("user", User), ("pricing", Pricing), ("order", Order)]:
+        query = model.query
+        if model in PRODUCT_MODELS.values():
+            query = query.filter(Product.product_type == model.__mapper__.polymorphic_identity)
+        rows = query.limit(500).all()
+        if not rows:
+            continue
+        rounds = max(1, requests // 10)
+        for label, encode in (("to_dict", lambda row: row.to_dict()), ("serialize", serialize)):
+            started = time.perf_counter()
+            for _ in range(rounds):
+                for row in rows:
+                    encode(row)
+            elapsed = time.perf_counter() - started
+            results[f"{model.__name__}.{label}"] = {
+                "us_per_row": round(elapsed / (len(rows) * rounds) * 1e6, 3),
+            }
+    return results
+
+
+def run_size(size, requests):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        generate(users=max(10, size // 10), products=size, orders=size // 2, seed=42)
+        ids = {
+            "product": db.session.query(Product.id).filter(Product.product_type == "book").limit(1).scalar(),
+            # Two levels below Product: its books.* columns are inherited
+            "children_book": db.session.query(Product.id).filter(Product.product_type == "children_book").limit(1).scalar(),
+            "user": db.session.query(User.id).limit(1).scalar(),
+        }
+        counter = QueryCounter(db.engine)
+        client = app.test_client()
+        results = {}
+        for name, method, url, body, conditional in endpoints(ids):
+            results[name] = bench_endpoint(client, counter, method, url, body, conditional, requests)
+        results.update(bench_serializers(requests))
+        if args.asgi:
+            results.update(bench_async_catalog(ids, requests, args.concurrency))
+        if args.checkout:
+            results.update(stress_checkout(requests, args.concurrency))
+        db.session.remove()
+    return results
+
+
+def catalog_read_urls(ids):
+    return [
+        ("GET /api/products", "/api/products"),
+        ("GET /api/products/<id>", f"/api/products/{ids['product']}"),
+        ("GET /api/standard_specifications/book", "/api/standard_specifications/book"),
+        ("GET /api/products/<children_book id>", f"/api/products/{ids['children_book']}"),
+        ("GET /api/products?type=children_book", "/api/products?type=children_book"),
+        ("GET /api/standard_specifications/children_book", "/api/standard_specifications/children_book"),
+        ("GET /pricing/pricing/<id>", f"/pricing/pricing/{ids['product']}"),
+    ]
+
+
+async def _asgi_get(asgi, url):
+    parts = urlsplit(url)
+    scope = {"type": "http", "method": "GET", "path": parts.path, "query_string": parts.query.encode()}
+    status = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await asgi(scope, None, send)
+    return status[0]
+
+
+async def _asgi_run(asgi, url, requests, concurrency):
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        status = await _asgi_get(asgi, url)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[_asgi_get(asgi, url) for _ in range(concurrency * 4)])
+    throughput = concurrency * 4 / (time.perf_counter() - started)
+    return status, latencies, throughput
+
+
+def _wsgi_throughput(url, concurrency):
+    def get(_):
+        return app.test_client().get(url).status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(get, range(concurrency * 4)))
+    return concurrency * 4 / (time.perf_counter() - started)
+
+
+def bench_async_catalog(ids, requests, concurrency):
+    from api.async_catalog import CatalogApp
+
+    async def run():
+        asgi = CatalogApp(os.environ["DATABASE_URL"])
+        results = {}
+        for name, url in catalog_read_urls(ids):
+            status, latencies, throughput = await _asgi_run(asgi, url, requests, concurrency)
+            results[f"{name} [asgi]"] = {
+                "status": status,
+                "p50_ms": round(percentile(latencies, 50), 3),
+                "p95_ms": round(percentile(latencies, 95), 3),
+                f"rps_at_{concurrency}": round(throughput, 1),
+            }
+            results[f"{name} [wsgi]"] = {
+                f"rps_at_{concurrency}": round(_wsgi_throughput(url, concurrency), 1),
+            }
+        await asgi.engine.dispose()
+        return results
+
+    return asyncio.run(run())
+
+
+def stress_checkout(requests, concurrency, hot_products=5):
+    product_ids = db.session.query(Product.id).order_by(Product.id).limit(hot_products).all()
+    customer_ids = db.session.query(User.id).order_by(User.id).limit(concurrency).all()
+    product_ids, customer_ids = [p for p, in product_ids], [c for c, in customer_ids]
+    orders_before = db.session.query(Order.id).count()
+    last_order_id = db.session.query(func.max(Order.id)).scalar() or 0
+    db.session.remove()
+
+    def checkout(attempt):
+        # Attempts 2n and 2n + 1 carry the same order and key, and usually
+        # run at the same time on different threads
+        n = attempt // 2
+        body = {
+            "customer_id": customer_ids[n % len(customer_ids)],
+            "items": [{"product_id": p, "quantity": 1 + (n + i) % 3}
+                      for i, p in enumerate(product_ids[n % 2:])],
+        }
+        headers = {"Idempotency-Key": f"stress-{os.getpid()}-{n}"}
+        return app.test_client().post("/api/orders", json=body, headers=headers).status_code
+
+    count = requests * 4
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(checkout, range(count * 2)))
+    elapsed = time.perf_counter() - started
+
+    created = db.session.query(Order.id).count() - orders_before
+    mismatched = db.session.execute(text(
+        "SELECT count(*) FROM orders o WHERE o.id > :last_order_id AND abs(o.total_price - "
+        "(SELECT coalesce(sum(i.line_total), 0) FROM order_items i WHERE i.order_id = o.id)) >= 0.01"
+    ), {"last_order_id": last_order_id}).scalar()
+    failures = {
+        "errors": sum(status != 201 for status in statuses),
+        "duplicate_orders": created - count,
+        "mismatched_totals": mismatched,
+    }
+    result = {
+        "status": 201,
+        f"orders_per_s_at_{concurrency}": round(count / elapsed, 1),
+        "order_items": db.session.query(OrderItem.id).count(),
+        **failures,
+    }
+    if any(failures.values()):
+        raise SystemExit(f"Checkout stress test failed: {failures}")
+    return {"POST /api/orders (stress)": result}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous):
+    for size, results in current["sizes"].items():
+        before = previous.get("sizes", {}).get(size, {})
+        for name, result in results.items():
+            metric = next((k for k in ("p50_ms", "us_per_row") if k in result), next(iter(result)))
+            old, new = before.get(name, {}).get(metric), result[metric]
+            if old:
+                print(f"{size:>8} {name:<42} {metric} {old:>9.3f} -> {new:>9.3f} ({(new - old) / old * 100:+.1f}%)")
+
+
+def main():
+    report = {
+        "revision": git_revision(),
+        "database": os.environ["DATABASE_URL"].split(":")[0],
+        "requests": args.requests,
+        "sizes": {},
+    }
+    for size in [int(s) for s in args.sizes.split(",")]:
+        print(f"Benchmarking with {size} products...")
+        report["sizes"][str(size)] = results = run_size(size, args.requests)
+        for name, result in results.items():
+            print(f"  {name:<42} " + " ".join(f"{k}={v}" for k, v in result.items()))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import pytest
+
+# src/app.py configures itself from the environment when it is imported,
+# so point every store at a scratch directory first
+INSTANCE_DIR = tempfile.mkdtemp(prefix="api-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(INSTANCE_DIR, 'test.db')}",
+    "JWT_SECRET_KEY": "test",
+    "CATALOG_CACHE_BACKEND": "none",
+    "PASSWORD_HASH_WORKERS": "0",
+    "MEDIA_PROCESS_WORKERS": "0",
+    "EBOOK_STORE_DIR": os.path.join(INSTANCE_DIR, "ebooks"),
+    "MEDIA_STORE_DIR": os.path.join(INSTANCE_DIR, "media"),
+    "SITEMAP_DIR": os.path.join(INSTANCE_DIR, "sitemaps"),
+    "SITEMAP_BASE_URL": "https://shop.example.com",
+})
+
+from app import app as flask_app  # noqa: E402
+from api.models import db  # noqa: E402
+from api.search import rebuild_search_index  # noqa: E402
+from api.seed import generate  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """The app over empty tables, recreated for every test."""
+    with flask_app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        rebuild_search_index()
+        yield flask_app
+        db.session.remove()
+    shutil.rmtree(os.environ["SITEMAP_DIR"], ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def catalog(app):
+    """A small deterministic catalog: every product type, users and orders."""
+    generate(users=20, products=120, orders=30, seed=7)
+    rebuild_search_index()
+    return app
+
+
+@pytest.fixture
+def count_queries(app):
+    """count_queries() -> list that collects every SQL statement run while it is open."""
+    from contextlib import contextmanager
+    from sqlalchemy import event
+
+    @contextmanager
+    def capture():
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+    return capture
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from api.async_catalog import CatalogApp
+from api.models import db, Product
+
+
+def fetch(paths):
+    """Dispatches GETs to a fresh CatalogApp over the test database, returning (status, payload) per path."""
+    async def run():
+        catalog = CatalogApp()
+        try:
+            results = []
+            for path in paths:
+                path, _, query = path.partition("?")
+                results.append(await catalog.dispatch({"path": path, "method": "GET", "query_string": query.encode()}))
+            return results
+        finally:
+            await catalog.engine.dispose()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("product_type", ["book", "children_book", "comic_book", "tshirt", "ebook"])
+def test_every_product_type_loads_without_lazy_loads(catalog, product_type):
+    product_id = db.session.query(Product.id).filter(Product.product_type == product_type).limit(1).scalar()
+    (status, product), (list_status, page), (spec_status, specs) = fetch([
+        f"/api/products/{product_id}",
+        f"/api/products?type={product_type}&limit=50",
+        f"/api/standard_specifications/{product_type}?limit=50",
+    ])
+    assert (status, list_status, spec_status) == (200, 200, 200)
+    assert product["product_type"] == product_type
+    assert page["items"] and {item["product_type"] for item in page["items"]} == {product_type}
+    assert specs["items"] == page["items"]
+
+
+def test_children_book_has_inherited_columns(catalog):
+    product_id = db.session.query(Product.id).filter(Product.product_type == "children_book").limit(1).scalar()
+    [(status, product)] = fetch([f"/api/products/{product_id}"])
+    assert status == 200
+    assert product["author"] and product["page_count"] and product["age_group"]
+
+
+def test_mixed_page_and_missing_product(catalog):
+    (status, page), (missing, _) = fetch(["/api/products?limit=200", "/api/products/999999"])
+    assert status == 200 and len(page["items"]) == 120
+    assert missing == 404
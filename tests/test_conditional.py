@@ -0,0 +1,56 @@
+from api.models import db, Product
+
+
+def _product_without_orders(start):
+    return db.session.execute(db.text(
+        "SELECT id FROM products WHERE id > :start AND id NOT IN (SELECT product_id FROM order_items) "
+        "ORDER BY id LIMIT 1"), {"start": start}).scalar()
+
+
+def test_product_etag_roundtrip(client, catalog):
+    response = client.get("/api/products/1")
+    assert response.status_code == 200
+    again = client.get("/api/products/1", headers={"If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def test_list_etag_changes_when_a_row_leaves_the_page(client, catalog):
+    response = client.get("/api/products?limit=5", buffered=True)
+    etag = response.headers["ETag"]
+    assert client.get("/api/products?limit=5", buffered=True, headers={"If-None-Match": etag}).status_code == 304
+
+    # The look-ahead row moves into the page: same count, same max(updated_at)
+    deleted = _product_without_orders(0)
+    assert deleted <= 5
+    db.session.execute(db.text("DELETE FROM pricing WHERE product_id = :id"), {"id": deleted})
+    db.session.delete(db.session.get(Product, deleted))
+    db.session.commit()
+
+    response = client.get("/api/products?limit=5", buffered=True, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert deleted not in [item["id"] for item in response.get_json()["items"]]
+
+
+def test_list_etag_changes_when_a_row_is_updated(client, catalog):
+    etag = client.get("/api/products?limit=5", buffered=True).headers["ETag"]
+    db.session.execute(db.text("UPDATE products SET updated_at = '2999-01-01 00:00:00' WHERE id = 2"))
+    db.session.commit()
+    assert client.get("/api/products?limit=5", buffered=True, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_product_etag_changes_when_only_a_subclass_column_is_updated(client, catalog):
+    book_id = db.session.execute(db.text("SELECT id FROM books ORDER BY id LIMIT 1")).scalar()
+    # Clear of the second the catalog was seeded in, which SQLite timestamps share
+    db.session.execute(db.text("UPDATE products SET updated_at = '2000-01-01 00:00:00' WHERE id = :id"),
+                       {"id": book_id})
+    db.session.commit()
+    response = client.get(f"/api/products/{book_id}")
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    assert client.put(f"/api/products/{book_id}", json={"author": "Someone Else"}).status_code == 200
+    response = client.get(f"/api/products/{book_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.get_json()["author"] == "Someone Else"
@@ -0,0 +1,46 @@
+import pytest
+from api.models import db, EBook
+
+EPUB = b"PK\x03\x04 an epub"
+
+
+@pytest.fixture
+def ebook(catalog):
+    ebook = EBook.query.filter_by(file_format="mobi").first() or EBook.query.first()
+    ebook.file_format = "mobi"
+    db.session.commit()
+    return ebook.id
+
+
+def test_upload_sets_the_format_from_the_content_type(client, ebook):
+    response = client.put(f"/api/ebooks/{ebook}/file", data=EPUB, content_type="application/epub+zip")
+    assert response.status_code == 200
+    assert response.get_json()["product"]["file_format"] == "epub"
+    download = client.get(f"/api/ebooks/{ebook}/download")
+    assert download.mimetype == "application/epub+zip"
+    assert download.headers["Content-Disposition"].endswith('.epub')
+    assert download.get_data() == EPUB
+
+
+def test_octet_stream_keeps_the_format(client, ebook):
+    response = client.put(f"/api/ebooks/{ebook}/file", data=EPUB, content_type="application/octet-stream")
+    assert response.status_code == 200
+    assert response.get_json()["product"]["file_format"] == "mobi"
+
+
+def test_other_content_types_are_refused(client, ebook):
+    response = client.put(f"/api/ebooks/{ebook}/file", data=EPUB, content_type="text/plain")
+    assert response.status_code == 415
+    assert db.session.get(EBook, ebook).content_sha256 is None
+
+
+def test_upload_holds_no_transaction_while_streaming(client, ebook, monkeypatch):
+    from api import ebooks
+    put = ebooks.ebook_store.put
+
+    def checked_put(stream):
+        assert not db.session().in_transaction()
+        return put(stream)
+    monkeypatch.setattr(ebooks.ebook_store, "put", checked_put)
+    response = client.put(f"/api/ebooks/{ebook}/file", data=EPUB, content_type="application/epub+zip")
+    assert response.status_code == 200
@@ -0,0 +1,52 @@
+import pytest
+from api.importer import MAX_CHUNK_SIZE
+from api.models import Product
+
+PRODUCT = '{"product_type": "product", "name": "Pen", "sku": "%s", "price": "1.50"}'
+
+
+def post(client, body, mimetype="application/x-ndjson", **args):
+    return client.post("/api/products/bulk", data=body, content_type=mimetype, query_string=args)
+
+
+def test_invalid_utf8_is_a_row_error(client):
+    body = b"\n".join([(PRODUCT % "SKU-1").encode(), b'{"name": "\xff\xfe"}', (PRODUCT % "SKU-2").encode()])
+    response = post(client, body)
+    assert response.status_code == 201
+    report = response.get_json()
+    assert report["inserted"] == 2
+    assert report["errors"] == [{"line": 2, "sku": None, "error": "Invalid UTF-8"}]
+
+
+def test_invalid_utf8_in_csv_is_a_row_error(client):
+    body = b"name,sku,price\nPen,SKU-1,1.50\nPen \xe9,SKU-2,1.50\n"
+    response = post(client, body, mimetype="text/csv")
+    assert response.status_code == 201
+    assert response.get_json()["errors"] == [{"line": 3, "sku": None, "error": "Invalid UTF-8"}]
+    assert [p.sku for p in Product.query] == ["SKU-1"]
+
+
+def test_chunk_size_is_capped(client):
+    response = post(client, (PRODUCT % "SKU-1").encode(), chunk_size=MAX_CHUNK_SIZE + 1)
+    assert response.status_code == 400
+    assert Product.query.count() == 0
+
+
+def test_optional_columns_are_kept_when_the_first_row_omits_them(client):
+    body = "\n".join([PRODUCT % "SKU-1", PRODUCT.replace('"price"', '"description": "Blue ink", "price"') % "SKU-2"])
+    response = post(client, body.encode())
+    assert response.get_json()["inserted"] == 2
+    assert Product.query.filter_by(sku="SKU-2").one().description == "Blue ink"
+
+
+@pytest.mark.parametrize("name, body", [
+    ("products.ndjson", b"\n".join([(PRODUCT % "SKU-1").encode(), b'{"name": "\xff"}'])),
+    ("products.csv", b"name,sku,price\nPen,SKU-1,1.50\nPen \xe9,SKU-2,1.50\n"),
+])
+def test_command_reports_invalid_utf8_per_row(app, tmp_path, name, body):
+    path = tmp_path / name
+    path.write_bytes(body)
+    result = app.test_cli_runner().invoke(args=["import-products", str(path)])
+    assert result.exit_code == 0, result.output
+    assert "Invalid UTF-8" in result.output
+    assert "Imported 1 products, 1 rows failed" in result.output
@@ -0,0 +1,43 @@
+import pytest
+from api.passwords import PasswordHasher, password_hasher, _method_of
+
+
+@pytest.fixture
+def verified(monkeypatch):
+    """Records the hash of every password_hasher.verify call."""
+    hashes = []
+    verify = password_hasher.verify
+
+    def record(password_hash, password):
+        hashes.append(password_hash)
+        return verify(password_hash, password)
+    monkeypatch.setattr(password_hasher, "verify", record)
+    return hashes
+
+
+@pytest.fixture
+def user(client):
+    response = client.post("/api/users", json={"username": "ada", "email": "ada@example.com", "password": "s3cret"})
+    assert response.status_code == 201
+
+
+def test_login(client, user):
+    response = client.post("/api/login", json={"username": "ada", "password": "s3cret"})
+    assert response.status_code == 200
+    assert response.get_json()["token"]
+
+
+def test_unknown_user_costs_a_verify_like_a_wrong_password(client, user, verified):
+    wrong = client.post("/api/login", json={"username": "ada", "password": "guess"})
+    unknown = client.post("/api/login", json={"username": "nobody", "password": "guess"})
+    assert wrong.status_code == unknown.status_code == 401
+    assert wrong.get_json() == unknown.get_json()
+    real, dummy = verified
+    assert dummy == password_hasher.dummy_hash()
+    assert _method_of(dummy) == _method_of(real)
+
+
+def test_dummy_hash_is_made_at_startup(app):
+    hasher = PasswordHasher(workers=0)
+    hasher.init_app(app)
+    assert hasher._dummy_hash is not None
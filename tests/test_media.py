@@ -0,0 +1,55 @@
+import io
+import os
+import pytest
+from api.media import media_library, MediaBusy
+from api.models import db, Book, ProductAsset
+
+BODY = b"%PDF-1.4 not much of a book"
+
+
+@pytest.fixture
+def saturated(app):
+    """A media pool with a single slot, held for the test."""
+    media_library.configure(workers=1, queue_size=1, queue_timeout=0)
+    with media_library._pool.slot():
+        yield
+    media_library.configure(workers=0, queue_size=1, queue_timeout=0)
+
+
+def stored_files(app):
+    root = app.config["MEDIA_STORE_DIR"]
+    return [name for _, _, names in os.walk(root) for name in names]
+
+
+def upload(client, body):
+    book = Book.query.first()
+    return client.put(f"/api/products/{book.id}/assets/interior", data=body, content_type="application/pdf")
+
+
+def test_busy_upload_leaves_no_file_behind(client, catalog, saturated, monkeypatch):
+    # The body streams in without a slot; only processing needs one
+    streamed = []
+    put = media_library.store.put
+    monkeypatch.setattr(media_library.store, "put", lambda stream: streamed.append(1) or put(stream))
+    before = stored_files(catalog)
+    response = upload(client, BODY)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert streamed
+    assert stored_files(catalog) == before
+    assert ProductAsset.query.count() == 0
+
+
+def test_busy_upload_keeps_a_file_another_asset_uses(client, catalog, saturated):
+    book = Book.query.first()
+    digest, size = media_library.store.put(io.BytesIO(BODY))
+    db.session.add(ProductAsset(product_id=book.id, kind="interior", mimetype="application/pdf",
+                                content_sha256=digest, content_size=size))
+    db.session.commit()
+    assert upload(client, BODY).status_code == 503
+    assert media_library.store.exists(digest)
+
+
+def test_saturated_pool_raises_its_busy_error(saturated):
+    with pytest.raises(MediaBusy):
+        media_library._pool.run(len, "x")
@@ -0,0 +1,32 @@
+import re
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from api.models import db
+
+
+def test_failed_statements_leave_no_start_time_behind(app):
+    with db.engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM no_such_table"))
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+        assert not connection.info.get("query_started")
+
+
+def test_server_timing_counts_queries(client, catalog):
+    response = client.get("/api/users/1")
+    assert response.status_code == 200
+    queries = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response.headers["Server-Timing"])
+    assert queries and int(queries.group(1)) >= 1
+
+
+def test_streamed_pages_are_recorded_when_the_body_is_finished(client, catalog):
+    from api.metrics import request_metrics
+    queries = request_metrics.db_queries.get("api", 0)
+    requests = request_metrics.latency[("api", "GET")].count if ("api", "GET") in request_metrics.latency else 0
+    response = client.get("/api/products?limit=50", buffered=True)
+    assert len(response.get_json()["items"]) == 50
+    # The ETag probe before the headers and the page query while streaming
+    assert request_metrics.db_queries["api"] - queries == 2
+    assert request_metrics.latency[("api", "GET")].count - requests == 1
@@ -0,0 +1,101 @@
+import threading
+import pytest
+from sqlalchemy.exc import OperationalError
+from api import orders
+from api.models import db, User, Product, Order
+from api.orders import place_order
+
+
+class FakePgError(Exception):
+    def __init__(self, pgcode):
+        super().__init__(pgcode)
+        self.pgcode = pgcode
+
+
+@pytest.fixture
+def checkout(catalog):
+    customer_id = db.session.query(User.id).order_by(User.id).limit(1).scalar()
+    product_ids = [id for id, in db.session.query(Product.id).order_by(Product.id).limit(2)]
+    return {"customer_id": customer_id, "items": [{"product_id": id, "quantity": 2} for id in product_ids]}
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(orders, "RETRY_BACKOFF_SECONDS", 0)
+
+
+def test_concurrent_checkouts_with_one_key_create_one_order(catalog, checkout):
+    threads_count = 8
+    start = threading.Barrier(threads_count)
+    results, errors = [], []
+
+    def buy():
+        with catalog.app_context():
+            try:
+                start.wait()
+                order, created = place_order(checkout, "retry-me")
+                results.append((order["id"], created))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=buy) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert [created for _, created in results].count(True) == 1
+    assert len({order_id for order_id, _ in results}) == 1
+    assert Order.query.filter_by(idempotency_key="retry-me").count() == 1
+
+
+@pytest.mark.parametrize("orig", [
+    FakePgError("40P01"),  # deadlock_detected
+    FakePgError("40001"),  # serialization_failure
+    Exception("database is locked"),
+])
+def test_lost_lock_races_are_retried(checkout, monkeypatch, no_backoff, orig):
+    create, attempts = orders._create_order, []
+
+    def flaky(*args):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OperationalError("INSERT INTO orders", {}, orig)
+        return create(*args)
+    monkeypatch.setattr(orders, "_create_order", flaky)
+
+    before = Order.query.count()
+    order, created = place_order(checkout)
+    assert created
+    assert len(attempts) == 3
+    assert Order.query.count() == before + 1
+    assert len(order["items"]) == 2
+
+
+def test_retries_give_up_after_max_attempts(checkout, monkeypatch, no_backoff):
+    attempts = []
+
+    def deadlocked(*args):
+        attempts.append(1)
+        raise OperationalError("INSERT INTO orders", {}, FakePgError("40P01"))
+    monkeypatch.setattr(orders, "_create_order", deadlocked)
+
+    with pytest.raises(OperationalError):
+        place_order(checkout)
+    assert len(attempts) == orders.MAX_ATTEMPTS
+
+
+def test_other_operational_errors_are_not_retried(checkout, monkeypatch, no_backoff):
+    attempts = []
+
+    def broken(*args):
+        attempts.append(1)
+        raise OperationalError("INSERT INTO orders", {}, Exception("no such table: orders"))
+    monkeypatch.setattr(orders, "_create_order", broken)
+
+    with pytest.raises(OperationalError):
+        place_order(checkout)
+    assert len(attempts) == 1
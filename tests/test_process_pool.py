@@ -0,0 +1,34 @@
+import os
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from api.process_pool import BoundedProcessPool
+
+
+def crash_once(marker):
+    """Kills its worker the first time, like an OOM kill, then succeeds."""
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return "done"
+
+
+def crash():
+    os._exit(1)
+
+
+@pytest.fixture
+def pool():
+    pool = BoundedProcessPool(workers=1, queue_size=1, queue_timeout=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_a_dead_worker_is_replaced_and_the_job_retried(pool, tmp_path):
+    assert pool.run(crash_once, str(tmp_path / "crashed")) == "done"
+    assert pool.run(len, "abc") == 3
+
+
+def test_a_job_that_always_kills_its_worker_fails_without_breaking_the_pool(pool):
+    with pytest.raises(BrokenProcessPool):
+        pool.run(crash)
+    assert pool.run(len, "abc") == 3
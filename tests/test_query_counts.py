@@ -0,0 +1,51 @@
+import pytest
+
+# The ETag probe and the page, with every subclass table joined into it
+LIST_QUERIES = 2
+
+
+def queries_for(client, count_queries, url):
+    with count_queries() as statements:
+        response = client.get(url, buffered=True)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return len(statements), response.get_json()
+
+
+@pytest.mark.parametrize("url", [
+    "/api/products?limit={limit}",
+    "/api/products?type=book&limit={limit}",
+    "/api/products?type=children_book&limit={limit}",
+    "/api/products?type=comic_book&limit={limit}",
+    "/api/standard_specifications/children_book?limit={limit}",
+    "/api/standard_specifications/ebook?limit={limit}",
+    "/pricing/pricing?limit={limit}",
+    "/api/products?fields=id,name&limit={limit}",
+])
+@pytest.mark.parametrize("limit", [2, 100, 500])
+def test_list_queries_do_not_grow_with_the_page(client, catalog, count_queries, url, limit):
+    count, page = queries_for(client, count_queries, url.format(limit=limit))
+    assert len(page["items"]) > 1
+    assert count == LIST_QUERIES
+
+
+def test_children_book_page_without_plain_books(client, catalog, count_queries):
+    # books.* must come with the page itself, not from a lazy load per children_book
+    from api.models import db
+    db.session.execute(db.text(
+        "DELETE FROM order_items WHERE product_id IN (SELECT id FROM products WHERE product_type = 'book')"))
+    db.session.execute(db.text(
+        "DELETE FROM pricing WHERE product_id IN (SELECT id FROM products WHERE product_type = 'book')"))
+    db.session.execute(db.text("DELETE FROM books WHERE id IN (SELECT id FROM products WHERE product_type = 'book')"))
+    db.session.execute(db.text("DELETE FROM products WHERE product_type = 'book'"))
+    db.session.commit()
+    count, page = queries_for(client, count_queries, "/api/products?limit=100")
+    assert any(item["product_type"] == "children_book" for item in page["items"])
+    assert count == LIST_QUERIES
+
+
+def test_product_by_id_loads_in_a_fixed_number_of_queries(client, catalog, count_queries):
+    from api.models import db, Product
+    product_id = db.session.query(Product.id).filter(Product.product_type == "children_book").limit(1).scalar()
+    count, product = queries_for(client, count_queries, f"/api/products/{product_id}")
+    assert product["author"] and product["age_group"]
+    assert count <= 3
@@ -0,0 +1,20 @@
+from api.query_plans import check_query_plans, explain
+
+
+def test_guarded_routes_do_not_scan_whole_tables(catalog):
+    checks = check_query_plans(catalog)
+    assert checks
+    for check in checks:
+        assert check.statements, f"{check.name} ran no queries"
+    assert [(check.name, table) for check in checks for _, table in check.failures] == []
+
+
+def test_unindexed_filters_are_reported(catalog):
+    _, scans = explain("SELECT id FROM products WHERE name = ?", ("Pen",))
+    assert scans == ["products"]
+
+
+def test_command(catalog):
+    result = catalog.test_cli_runner().invoke(args=["check-query-plans"])
+    assert result.exit_code == 0, result.output
+    assert "FAIL" not in result.output
@@ -0,0 +1,32 @@
+import pytest
+from api.models import Job
+
+
+def test_reprice(client, catalog):
+    response = client.post("/pricing/bulk", json={"product_type": "book", "discount": "0.1"})
+    assert response.status_code == 200
+    assert response.get_json()["repriced"] > 0
+
+
+def test_queued_reprice(client, app):
+    response = client.post("/pricing/bulk?async=1&priority=-5", json={"discount": "0.1"})
+    assert response.status_code == 202
+    assert Job.query.one().priority == -5
+
+
+@pytest.mark.parametrize("query, rule", [
+    ("?async=1&priority=high", {"discount": "0.1"}),
+    ("?async=1", {"discount": 5}),
+    ("?async=1", {"product_type": "book"}),
+    ("", {"discount": 5}),
+    ("?async=1", {"discount": "NaN"}),
+    ("", {"discount": "NaN"}),
+    ("?async=1", {"tax_rate": "Infinity"}),
+    ("", {"tax_rate": "-Infinity"}),
+    ("", {"tax_rate": "sNaN"}),
+])
+def test_invalid_requests_are_not_queued(client, app, query, rule):
+    response = client.post(f"/pricing/bulk{query}", json=rule)
+    assert response.status_code == 400
+    assert response.is_json
+    assert Job.query.count() == 0
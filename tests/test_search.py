@@ -0,0 +1,57 @@
+import json
+from urllib.parse import quote
+import pytest
+
+BOOK = {"product_type": "book", "price": "12.00", "page_count": 200, "cover_type": "paperback",
+        "trim_size": "6x9", "paper_type": "cream"}
+CHILDREN_BOOK = dict(BOOK, product_type="children_book", age_group="3-5", illustration_style="watercolour")
+PRODUCTS = [
+    dict(CHILDREN_BOOK, name="Goodnight Moon", sku="S-1", isbn="9780000000001", author="Brown"),
+    dict(BOOK, name="Harvest Tales", sku="S-2", isbn="9780000000002", author="Moon",
+         description="Stories for the evening"),
+    {"product_type": "product", "name": "Desk Lamp", "sku": "S-3", "price": "30.00",
+     "description": "Bright as the moon"},
+    {"product_type": "product", "name": "Sun Hat", "sku": "S-4", "price": "15.00"},
+]
+
+
+@pytest.fixture
+def products(client):
+    body = "\n".join(json.dumps(product) for product in PRODUCTS)
+    response = client.post("/api/products/bulk", data=body, content_type="application/x-ndjson")
+    assert response.get_json()["inserted"] == len(PRODUCTS), response.get_json()
+
+
+def search(client, count_queries, query):
+    with count_queries() as statements:
+        response = client.get(f"/api/products/search?{query}")
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json(), len(statements)
+
+
+def test_results_are_ranked(client, products, count_queries):
+    page, _ = search(client, count_queries, "q=moon")
+    # A name match outranks an author match, which outranks a description match
+    assert [item["sku"] for item in page["items"]] == ["S-1", "S-2", "S-3"]
+    scores = [item["score"] for item in page["items"]]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_type_filter(client, products, count_queries):
+    page, _ = search(client, count_queries, "q=moon&type=book")
+    assert [item["sku"] for item in page["items"]] == ["S-2"]
+
+
+@pytest.mark.parametrize("query", ["q=moon", "q=moon&type=children_book", "q=moon&type=book", "q=moon&limit=1"])
+def test_hits_load_in_a_fixed_number_of_queries(client, products, count_queries, query):
+    page, count = search(client, count_queries, query)
+    assert page["items"]
+    assert all("author" in item for item in page["items"] if item["product_type"] != "product")
+    # The ranked ids, then every hit with its subclass columns
+    assert count == 2
+
+
+def test_paging_follows_the_ranking(client, products, count_queries):
+    first, _ = search(client, count_queries, "q=moon&limit=2")
+    second, _ = search(client, count_queries, f"q=moon&limit=2&cursor={quote(first['next'])}")
+    assert [item["sku"] for item in first["items"] + second["items"]] == ["S-1", "S-2", "S-3"]
@@ -0,0 +1,23 @@
+from api.models import db, Order, OrderItem, Pricing
+from api.seed import MAX_ORDER_ITEMS
+
+
+def test_orders_are_made_of_priced_lines(catalog):
+    orders = Order.query.all()
+    assert len(orders) == 30
+    for order in orders:
+        items = order.items
+        assert 1 <= len(items) <= MAX_ORDER_ITEMS
+        assert len({item.product_id for item in items}) == len(items)
+        for item in items:
+            pricing = db.session.query(Pricing.final_price).filter_by(product_id=item.product_id).scalar()
+            assert item.unit_price == pricing
+            assert item.line_total == item.unit_price * item.quantity
+        assert order.total_price == sum(item.line_total for item in items)
+
+
+def test_orders_can_be_read_back(client, catalog):
+    item = OrderItem.query.first()
+    response = client.get(f"/api/orders/{item.order_id}")
+    assert response.status_code == 200
+    assert item.id in [line["id"] for line in response.get_json()["items"]]
@@ -0,0 +1,67 @@
+import re
+import pytest
+from api.models import db, Product
+from api.sitemap import product_sitemap
+
+
+@pytest.fixture
+def sitemap(catalog):
+    saved = product_sitemap.base_url, product_sitemap.shard_size, product_sitemap.refresh_seconds
+    product_sitemap.shard_size, product_sitemap.refresh_seconds = 50, 0
+    yield product_sitemap
+    product_sitemap.base_url, product_sitemap.shard_size, product_sitemap.refresh_seconds = saved
+
+
+def locs(response):
+    return re.findall(r"<loc>([^<]+)</loc>", response.get_data(as_text=True))
+
+
+def test_index_lists_every_shard(client, sitemap):
+    response = client.get("/sitemap.xml")
+    assert response.status_code == 200
+    assert locs(response) == [f"https://shop.example.com/sitemaps/products-{n}.xml" for n in range(3)]
+
+
+def test_shards_list_their_id_range(client, sitemap):
+    urls = locs(client.get("/sitemaps/products-1.xml"))
+    assert urls[0] == "https://shop.example.com/products/51"
+    assert len(urls) == 50
+    assert client.get("/sitemaps/products-7.xml").status_code == 404
+
+
+def test_host_header_never_reaches_the_urls(client, sitemap):
+    for url in ("/sitemap.xml", "/sitemaps/products-0.xml"):
+        response = client.get(url, headers={"Host": "evil.example"})
+        assert response.status_code == 200
+        assert all(loc.startswith("https://shop.example.com/") for loc in locs(response))
+
+
+def test_unconfigured_sitemap_answers_503(client, sitemap):
+    sitemap.base_url = None
+    response = client.get("/sitemap.xml", headers={"Host": "evil.example"})
+    assert response.status_code == 503
+    assert "SITEMAP_BASE_URL" in response.get_json()["message"]
+
+
+def test_updates_mark_only_their_shard_stale(client, sitemap):
+    client.get("/sitemap.xml")
+    for shard in range(3):
+        client.get(f"/sitemaps/products-{shard}.xml")
+    db.session.execute(db.text("UPDATE products SET updated_at = '2999-01-01 00:00:00' WHERE id = 75"))
+    db.session.commit()
+    state = sitemap.refresh(force=True)
+    assert [state["shards"][str(n)]["stale"] for n in range(3)] == [False, True, False]
+    assert "<lastmod>2999-01-01T00:00:00+00:00</lastmod>" in client.get("/sitemap.xml").get_data(as_text=True)
+
+
+def test_deleted_product_leaves_its_shard(client, sitemap):
+    client.get("/sitemaps/products-0.xml")
+    product_id = db.session.execute(db.text(
+        "SELECT id FROM products WHERE id <= 50 AND id NOT IN (SELECT product_id FROM order_items) LIMIT 1")).scalar()
+    db.session.execute(db.text("DELETE FROM pricing WHERE product_id = :id"), {"id": product_id})
+    db.session.delete(db.session.get(Product, product_id))
+    db.session.commit()
+    sitemap.invalidate(product_id)
+    urls = locs(client.get("/sitemaps/products-0.xml"))
+    assert f"https://shop.example.com/products/{product_id}" not in urls
+    assert len(urls) == 49
@@ -4,6 +4,8 @@ const Dotenv = require('dotenv-webpack');
 module.exports = merge(common, {
     mode: 'production',
     output: {
+        // Content-hashed names let the Flask server cache bundles as immutable
+        filename: '[name].[contenthash:8].js',
         publicPath: '/'
     },
     plugins: [